@@ -1,10 +1,13 @@
 from django.contrib import admin
 
-from employee.models import Employee, LeaveRequest, Attendance, PerformanceReview, LeaveLimit
+from employee.models import (Employee, LeaveRequest, Attendance, AttendanceMonth, PerformanceReview, LeaveLimit,
+                             LeaveBalance)
 
 # Register your models here.
 admin.site.register(Employee)
 admin.site.register(LeaveRequest)
 admin.site.register(Attendance)
+admin.site.register(AttendanceMonth)
 admin.site.register(PerformanceReview)
 admin.site.register(LeaveLimit)
+admin.site.register(LeaveBalance)
@@ -0,0 +1,119 @@
+"""
+Bulk attendance writes and the monthly bitmaps derived from them.
+
+Attendance has one row per employee per day, so marking a leave touches as
+many rows as the leave has days. Rows are written with a single upsert on
+the ``(employee, date)`` unique key instead of one query pair per day.
+
+Every change is also folded into AttendanceMonth. A change only needs the
+new status of each touched day, not the old one: the touched bits are
+cleared in all three masks and set again in the mask for the new status,
+one UPDATE per (employee, month).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.db.models import F
+
+from employee.models import Attendance, AttendanceMonth
+
+STATUSES = ('present', 'absent', 'leave')
+ALL_DAYS = (1 << 31) - 1
+
+
+def day_bit(day):
+    return 1 << (day.day - 1)
+
+
+def leave_attendance(leave):
+    """Unsaved 'leave' Attendance rows for every day of ``leave``."""
+    days = (leave.end_date - leave.start_date).days + 1
+    return [
+        Attendance(employee_id=leave.em_id, date=leave.start_date + timedelta(days=i), status='leave', leave=leave)
+        for i in range(days)
+    ]
+
+
+def upsert_attendance(rows, batch_size=1000):
+    """
+    Insert ``rows``, overwriting status and leave of existing rows for the
+    same employee and date. Later rows win when the input repeats a day.
+    """
+    rows = list({(row.employee_id, row.date): row for row in rows}.values())
+    saved = Attendance.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['employee', 'date'],
+        update_fields=['status', 'leave'],
+    )
+    record_attendance((row.employee_id, row.date, row.status) for row in rows)
+    return saved
+
+
+def record_attendance(changes):
+    """
+    Fold ``(employee_id, date, status)`` changes into AttendanceMonth.
+
+    ``status`` None means the day's Attendance row was deleted. Later
+    changes to the same day win.
+    """
+    by_month = defaultdict(dict)
+    for employee_id, day, status in changes:
+        by_month[(employee_id, day.year, day.month)][day] = status
+    if not by_month:
+        return
+
+    # Deleting days never needs a new month row; skipping it also keeps
+    # cascaded deletes of an employee from re-creating one.
+    AttendanceMonth.objects.bulk_create(
+        [AttendanceMonth(employee_id=employee_id, year=year, month=month)
+         for (employee_id, year, month), days in by_month.items() if any(days.values())],
+        ignore_conflicts=True,
+    )
+    for (employee_id, year, month), days in by_month.items():
+        keep = ALL_DAYS
+        added = dict.fromkeys(STATUSES, 0)
+        for day, status in days.items():
+            keep &= ~day_bit(day)
+            if status:
+                added[status] |= day_bit(day)
+        AttendanceMonth.objects.filter(employee_id=employee_id, year=year, month=month).update(**{
+            f'{status}_mask': F(f'{status}_mask').bitand(keep).bitor(added[status])
+            for status in STATUSES
+        })
+
+
+def rebuild_attendance_months():
+    """Recompute every AttendanceMonth from Attendance. Returns the number of months written."""
+    masks = defaultdict(lambda: dict.fromkeys(STATUSES, 0))
+    rows = Attendance.objects.values_list('employee_id', 'date', 'status').iterator(chunk_size=5000)
+    for employee_id, day, status in rows:
+        masks[(employee_id, day.year, day.month)][status] |= day_bit(day)
+
+    AttendanceMonth.objects.all().delete()
+    AttendanceMonth.objects.bulk_create(
+        [AttendanceMonth(employee_id=employee_id, year=year, month=month,
+                         **{f'{status}_mask': mask for status, mask in month_masks.items()})
+         for (employee_id, year, month), month_masks in masks.items()],
+        batch_size=1000,
+    )
+    return len(masks)
+
+
+class AttendanceCounts(NamedTuple):
+    present: int
+    absent: int
+    leave: int
+
+
+def monthly_attendance(year, month):
+    """Present/absent/leave day counts for every employee with attendance in the month, in one query."""
+    rows = AttendanceMonth.objects.filter(year=year, month=month).values_list(
+        'employee_id', 'present_mask', 'absent_mask', 'leave_mask'
+    )
+    return {
+        employee_id: AttendanceCounts(present.bit_count(), absent.bit_count(), leave.bit_count())
+        for employee_id, present, absent, leave in rows
+    }
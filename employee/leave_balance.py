@@ -0,0 +1,91 @@
+"""
+Per-employee, per-year ledger of paid leave days taken.
+
+Only approved, paid sick and vacation leave counts, by actual days, split
+across calendar years when a leave spans New Year. Changes are applied as
+deltas (+1 when a leave is approved, -1 when an approved leave is rejected,
+edited or deleted), so the ledger is never re-scanned on read.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.db.models import F
+
+from employee.models import LeaveBalance, LeaveRequest
+from payroll.rules import leave_limits
+
+COUNTED_TYPES = ('sick', 'vacation')
+
+
+def leave_days_by_year(leave):
+    """``{year: days}`` this leave takes from the balance, empty if it does not count."""
+    if leave.is_unpaid or leave.type not in COUNTED_TYPES:
+        return {}
+    days = {}
+    for year in range(leave.start_date.year, leave.end_date.year + 1):
+        start = max(leave.start_date, date(year, 1, 1))
+        end = min(leave.end_date, date(year, 12, 31))
+        days[year] = (end - start).days + 1
+    return days
+
+
+def _deltas(leaves, sign):
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTED_TYPES, 0))
+    for leave in leaves:
+        for year, days in leave_days_by_year(leave).items():
+            deltas[(leave.em_id, year)][leave.type] += sign * days
+    return deltas
+
+
+def adjust_balances(leaves, sign=1):
+    """Add (``sign`` 1) or remove (``sign`` -1) the days of ``leaves`` from the ledger."""
+    deltas = _deltas(leaves, sign)
+    if not deltas:
+        return
+
+    if sign > 0:
+        LeaveBalance.objects.bulk_create(
+            [LeaveBalance(employee_id=employee_id, year=year) for employee_id, year in deltas],
+            ignore_conflicts=True,
+        )
+    for (employee_id, year), used in deltas.items():
+        LeaveBalance.objects.filter(employee_id=employee_id, year=year).update(**{
+            f'{leave_type}_used': F(f'{leave_type}_used') + days
+            for leave_type, days in used.items() if days
+        })
+
+
+def remaining_leaves(employee, year=None):
+    limits = leave_limits()
+    if not limits:
+        return {"sick_remaining": 0, "vacation_remaining": 0}
+
+    year = year or date.today().year
+    used = (
+        LeaveBalance.objects.filter(employee=employee, year=year)
+        .values_list('sick_used', 'vacation_used').first()
+    ) or (0, 0)
+    return {
+        "sick_remaining": limits.sick_limit - used[0],
+        "vacation_remaining": limits.vacation_limit - used[1],
+    }
+
+
+def organisation_balances(year=None):
+    """Every employee's LeaveBalance for the year, with user loaded, in one query."""
+    year = year or date.today().year
+    return LeaveBalance.objects.filter(year=year).select_related('employee__user').order_by('employee_id')
+
+
+def rebuild_leave_balances():
+    """Recompute the whole ledger from approved LeaveRequests. Returns the number of balance rows."""
+    approved = LeaveRequest.objects.filter(status='approved', is_unpaid=False, type__in=COUNTED_TYPES)
+    deltas = _deltas(approved.only('em_id', 'type', 'start_date', 'end_date', 'is_unpaid').iterator(), 1)
+    LeaveBalance.objects.all().delete()
+    LeaveBalance.objects.bulk_create(
+        [LeaveBalance(employee_id=employee_id, year=year,
+                      **{f'{leave_type}_used': days for leave_type, days in used.items()})
+         for (employee_id, year), used in deltas.items()],
+        batch_size=1000,
+    )
+    return len(deltas)
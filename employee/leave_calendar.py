@@ -0,0 +1,62 @@
+"""
+Approved leave for one pay period, loaded with a single query.
+
+Each approved LeaveRequest that overlaps the period is clipped to it, so a
+leave spanning two months counts only its days inside each month, and
+overlapping requests for the same employee are merged so no day is counted
+twice. Per-employee day counts are precomputed, making lookups O(1).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from employee.models import LeaveRequest
+
+
+def _merged_days(intervals):
+    """Number of distinct days covered by inclusive ``(start, end)`` date intervals."""
+    days = 0
+    covered_to = None
+    for start, end in sorted(intervals):
+        if covered_to is not None:
+            start = max(start, covered_to + timedelta(days=1))
+        if start <= end:
+            days += (end - start).days + 1
+            covered_to = end
+    return days
+
+
+class LeaveCalendar:
+    def __init__(self, period_start, period_end, leaves):
+        """``leaves`` is an iterable of ``(employee_id, start_date, end_date, is_unpaid)``."""
+        self.period_start = period_start
+        self.period_end = period_end
+        unpaid = defaultdict(list)
+        taken = defaultdict(list)
+        for employee_id, start, end, is_unpaid in leaves:
+            start, end = max(start, period_start), min(end, period_end)
+            if start > end:
+                continue
+            taken[employee_id].append((start, end))
+            if is_unpaid:
+                unpaid[employee_id].append((start, end))
+        self._leave_days = {employee_id: _merged_days(rows) for employee_id, rows in taken.items()}
+        self._lop_days = {employee_id: _merged_days(rows) for employee_id, rows in unpaid.items()}
+
+    @classmethod
+    def for_period(cls, period_start, period_end, employee_ids=None):
+        leaves = LeaveRequest.objects.filter(
+            status='approved',
+            start_date__lte=period_end,
+            end_date__gte=period_start,
+        )
+        if employee_ids is not None:
+            leaves = leaves.filter(em_id__in=employee_ids)
+        return cls(period_start, period_end, leaves.values_list('em_id', 'start_date', 'end_date', 'is_unpaid'))
+
+    def lop_days(self, employee_id):
+        """Unpaid leave days for the employee within the period."""
+        return self._lop_days.get(employee_id, 0)
+
+    def leave_days(self, employee_id):
+        """Approved leave days of any kind for the employee within the period."""
+        return self._leave_days.get(employee_id, 0)
@@ -0,0 +1,69 @@
+"""
+Leave approval workflow, for one request or many at once.
+
+Each call runs in one transaction: the status change, the matching
+Attendance rows, the leave balance ledger and the employee notifications
+are all written in bulk.
+"""
+from django.db import transaction
+
+from employee.attendance import leave_attendance, record_attendance, upsert_attendance
+from employee.leave_balance import adjust_balances
+from employee.models import Attendance, LeaveRequest
+from user.models import Notification
+
+
+def _set_status(leaves, status):
+    """
+    Move ``leaves`` to ``status``, keeping the leave balance ledger in step.
+    Current statuses are re-read under a row lock, so a leave approved
+    twice concurrently is only counted once. The employees' user ids come
+    with them, so ``leaves`` need not have ``em`` loaded.
+    """
+    current = {}
+    user_ids = {}
+    for leave_id, leave_status, user_id in (
+        LeaveRequest.objects.select_for_update(of=('self',))
+        .filter(id__in=[leave.id for leave in leaves])
+        .values_list('id', 'status', 'em__user_id')
+    ):
+        current[leave_id] = leave_status
+        user_ids[leave_id] = user_id
+    changed = [leave for leave in leaves if leave.id in current and current[leave.id] != status]
+    LeaveRequest.objects.filter(id__in=[leave.id for leave in changed]).update(status=status)
+
+    if status == 'approved':
+        adjust_balances(changed, 1)
+    adjust_balances([leave for leave in changed if current[leave.id] == 'approved'], -1)
+    for leave in changed:
+        leave.status = status
+
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=user_ids[leave.id],
+            message=f"Your leave request from {leave.start_date} to {leave.end_date} has been {status}."
+        )
+        for leave in changed
+    ])
+    return changed
+
+
+@transaction.atomic
+def approve_leaves(leaves):
+    """Approve ``leaves`` and mark their days as leave in Attendance. Returns those that changed."""
+    approved = _set_status(leaves, 'approved')
+    upsert_attendance(row for leave in approved for row in leave_attendance(leave))
+    return approved
+
+
+@transaction.atomic
+def reject_leaves(leaves):
+    """Reject ``leaves``, removing any leave Attendance a prior approval created. Returns those that changed."""
+    rejected = _set_status(leaves, 'rejected')
+    leave_days = Attendance.objects.filter(leave__in=[leave.id for leave in rejected], status='leave')
+    days = list(leave_days.values_list('employee_id', 'date').order_by())
+    # Nothing references Attendance, so one DELETE will do; the attendance
+    # months are updated here rather than per row by employee.signals.
+    leave_days._raw_delete(leave_days.db)
+    record_attendance((employee_id, day, None) for employee_id, day in days)
+    return rejected
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from employee.attendance import rebuild_attendance_months
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly attendance bitmaps from Attendance rows."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            months = rebuild_attendance_months()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {months} employee-months"))
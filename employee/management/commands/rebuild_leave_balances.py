@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from employee.leave_balance import rebuild_leave_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild the leave balance ledger from approved leave requests."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            balances = rebuild_leave_balances()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {balances} leave balances"))
@@ -2,6 +2,7 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from payroll.statutory import rules_in_force
 from user.models import User
 
 
@@ -33,6 +34,12 @@ class Employee(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     updated_on = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['department', 'id'], name='employee_department_idx'),
+            models.Index(fields=['hire_date', 'id'], name='employee_hire_date_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.pk and not self.hire_date:
             if self.user and self.user.date_joined:
@@ -63,6 +70,12 @@ class LeaveRequest(models.Model):
     end_date = models.DateField()
     is_unpaid = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-applied_on', '-id'], name='leave_status_applied_idx'),
+            models.Index(fields=['status', 'start_date', 'id'], name='leave_status_start_idx'),
+        ]
+
     def __str__(self):
         return f"{self.em.user.username} | {self.type} | {self.status}"
 
@@ -75,6 +88,25 @@ class LeaveLimit(models.Model):
         return "Global Leave Limits"
 
 
+class LeaveBalance(models.Model):
+    """
+    Paid leave days an employee has taken in a calendar year, per leave type.
+
+    Maintained by ``employee.leave_balance`` whenever a LeaveRequest becomes
+    or stops being approved; remaining days are the LeaveLimit minus these.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_balances')
+    year = models.PositiveSmallIntegerField()
+    sick_used = models.IntegerField(default=0)
+    vacation_used = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('employee', 'year')
+
+    def __str__(self):
+        return f"{self.employee.user.username} - {self.year}"
+
+
 class Attendance(models.Model):
     STATUS_CHOICES = [
         ('present', 'Present'),
@@ -95,13 +127,46 @@ class Attendance(models.Model):
         return f"{self.employee.user.username} - {self.date} ({self.status})"
 
 
-BONUS_PERCENTAGE = {
-    1: 0,
-    2: 4,
-    3: 8,
-    4: 15,
-    5: 25,
-}
+class AttendanceMonth(models.Model):
+    """
+    One employee's attendance for a month as bitmasks, derived from Attendance.
+
+    Bit ``day - 1`` of a mask is set when the employee has that status on
+    that day, so day counts are popcounts. Kept in step with Attendance by
+    ``employee.attendance.record_attendance``.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_months')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    present_mask = models.PositiveIntegerField(default=0)
+    absent_mask = models.PositiveIntegerField(default=0)
+    leave_mask = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('employee', 'year', 'month')
+
+    @property
+    def present_days(self):
+        return self.present_mask.bit_count()
+
+    @property
+    def absent_days(self):
+        return self.absent_mask.bit_count()
+
+    @property
+    def leave_days(self):
+        return self.leave_mask.bit_count()
+
+    def status_on(self, day):
+        """Attendance status on day-of-month ``day``, or None if nothing is recorded."""
+        bit = 1 << (day - 1)
+        for status in ('present', 'absent', 'leave'):
+            if getattr(self, f'{status}_mask') & bit:
+                return status
+        return None
+
+    def __str__(self):
+        return f"{self.employee.user.username} - {self.month}/{self.year}"
 
 
 class PerformanceReview(models.Model):
@@ -128,14 +193,25 @@ class PerformanceReview(models.Model):
     class Meta:
         db_table = "performance_reviews"
         ordering = ['-review_date']
+        indexes = [
+            models.Index(fields=['employee', '-review_date', '-id'], name='review_latest_idx'),
+        ]
 
     def __str__(self):
         return f"{self.employee.user.username} - {self.get_rating_display()} ({self.review_date})"
 
-    def save(self, *args, **kwargs):
-        # Auto calculate bonus
-        percent = BONUS_PERCENTAGE.get(self.rating, 0)
-        basic_salary = self.employee.salary
-
+    def set_bonus(self, basic_salary):
+        """Work out ``bonus_amount`` from the rating and the employee's basic salary."""
+        percent = rules_in_force(self.review_date).bonus_percent(self.rating)
         self.bonus_amount = (basic_salary * percent) / 100
+
+    def save(self, *args, basic_salary=None, **kwargs):
+        # Auto calculate bonus; callers that know the salary pass it to spare the lookup.
+        if basic_salary is None:
+            if PerformanceReview.employee.is_cached(self):
+                basic_salary = self.employee.salary
+            else:
+                basic_salary = Employee.objects.values_list('salary', flat=True).get(pk=self.employee_id)
+
+        self.set_bonus(basic_salary)
         super().save(*args, **kwargs)
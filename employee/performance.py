@@ -0,0 +1,54 @@
+"""
+Batched reads and writes of performance reviews.
+
+The newest review per employee is resolved with a correlated Subquery on
+the (employee, -review_date) index, and reviews are created with one
+salary lookup and one insert, so any number of employees costs a fixed
+number of queries instead of one per employee.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db.models import OuterRef, Subquery
+
+from employee.models import Employee, PerformanceReview
+
+
+class LatestReview(NamedTuple):
+    review_id: int
+    review_date: date
+    rating: int
+    bonus_amount: Decimal
+
+
+def latest_reviews(employee_ids=None, on=None):
+    """
+    ``{employee_id: LatestReview}`` for the newest review dated on or before
+    ``on`` (default: any date), for ``employee_ids`` or every employee.
+    Employees without a review are absent.
+    """
+    newest = PerformanceReview.objects.filter(employee=OuterRef('employee'))
+    if on is not None:
+        newest = newest.filter(review_date__lte=on)
+    newest = newest.order_by('-review_date', '-id').values('id')[:1]
+
+    reviews = PerformanceReview.objects.filter(id=Subquery(newest))
+    if employee_ids is not None:
+        reviews = reviews.filter(employee_id__in=employee_ids)
+    return {
+        employee_id: LatestReview(review_id, review_date, rating, bonus_amount)
+        for employee_id, review_id, review_date, rating, bonus_amount in reviews.order_by().values_list(
+            'employee_id', 'id', 'review_date', 'rating', 'bonus_amount'
+        )
+    }
+
+
+def create_reviews(reviews):
+    """Save unsaved PerformanceReviews with their bonuses worked out, in two queries whatever their number."""
+    salaries = dict(
+        Employee.objects.filter(id__in={review.employee_id for review in reviews}).values_list('id', 'salary')
+    )
+    for review in reviews:
+        review.set_bonus(salaries[review.employee_id])
+    return PerformanceReview.objects.bulk_create(reviews)
@@ -0,0 +1,57 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from employee.attendance import record_attendance
+from employee.leave_balance import adjust_balances
+from employee.models import Attendance, LeaveRequest
+
+
+# Single-row Attendance writes (admin, shell). Bulk paths in
+# employee.attendance call record_attendance themselves.
+@receiver(pre_save, sender=Attendance)
+def attendance_saving(sender, instance, raw=False, **kwargs):
+    instance._previous_day = None
+    if instance.pk and not raw:
+        instance._previous_day = (
+            Attendance.objects.filter(pk=instance.pk).values_list('employee_id', 'date').first()
+        )
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, raw=False, **kwargs):
+    changes = []
+    previous = getattr(instance, '_previous_day', None)
+    if previous and previous != (instance.employee_id, instance.date):
+        changes.append((*previous, None))
+    changes.append((instance.employee_id, instance.date, instance.status))
+    record_attendance(changes)
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, **kwargs):
+    record_attendance([(instance.employee_id, instance.date, None)])
+
+
+# Saves of a single LeaveRequest outside employee.leaves (new requests,
+# admin edits): back out the old version's days if it was approved, then
+# add the new version's if it is.
+@receiver(pre_save, sender=LeaveRequest)
+def leave_request_saving(sender, instance, raw=False, **kwargs):
+    instance._previous_version = None
+    if instance.pk and not raw:
+        instance._previous_version = LeaveRequest.objects.filter(pk=instance.pk, status='approved').first()
+
+
+@receiver(post_save, sender=LeaveRequest)
+def leave_request_saved(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_version', None)
+    if previous:
+        adjust_balances([previous], -1)
+    if instance.status == 'approved' and not raw:
+        adjust_balances([instance], 1)
+
+
+@receiver(post_delete, sender=LeaveRequest)
+def leave_request_deleted(sender, instance, **kwargs):
+    if instance.status == 'approved':
+        adjust_balances([instance], -1)
@@ -1,3 +1,281 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from employee.leave_calendar import LeaveCalendar
+from employee.attendance import monthly_attendance, rebuild_attendance_months
+from employee.leave_balance import rebuild_leave_balances, remaining_leaves
+from employee.leaves import approve_leaves, reject_leaves
+from employee.models import (Attendance, AttendanceMonth, Employee, LeaveBalance, LeaveLimit, LeaveRequest,
+                             PerformanceReview)
+from employee.performance import create_reviews, latest_reviews
+from employee.views import EMPLOYEE_SORTS, LEAVE_SORTS
+from payroll import rules
+from payroll.models import Payslip
+from payroll.views import PAYSLIP_SORTS
+from quickpay.pagination import KeysetPaginator
+from reports.queries import payroll_summary_values, tax_deduction_values
+from reports.views import PAYROLL_SUMMARY_SORTS, TAX_DEDUCTION_SORTS
+from user.models import Feedback, Notification, User
+from user.views import FEEDBACK_SORTS, USER_SORTS
+
+MARCH = (date(2025, 3, 1), date(2025, 3, 31))
+
+
+class LeaveCalendarTests(SimpleTestCase):
+    def test_clips_leave_to_period(self):
+        calendar = LeaveCalendar(*MARCH, [
+            (1, date(2025, 2, 26), date(2025, 3, 3), True),
+            (2, date(2025, 3, 30), date(2025, 4, 4), True),
+        ])
+        self.assertEqual(calendar.lop_days(1), 3)
+        self.assertEqual(calendar.lop_days(2), 2)
+        self.assertEqual(calendar.lop_days(3), 0)
+
+    def test_overlaps_counted_once_and_paid_leave_is_not_lop(self):
+        calendar = LeaveCalendar(*MARCH, [
+            (1, date(2025, 3, 10), date(2025, 3, 14), True),
+            (1, date(2025, 3, 12), date(2025, 3, 16), True),
+            (1, date(2025, 3, 20), date(2025, 3, 21), False),
+        ])
+        self.assertEqual(calendar.lop_days(1), 7)
+        self.assertEqual(calendar.leave_days(1), 9)
+
+
+class LeaveCalendarQueryTests(TestCase):
+    def test_loads_period_in_one_query(self):
+        for i in range(3):
+            employee = Employee.objects.create(user=User.objects.create_user(f'e{i}', office_mail=f'e{i}@x'),
+                                               hire_date=date(2024, 1, 1), salary=30000)
+            LeaveRequest.objects.create(em=employee, type='sick', status='approved', is_unpaid=True,
+                                        start_date=date(2025, 2, 27), end_date=date(2025, 3, 2))
+        LeaveRequest.objects.create(em=employee, type='sick', status='pending', is_unpaid=True,
+                                    start_date=date(2025, 3, 5), end_date=date(2025, 3, 6))
+        with self.assertNumQueries(1):
+            calendar = LeaveCalendar.for_period(*MARCH)
+        self.assertEqual([calendar.lop_days(e.id) for e in Employee.objects.all()], [2, 2, 2])
+
+
+class LeaveApprovalTests(TestCase):
+    def setUp(self):
+        self.hr = User.objects.create_user('hr', password='pw', role='hr_manager', office_mail='hr@x')
+        self.employee = Employee.objects.create(user=User.objects.create_user('e', office_mail='e@x'),
+                                                hire_date=date(2024, 1, 1), salary=30000)
+
+    def test_bulk_approve_upserts_attendance(self):
+        Attendance.objects.create(employee=self.employee, date=date(2025, 3, 3), status='present')
+        leaves = [
+            LeaveRequest.objects.create(em=self.employee, type='sick', start_date=date(2025, 3, 1),
+                                        end_date=date(2025, 3, 30)),
+            LeaveRequest.objects.create(em=self.employee, type='vacation', start_date=date(2025, 4, 1),
+                                        end_date=date(2025, 4, 5)),
+        ]
+        self.client.force_login(self.hr)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('manage_leaves'), {'action': 'approve', 'leave_ids': [l.id for l in leaves]})
+        self.assertLess(len(ctx.captured_queries), 15)
+        self.assertEqual(LeaveRequest.objects.filter(status='approved').count(), 2)
+        self.assertEqual(Attendance.objects.filter(status='leave').count(), 35)
+        self.assertEqual(Attendance.objects.get(date=date(2025, 3, 3)).leave, leaves[0])
+
+        bare = LeaveRequest.objects.get(id=leaves[0].id)
+        with self.assertNumQueries(9):
+            reject_leaves([bare])
+        self.assertEqual(Attendance.objects.count(), 5)
+        month = AttendanceMonth.objects.get(employee=self.employee, year=2025, month=3)
+        self.assertEqual((month.present_days, month.absent_days, month.leave_days), (0, 0, 0))
+
+
+class AttendanceMonthTests(TestCase):
+    def setUp(self):
+        self.employee = Employee.objects.create(user=User.objects.create_user('e', office_mail='e@x'),
+                                                hire_date=date(2024, 1, 1), salary=30000)
+
+    def test_bitmaps_follow_attendance_changes(self):
+        for day in range(1, 11):
+            Attendance.objects.create(employee=self.employee, date=date(2025, 3, day), status='present')
+        row = Attendance.objects.get(date=date(2025, 3, 2))
+        row.status = 'absent'
+        row.save()
+        Attendance.objects.get(date=date(2025, 3, 3)).delete()
+        leave = LeaveRequest.objects.create(em=self.employee, type='sick', start_date=date(2025, 3, 9),
+                                            end_date=date(2025, 3, 12))
+        approve_leaves([leave])
+
+        month = AttendanceMonth.objects.get(employee=self.employee, year=2025, month=3)
+        self.assertEqual((month.present_days, month.absent_days, month.leave_days), (6, 1, 4))
+        self.assertEqual((month.status_on(2), month.status_on(3), month.status_on(12)), ('absent', None, 'leave'))
+        self.assertEqual(monthly_attendance(2025, 3), {self.employee.id: (6, 1, 4)})
+
+        masks = AttendanceMonth.objects.values_list('present_mask', 'absent_mask', 'leave_mask').get()
+        rebuild_attendance_months()
+        self.assertEqual(AttendanceMonth.objects.values_list('present_mask', 'absent_mask', 'leave_mask').get(), masks)
+
+
+class LeaveBalanceTests(TestCase):
+    def setUp(self):
+        rules.clear()
+        LeaveLimit.objects.create(sick_limit=12, vacation_limit=15)
+        self.employee = Employee.objects.create(user=User.objects.create_user('e', office_mail='e@x'),
+                                                hire_date=date(2024, 1, 1), salary=30000)
+
+    def leave(self, start, end, **kwargs):
+        return LeaveRequest.objects.create(em=self.employee, type=kwargs.pop('type', 'sick'),
+                                           start_date=start, end_date=end, **kwargs)
+
+    def test_ledger_counts_days_and_follows_status_changes(self):
+        spanning = self.leave(date(2024, 12, 30), date(2025, 1, 3), type='vacation')
+        sick = self.leave(date(2025, 2, 3), date(2025, 2, 5))
+        unpaid = self.leave(date(2025, 3, 3), date(2025, 3, 5), is_unpaid=True)
+        approve_leaves([spanning, sick, unpaid])
+        approve_leaves([sick])
+
+        remaining_leaves(self.employee)  # warm the LeaveLimit cache
+        with self.assertNumQueries(1):
+            self.assertEqual(remaining_leaves(self.employee, 2025), {'sick_remaining': 9, 'vacation_remaining': 12})
+        self.assertEqual(remaining_leaves(self.employee, 2024)['vacation_remaining'], 13)
+
+        reject_leaves([sick])
+        spanning.end_date = date(2025, 1, 1)
+        spanning.save()
+        self.assertEqual(remaining_leaves(self.employee, 2025), {'sick_remaining': 12, 'vacation_remaining': 14})
+
+        ledger = list(LeaveBalance.objects.order_by('year').values_list('year', 'sick_used', 'vacation_used'))
+        rebuild_leave_balances()
+        self.assertEqual(list(LeaveBalance.objects.order_by('year').values_list('year', 'sick_used', 'vacation_used')),
+                         ledger)
+
+    def test_employee_with_history_can_be_deleted(self):
+        approve_leaves([self.leave(date(2025, 2, 3), date(2025, 2, 5))])
+        self.employee.delete()
+        self.assertFalse(LeaveBalance.objects.exists())
+        self.assertFalse(AttendanceMonth.objects.exists())
+
+
+class LatestReviewTests(TestCase):
+    def test_resolves_newest_review_per_employee_in_one_query(self):
+        employees = [
+            Employee.objects.create(user=User.objects.create_user(f'e{i}', office_mail=f'e{i}@x'),
+                                    hire_date=date(2024, 1, 1), salary=40000)
+            for i in range(3)
+        ]
+        for employee, dates in zip(employees, [[date(2024, 6, 1), date(2025, 1, 1)], [date(2024, 9, 1)], []]):
+            for rating, review_date in enumerate(dates, start=3):
+                review = PerformanceReview.objects.create(employee=employee, rating=rating)
+                PerformanceReview.objects.filter(id=review.id).update(review_date=review_date)
+
+        with self.assertNumQueries(1):
+            latest = latest_reviews()
+        self.assertEqual({e: (r.review_date, r.rating, r.bonus_amount) for e, r in latest.items()}, {
+            employees[0].id: (date(2025, 1, 1), 4, Decimal('6000.00')),
+            employees[1].id: (date(2024, 9, 1), 3, Decimal('3200.00')),
+        })
+        self.assertEqual(latest_reviews([employees[0].id], on=date(2024, 12, 31))[employees[0].id].rating, 3)
+
+
+    def test_saving_reviews_does_not_query_per_review(self):
+        employees = [
+            Employee.objects.create(user=User.objects.create_user(f'e{i}', office_mail=f'e{i}@x'),
+                                    hire_date=date(2024, 1, 1), salary=40000 + 10000 * i)
+            for i in range(4)
+        ]
+        with self.assertNumQueries(2):
+            create_reviews([PerformanceReview(employee_id=employee.id, rating=3) for employee in employees])
+        self.assertEqual(
+            sorted(PerformanceReview.objects.values_list('bonus_amount', flat=True)),
+            [Decimal('3200.00'), Decimal('4000.00'), Decimal('4800.00'), Decimal('5600.00')],
+        )
+
+        review = PerformanceReview(employee_id=employees[0].id, rating=4)
+        with self.assertNumQueries(1):
+            review.save(basic_salary=employees[0].salary)
+        self.assertEqual(review.bonus_amount, Decimal('6000'))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.employees = [
+            Employee.objects.create(user=User.objects.create_user(f'e{i}', office_mail=f'e{i}@x'),
+                                    hire_date=date(2024, 1 + i // 2, 1), salary=40000)
+            for i in range(5)
+        ]
+
+    def walk(self, paginator, url):
+        pages = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                page = paginator.page(RequestFactory().get(url))
+            self.assertEqual(len(ctx), 1)
+            self.assertNotIn('OFFSET', ctx.captured_queries[0]['sql'].upper())
+            pages.append(page)
+            url = '/' + page.next_url if page.has_next else None
+        return pages
+
+    def test_pages_follow_sort_with_id_tiebreak(self):
+        paginator = KeysetPaginator(Employee.objects.all(), {'hired': 'hire_date'}, 'hired', per_page=2)
+        pages = self.walk(paginator, '/?sort=-hired')
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        expected = sorted(self.employees, key=lambda e: (e.hire_date, e.id), reverse=True)
+        self.assertEqual([e.id for page in pages for e in page], [e.id for e in expected])
+        self.assertEqual(pages[0].columns['hired']['direction'], 'desc')
+        self.assertFalse(pages[0].has_previous)
+
+        back = paginator.page(RequestFactory().get('/' + pages[2].previous_url))
+        self.assertEqual([e.id for e in back], [e.id for e in pages[1]])
+        self.assertTrue(back.has_previous and back.has_next)
+
+    def test_employee_list_view_filters_and_pages(self):
+        hr = User.objects.create_user('hr', password='pw', role='hr_manager', office_mail='hr@x')
+        self.client.force_login(hr)
+        Employee.objects.filter(id=self.employees[0].id).update(department='finance')
+        response = self.client.get(reverse('view_employees'), {'department': 'finance', 'sort': 'hired'})
+        self.assertEqual([e.id for e in response.context['employees']], [self.employees[0].id])
+        self.assertFalse(response.context['page'].has_next)
+
+    def test_list_orderings_use_indexes(self):
+        employee = self.employees[0]
+        plans = {
+            'payslip_history_idx': Payslip.objects.filter(employee=employee).order_by('-generated_date', '-id'),
+            'leave_status_applied_idx': LeaveRequest.objects.filter(status='pending').order_by('-applied_on', '-id'),
+            'notification_recent_idx':
+                Notification.objects.filter(user=employee.user).order_by('-created_at', '-id'),
+            'notification_unread_idx':
+                Notification.objects.filter(user=employee.user, is_read=False).order_by('-created_at', '-id'),
+        }
+        for index, queryset in plans.items():
+            plan = queryset[:51].explain()
+            self.assertIn(index, plan)
+            # Rows come back in index order, with no separate sort step.
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        hr = User.objects.create_user('hr', password='pw', role='hr_manager', office_mail='hr@x')
+        self.client.force_login(hr)
+        response = self.client.get(reverse('view_employees'), {'sort': 'hired', 'after': 'WyJ4IiwxXQ=='})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page'].has_previous)
+        self.assertEqual(len(response.context['employees']), 5)
+
+    def test_every_view_sort_is_served_by_an_index(self):
+        lists = [
+            (Employee.objects.all(), EMPLOYEE_SORTS),
+            (LeaveRequest.objects.filter(status='pending'), LEAVE_SORTS),
+            (User.objects.all(), USER_SORTS),
+            (Feedback.objects.all(), FEEDBACK_SORTS),
+            (Payslip.objects.filter(employee=self.employees[0]), PAYSLIP_SORTS),
+            (payroll_summary_values(3, 2025), PAYROLL_SUMMARY_SORTS),
+            (tax_deduction_values(3, 2025), TAX_DEDUCTION_SORTS),
+        ]
+        for queryset, sorts in lists:
+            paginator = KeysetPaginator(queryset, sorts, next(iter(sorts)))
+            for sort in [*sorts, *(f'-{name}' for name in sorts)]:
+                with CaptureQueriesContext(connection) as ctx:
+                    paginator.page(RequestFactory().get('/', {'sort': sort}))
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + ctx.captured_queries[0]['sql'])
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertNotIn('TEMP B-TREE', plan, (queryset.model, sort))
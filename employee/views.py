@@ -1,15 +1,21 @@
-from datetime import date, timedelta
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseForbidden
 from django.shortcuts import render, get_object_or_404, redirect
 
 from employee.forms import LeaveRequestForm, AddEmployeeForm, EditEmployeeForm, PerformanceReviewForm
-from employee.models import LeaveRequest, Employee, PerformanceReview, LeaveLimit, Attendance
+from employee.leave_balance import remaining_leaves
+from employee.leaves import approve_leaves, reject_leaves
+from employee.models import LeaveRequest, Employee, PerformanceReview
 from payroll.models import Payslip
+from quickpay.pagination import KeysetPaginator
 from user.models import User
 from user.views import create_notification
 
+LEAVE_SORTS = {'applied': 'applied_on', 'start': 'start_date'}
+EMPLOYEE_SORTS = {'department': 'department', 'hired': 'hire_date'}
+
 
 # Create your views here.
 
@@ -50,7 +56,7 @@ def add_leave(request):
     else:
         form = LeaveRequestForm()
 
-    remaining = get_remaining_leaves(employee)
+    remaining = remaining_leaves(employee)
 
     return render(request, 'add_leave.html', {
         'form': form,
@@ -60,13 +66,29 @@ def add_leave(request):
 
 @login_required()
 def manage_leaves(request):
+    if request.method == 'POST':
+        if request.user.role not in ['hr_manager', 'admin']:
+            return HttpResponseForbidden("Access denied")
+        action = request.POST.get('action')
+        leaves = list(LeaveRequest.objects.select_related('em').filter(id__in=request.POST.getlist('leave_ids')))
+        if not leaves:
+            messages.error(request, "Select at least one leave request.")
+        elif action == 'approve':
+            changed = approve_leaves(leaves)
+            messages.success(request, f"{len(changed)} leave request(s) approved.")
+        elif action == 'reject':
+            changed = reject_leaves(leaves)
+            messages.success(request, f"{len(changed)} leave request(s) rejected.")
+        return redirect(f"{request.path}?status={request.GET.get('status', 'pending')}")
+
     status_filter = request.GET.get('status', 'pending')
-    if status_filter == 'all':
-        leaves = LeaveRequest.objects.select_related('em__user').order_by('-applied_on')
-    else:
-        leaves = LeaveRequest.objects.select_related('em__user').filter(status=status_filter).order_by('-applied_on')
+    leaves = LeaveRequest.objects.select_related('em__user')
+    if status_filter != 'all':
+        leaves = leaves.filter(status=status_filter)
+    page = KeysetPaginator(leaves, LEAVE_SORTS, '-applied').page(request)
     return render(request, 'manage_leaves.html', {
-        'leaves': leaves,
+        'leaves': page.object_list,
+        'page': page,
         'status_filter': status_filter
     })
 
@@ -99,39 +121,10 @@ def view_leave(request, leave_id):
     if request.method == 'POST':
         action = request.POST.get('action')
 
-        # ---- APPROVE LEAVE ----
         if action == 'approve':
-            leave.status = 'approved'
-            leave.save()
-
-            # Auto-create attendance entries for leave dates
-            current_date = leave.start_date
-            while current_date <= leave.end_date:
-                Attendance.objects.update_or_create(
-                    employee=leave.em,
-                    date=current_date,
-                    defaults={
-                        'status': 'leave',
-                        'leave': leave
-                    }
-                )
-                current_date += timedelta(days=1)
-
-            # Notify employee
-            create_notification(
-                user=leave.em.user,
-                message=f"Your leave request from {leave.start_date} to {leave.end_date} has been approved."
-            )
-
-        # ---- REJECT LEAVE ----
+            approve_leaves([leave])
         elif action == 'reject':
-            leave.status = 'rejected'
-            leave.save()
-
-            create_notification(
-                user=leave.em.user,
-                message=f"Your leave request from {leave.start_date} to {leave.end_date} has been rejected."
-            )
+            reject_leaves([leave])
 
         return redirect('manage_leaves')
 
@@ -177,9 +170,22 @@ def edit_employee(request, employee_id):
 
 @login_required()
 def view_employees(request):
-    employees = Employee.objects.select_related('user').all()
-    print("Found employees:", employees.count())
-    return render(request, 'view_employees.html', {'employees': employees})
+    employees = Employee.objects.select_related('user')
+    department_filter = request.GET.get('department', '')
+    status_filter = request.GET.get('status', '')
+    if department_filter:
+        employees = employees.filter(department=department_filter)
+    if status_filter:
+        employees = employees.filter(status=status_filter)
+    page = KeysetPaginator(employees, EMPLOYEE_SORTS, 'hired').page(request)
+    return render(request, 'view_employees.html', {
+        'employees': page.object_list,
+        'page': page,
+        'department_filter': department_filter,
+        'status_filter': status_filter,
+        'departments': Employee.DEPARTMENT_CHOICES,
+        'statuses': Employee.STATUS_CHOICES,
+    })
 
 
 @login_required()
@@ -219,37 +225,3 @@ def view_performance_review(request, employee_id):
         'reviews': reviews,
         'employee': employee,
     })
-
-
-@login_required()
-def get_leave_usage(employee):
-    current_year = date.today().year
-
-    leaves = LeaveRequest.objects.filter(
-        em=employee,
-        status="approved",
-        start_date__year=current_year
-    )
-
-    sick_used = leaves.filter(type="sick", is_unpaid=False).count()
-    vacation_used = leaves.filter(type="vacation", is_unpaid=False).count()
-
-    return {
-        "sick_used": sick_used,
-        "vacation_used": vacation_used,
-    }
-
-
-@login_required()
-def get_remaining_leaves(employee):
-    limits = LeaveLimit.objects.first()
-
-    if not limits:
-        return {"sick_remaining": 0, "vacation_remaining": 0}
-
-    usage = get_leave_usage(employee)
-
-    return {
-        "sick_remaining": limits.sick_limit - usage["sick_used"],
-        "vacation_remaining": limits.vacation_limit - usage["vacation_used"],
-    }
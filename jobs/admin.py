@@ -0,0 +1,6 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+# Register your models here.
+admin.site.register(Job)
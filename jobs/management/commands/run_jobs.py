@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import work, worker_name
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs. Start several to run jobs in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', dest='kinds',
+                            help="Only run jobs of this kind (repeatable)")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once no job is due instead of waiting for more")
+        parser.add_argument('--max-jobs', type=int, default=None)
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty")
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        self.stdout.write(f"Worker {worker} started")
+        try:
+            done = work(worker, kinds=options['kinds'], once=options['once'],
+                        idle_sleep=options['sleep'], max_jobs=options['max_jobs'])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Ran {done} jobs"))
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A unit of background work, picked up by ``manage.py run_jobs``.
+
+    ``kind`` names a handler registered with ``jobs.registry.task``; ``payload``
+    holds its JSON arguments. Higher ``priority`` runs first, and a job is
+    not picked up before ``run_after``, which is also how retries back off.
+    """
+    STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_on = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    output = models.FileField(upload_to='jobs/', blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='jobs')
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_on']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_ready_idx'),
+        ]
+
+    @property
+    def done(self):
+        return self.status in ('succeeded', 'failed')
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
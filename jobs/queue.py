@@ -0,0 +1,201 @@
+"""
+Database-backed job queue.
+
+Jobs live in the ``jobs_job`` table of the project database, so no broker is
+needed: views ``enqueue`` work and return, and one or more
+``manage.py run_jobs`` processes claim and run it.
+
+A job is claimed with a single conditional UPDATE that also checks how many
+jobs of the same kind are already running, so two workers cannot both take
+the same job, and a kind's concurrency limit holds on backends that
+serialise writes (SQLite). A worker that dies mid-job leaves it
+``running``; once its lock is older than ``JOBS_LOCK_TIMEOUT`` it is
+treated as a failed attempt and retried. Handlers that can run longer than
+that call ``heartbeat`` as they make progress to keep their lock fresh.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import get_task, registered
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(kind, payload=None, priority=0, user=None, run_after=None):
+    """Queue a job of ``kind`` (a registered handler name) and return it."""
+    task = get_task(kind)
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=task.max_attempts,
+        run_after=run_after or timezone.now(),
+        created_by=user,
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _running_count():
+    return Coalesce(Subquery(
+        Job.objects.filter(kind=OuterRef('kind'), status='running')
+        .order_by().values('kind').annotate(n=Count('id')).values('n')
+    ), Value(0))
+
+
+def claim(worker, kinds=None):
+    """
+    Take the highest-priority job that is due and whose kind has a free
+    slot, mark it running and return it; None if there is nothing to do.
+    """
+    tasks = registered()
+    if kinds:
+        tasks = {name: tasks[name] for name in kinds if name in tasks}
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status='queued', run_after__lte=now, kind__in=tasks)
+        .order_by('-priority', 'run_after', 'id')
+        .values_list('id', 'kind')
+    )
+    full = set()
+    for job_id, kind in candidates[:50]:
+        if kind in full:
+            continue
+        claimed = (
+            Job.objects.filter(id=job_id, status='queued')
+            .alias(running=_running_count())
+            .filter(running__lt=tasks[kind].concurrency)
+            .update(status='running', locked_by=worker, locked_on=now, attempts=F('attempts') + 1)
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+        full.add(kind)
+    return None
+
+
+def heartbeat(job):
+    """
+    Refresh a running job's lock so ``requeue_stale`` leaves it alone.
+
+    Cheap to call often: the lock is written at most once per tenth of
+    ``JOBS_LOCK_TIMEOUT``. Returns False if the job is no longer locked by
+    its worker, i.e. it has already been requeued.
+    """
+    now = timezone.now()
+    if job.locked_on and now - job.locked_on < timedelta(seconds=settings.JOBS_LOCK_TIMEOUT / 10):
+        return True
+    beat = Job.objects.filter(id=job.id, status='running', locked_by=job.locked_by).update(locked_on=now)
+    if beat:
+        job.locked_on = now
+    return bool(beat)
+
+
+def with_heartbeat(job, items):
+    """Yield ``items``, beating ``job``'s heartbeat as each is consumed."""
+    for item in items:
+        heartbeat(job)
+        yield item
+
+
+def _retry_or_fail(job, error, backoff, retry=True):
+    job.error = error
+    job.locked_by = ''
+    job.locked_on = None
+    if retry and job.attempts < job.max_attempts:
+        job.status = 'queued'
+        job.run_after = timezone.now() + timedelta(seconds=backoff * 2 ** (job.attempts - 1))
+    else:
+        job.status = 'failed'
+        job.finished_on = timezone.now()
+
+
+# The columns a finished attempt writes.
+OUTCOME_FIELDS = ['status', 'result', 'error', 'output', 'locked_by', 'locked_on', 'run_after', 'finished_on']
+
+
+def _record_outcome(job, **held):
+    """
+    Write ``job``'s outcome if the job is still running under the lock
+    described by ``held``; False if it was requeued (and maybe claimed by
+    another worker) meanwhile, in which case nothing is written.
+    """
+    return bool(Job.objects.filter(id=job.id, status='running', **held).update(
+        updated_on=timezone.now(), **{name: getattr(job, name) for name in OUTCOME_FIELDS}
+    ))
+
+
+def perform(job):
+    """
+    Run a claimed job's handler and record the outcome. If the job was
+    requeued while the handler ran, its outcome is dropped, so a late
+    worker never overwrites the attempt that took the job over.
+    """
+    task = get_task(job.kind)
+    worker = job.locked_by
+    try:
+        result = task.func(job)
+    except Exception as e:
+        logger.exception("Job %s failed on attempt %s", job, job.attempts)
+        _retry_or_fail(job, traceback.format_exc(), task.backoff, retry=not isinstance(e, task.fatal))
+    else:
+        job.status = 'succeeded'
+        job.result = result
+        job.error = ''
+        job.locked_by = ''
+        job.locked_on = None
+        job.finished_on = timezone.now()
+    if not _record_outcome(job, locked_by=worker):
+        logger.warning("Job %s was requeued while %s ran it; dropping this attempt's outcome", job, worker)
+        if job.output:
+            job.output.delete(save=False)
+    return job
+
+
+def requeue_stale(timeout=None):
+    """Retry (or fail) running jobs whose worker has held them past ``timeout`` seconds."""
+    if timeout is None:
+        timeout = settings.JOBS_LOCK_TIMEOUT
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = 0
+    for job in Job.objects.filter(status='running', locked_on__lt=cutoff):
+        try:
+            backoff = get_task(job.kind).backoff
+        except LookupError:
+            backoff = 0
+        held = {'locked_by': job.locked_by, 'locked_on': job.locked_on}
+        _retry_or_fail(job, f"Worker {job.locked_by} stopped responding.", backoff)
+        # Skip a job whose worker finished it or beat its heartbeat since it was read.
+        stale += _record_outcome(job, **held)
+    return stale
+
+
+def work(worker=None, kinds=None, once=False, idle_sleep=2.0, max_jobs=None):
+    """
+    Claim and run jobs until interrupted. With ``once`` the loop stops as
+    soon as no job is due. Returns the number of jobs run.
+    """
+    worker = worker or worker_name()
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        requeue_stale()
+        job = claim(worker, kinds)
+        if job is None:
+            if once:
+                break
+            time.sleep(idle_sleep)
+            continue
+        perform(job)
+        done += 1
+    return done
@@ -0,0 +1,54 @@
+"""
+Registry of job handlers.
+
+Apps declare handlers in their own ``tasks`` module, which is imported when
+the jobs app is ready::
+
+    @task('reports.payroll_summary_pdf', concurrency=2)
+    def payroll_summary_pdf(job):
+        ...
+
+A handler receives the Job and reads its arguments from ``job.payload``.
+Whatever it returns must be JSON-serialisable and is stored as
+``job.result``; files go to ``job.output``.
+"""
+from typing import Callable, NamedTuple
+
+
+class Task(NamedTuple):
+    name: str
+    func: Callable
+    concurrency: int
+    max_attempts: int
+    backoff: int
+    fatal: tuple = ()
+
+
+_tasks = {}
+
+
+def task(name, concurrency=1, max_attempts=3, backoff=30, fatal=()):
+    """
+    Register the decorated function as the handler for jobs of kind ``name``.
+
+    At most ``concurrency`` jobs of this kind run at once across all workers.
+    A failed job is retried up to ``max_attempts`` times in total, waiting
+    ``backoff`` seconds before the first retry and doubling each time. An
+    exception of one of the ``fatal`` types fails the job at once, for
+    errors that would recur on every attempt.
+    """
+    def register(func):
+        _tasks[name] = Task(name, func, concurrency, max_attempts, backoff, tuple(fatal))
+        return func
+    return register
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f"No job handler registered for {name!r}")
+
+
+def registered():
+    return dict(_tasks)
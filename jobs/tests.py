@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import enqueue, claim, heartbeat, perform, requeue_stale, work
+from jobs.registry import task
+
+calls = []
+
+
+@task('tests.record', concurrency=1)
+def record(job):
+    calls.append(job.payload['n'])
+    return job.payload['n'] * 2
+
+
+@task('tests.flaky', max_attempts=2, backoff=10)
+def flaky(job):
+    raise RuntimeError("temporary failure")
+
+
+@task('tests.overtaken')
+def overtaken(job):
+    # The job's lock goes stale mid-run and a second worker takes it over.
+    Job.objects.filter(id=job.id).update(locked_on=timezone.now() - timedelta(hours=2))
+    requeue_stale(timeout=60)
+    Job.objects.filter(id=job.id).update(run_after=timezone.now())
+    claim('w2')
+    return 'late'
+
+
+@task('tests.invalid', max_attempts=3, fatal=(ValueError,))
+def invalid(job):
+    raise ValueError("bad payload")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_by_priority_and_stores_result(self):
+        low = enqueue('tests.record', {'n': 1})
+        high = enqueue('tests.record', {'n': 2}, priority=5)
+        self.assertEqual(work(once=True), 2)
+        self.assertEqual(calls, [2, 1])
+        low.refresh_from_db()
+        high.refresh_from_db()
+        self.assertEqual((low.status, low.result), ('succeeded', 2))
+        self.assertEqual((low.locked_by, low.locked_on), ('', None))
+        self.assertEqual(high.attempts, 1)
+
+    def test_concurrency_limit_per_kind(self):
+        enqueue('tests.record', {'n': 1})
+        enqueue('tests.record', {'n': 2})
+        first = claim('w1')
+        self.assertIsNotNone(first)
+        self.assertIsNone(claim('w2'))
+        perform(first)
+        self.assertIsNotNone(claim('w2'))
+
+    def test_retries_with_backoff_then_fails(self):
+        job = enqueue('tests.flaky')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            perform(claim('w1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertIsNone(claim('w1'))
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            perform(claim('w1'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn("temporary failure", job.error)
+
+    def test_stale_lock_is_requeued(self):
+        job = enqueue('tests.record', {'n': 1})
+        claim('w1')
+        Job.objects.filter(id=job.id).update(locked_on=timezone.now() - timedelta(hours=2))
+        self.assertEqual(requeue_stale(timeout=60), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+
+    def test_fatal_error_fails_without_retry(self):
+        job = enqueue('tests.invalid')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            perform(claim('w1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+        self.assertIn("bad payload", job.error)
+
+    def test_heartbeat_keeps_long_job_locked(self):
+        job = enqueue('tests.record', {'n': 1})
+        running = claim('w1')
+        self.assertTrue(heartbeat(running))
+        self.assertEqual(Job.objects.get(id=job.id).locked_on, running.locked_on)
+
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(id=job.id).update(locked_on=an_hour_ago)
+        running.locked_on = an_hour_ago
+        self.assertTrue(heartbeat(running))
+        self.assertEqual(requeue_stale(timeout=60), 0)
+
+        Job.objects.filter(id=job.id).update(locked_on=an_hour_ago)
+        self.assertEqual(requeue_stale(timeout=60), 1)
+        running.locked_on = an_hour_ago
+        self.assertFalse(heartbeat(running))
+
+    def test_late_outcome_does_not_overwrite_new_claim(self):
+        job = enqueue('tests.overtaken')
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            perform(claim('w1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.result, job.attempts), ('running', 'w2', None, 2))
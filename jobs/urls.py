@@ -0,0 +1,7 @@
+from django.urls import path
+import jobs.views
+
+urlpatterns = [
+    path('job_status/<int:job_id>/', jobs.views.job_status, name='job_status'),
+    path('job_download/<int:job_id>/', jobs.views.job_download, name='job_download'),
+]
@@ -0,0 +1,41 @@
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse
+from django.shortcuts import render, get_object_or_404
+
+from jobs.models import Job
+
+
+def _get_job(request, job_id):
+    job = get_object_or_404(Job, id=job_id)
+    if job.created_by_id != request.user.id and request.user.role != 'admin':
+        return None
+    return job
+
+
+@login_required()
+def job_status(request, job_id):
+    job = _get_job(request, job_id)
+    if job is None:
+        return HttpResponseForbidden("Access denied")
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'attempts': job.attempts,
+            'max_attempts': job.max_attempts,
+            'result': job.result,
+            'has_output': bool(job.output),
+            'error': job.error.strip().splitlines()[-1] if job.error else '',
+        })
+    return render(request, 'job_status.html', {'job': job})
+
+
+@login_required()
+def job_download(request, job_id):
+    job = _get_job(request, job_id)
+    if job is None:
+        return HttpResponseForbidden("Access denied")
+    if job.status != 'succeeded' or not job.output:
+        raise Http404("This job has no file to download.")
+    return FileResponse(job.output.open('rb'), as_attachment=True, filename=job.output.name.rsplit('/', 1)[-1])
@@ -1,9 +1,12 @@
 from django.contrib import admin
 
-from payroll.models import Payroll, Payslip, TaxDeduction
+from payroll.models import Payroll, Payslip, TaxDeduction, PayrollRun, PayrollPeriodRollup, PayPeriod
 
 # Register your models here.
 admin.site.register(Payroll)
 admin.site.register(Payslip)
 admin.site.register(TaxDeduction)
+admin.site.register(PayrollRun)
+admin.site.register(PayrollPeriodRollup)
+admin.site.register(PayPeriod)
 
@@ -0,0 +1,68 @@
+"""
+Point payroll records written before PayPeriod at the month they pay.
+
+A Payroll's month is its ``period`` where that column still exists, else
+the month of its ``payment_date``. Its gross, deductions and payslip take
+the Payroll's period, and a tax deduction its deduction summary's. Rows no
+Payroll references fall back to the month of their own date.
+
+``backfill_pay_periods`` only reads models through ``apps``, so it can be
+a migration's RunPython step as it is; the backfill_pay_periods command
+runs it against the current models.
+"""
+from django.apps import apps as global_apps
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+
+# Model -> the date a row of it falls back to when no Payroll references it.
+OWN_DATES = {
+    'GrossSalary': 'start_date',
+    'TotalDeductions': 'date',
+    'Payslip': 'generated_date',
+    'TaxDeduction': 'applicable_date',
+}
+
+
+def _by_month(queryset, paid_on, PayPeriod):
+    """Point every row of ``queryset`` at the PayPeriod of the month of ``paid_on``. Returns the row count."""
+    queryset = queryset.annotate(paid_on=paid_on)
+    months = (
+        queryset.annotate(paid_year=ExtractYear('paid_on'), paid_month=ExtractMonth('paid_on'))
+        .values_list('paid_year', 'paid_month').distinct().order_by()
+    )
+    updated = 0
+    for year, month in list(months):
+        period, _ = PayPeriod.objects.get_or_create(year=year, month=month)
+        updated += queryset.filter(paid_on__year=year, paid_on__month=month).update(pay_period=period)
+    return updated
+
+
+def backfill_pay_periods(apps=global_apps, schema_editor=None):
+    """Set ``pay_period`` on every payroll record that has none. Returns the number of rows updated."""
+    PayPeriod = apps.get_model('payroll', 'PayPeriod')
+    Payroll = apps.get_model('payroll', 'Payroll')
+    unset = {'pay_period__isnull': True}
+
+    has_period = any(field.name == 'period' for field in Payroll._meta.get_fields())
+    paid_on = Coalesce('period', 'payment_date') if has_period else F('payment_date')
+    updated = _by_month(Payroll.objects.filter(**unset), paid_on, PayPeriod)
+
+    payrolls = Payroll.objects.filter(pay_period__isnull=False)
+    for name, link in [('GrossSalary', 'gross'), ('TotalDeductions', 'deductions'), ('Payslip', 'payslip')]:
+        model = apps.get_model('payroll', name)
+        period = payrolls.filter(**{link: OuterRef('pk')}).values('pay_period')[:1]
+        updated += model.objects.filter(**unset).filter(pk__in=payrolls.values(f'{link}__pk')).update(
+            pay_period=Subquery(period)
+        )
+
+    TotalDeductions = apps.get_model('payroll', 'TotalDeductions')
+    TaxDeduction = apps.get_model('payroll', 'TaxDeduction')
+    summaries = TotalDeductions.objects.filter(pay_period__isnull=False)
+    updated += TaxDeduction.objects.filter(**unset, deduction_summary__in=summaries).update(
+        pay_period=Subquery(summaries.filter(pk=OuterRef('deduction_summary')).values('pay_period')[:1])
+    )
+
+    for name, own_date in OWN_DATES.items():
+        model = apps.get_model('payroll', name)
+        updated += _by_month(model.objects.filter(**unset), F(own_date), PayPeriod)
+    return updated
@@ -0,0 +1,229 @@
+"""
+Pure payroll calculation kernel.
+
+Nothing in here touches the ORM. Amounts go in and come out as integer
+paise, and a whole batch of employees is evaluated against one resolved
+rule set in a single call.
+
+Percentages on ``CommonPay`` are floats and the original per-row code
+multiplied by ``Decimal(rate / 100)``, i.e. by the exact binary value of
+the float. The kernel keeps that value as an exact integer ratio and
+carries every intermediate as a numerator over a common denominator, so
+each field rounds (half-even, to the paisa) to exactly what the Decimal
+path stores. Loss of pay, ``basic * days / days_in_period``, is added to
+the deductions unrounded: the kernel carries it as a numerator over
+``days_in_period`` into the total and net and rounds it only for its own
+field. The Decimal path worked out the per-day rate first, to 28 digits,
+so where the exact total falls on a half paisa it could round the other
+way; the kernel rounds the exact value.
+"""
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import repeat
+from math import lcm
+from typing import NamedTuple
+
+from payroll.statutory import StatutoryRules, rules_in_force
+
+DAYS_IN_PERIOD = 30
+
+
+class RuleSet(NamedTuple):
+    """
+    One resolved set of rates; percentages as stored on CommonPay.
+
+    ``statutory`` defaults to the schedule in force today.
+    """
+    da: float
+    hra: float
+    pf: float
+    statutory: StatutoryRules = None
+    days_in_period: int = DAYS_IN_PERIOD
+
+    @classmethod
+    def from_common_pay(cls, common_pay, on=None):
+        return cls(da=common_pay.da, hra=common_pay.hra, pf=common_pay.pf, statutory=rules_in_force(on))
+
+
+class PayrollInput(NamedTuple):
+    """Per-employee inputs, amounts in paise."""
+    basic_pay: int
+    other_allowances: int = 0
+    bonus: int = 0
+    lop_days: int = 0
+    income_tax: int = 0
+
+
+class PayrollResult(NamedTuple):
+    """Per-employee outputs, amounts in paise."""
+    basic_pay: int
+    da_amount: int
+    hra_amount: int
+    allowances: int
+    bonus: int
+    gross_total: int
+    pf: int
+    esi: int
+    pt: int
+    income_tax: int
+    lop_deduction: int
+    total_deduction: int
+    net_salary: int
+
+
+def to_paise(amount):
+    """Convert a rupee amount (Decimal, int or None) to integer paise."""
+    if not amount:
+        return 0
+    return int(Decimal(amount).quantize(Decimal('0.01')).scaleb(2))
+
+
+def from_paise(paise):
+    """Convert integer paise back to a two-place rupee Decimal."""
+    return Decimal(paise).scaleb(-2)
+
+
+def _round(numerator, denominator):
+    """Round numerator / denominator half-even to an integer."""
+    q, r = divmod(numerator, denominator)
+    r += r
+    if r > denominator or (r == denominator and q & 1):
+        q += 1
+    return q
+
+
+def _rate_ratio(percent):
+    return (percent / 100).as_integer_ratio()
+
+
+def compute_batch(inputs, rules):
+    """
+    Evaluate a batch of PayrollInput rows against one RuleSet.
+
+    Returns a list of PayrollResult in the same order as ``inputs``.
+    """
+    statutory = rules.statutory or rules_in_force()
+    da_n, da_d = _rate_ratio(rules.da)
+    hra_n, hra_d = _rate_ratio(rules.hra)
+    pf_n, pf_d = _rate_ratio(rules.pf)
+    esi_n, esi_d = statutory.esi_rate.as_integer_ratio()
+
+    # Every intermediate is a numerator over ``scale`` (paise) or over
+    # ``wide`` (paise, once the ESI rate has been applied). Float ratios
+    # have power-of-two denominators, so rounding over ``scale`` is a shift.
+    scale = lcm(2, da_d, hra_d, pf_d)
+    wide = scale * esi_d
+    k_da = da_n * (scale // da_d)
+    k_hra = hra_n * (scale // hra_d)
+    k_pf = pf_n * (scale // pf_d)
+    shift = scale.bit_length() - 1
+    half = scale >> 1
+    mask = scale - 1
+    esi_limit = statutory.esi_ceiling * 100 * scale
+    pt_table = statutory.professional_tax.scaled(scale)
+    pt_lows, pt_highs, pt_amounts = pt_table.lows, pt_table.highs, pt_table.amounts
+    days = rules.days_in_period
+
+    def round_scale(n):
+        q = (n + half) >> shift
+        if n & mask == half and q & 1:
+            q -= 1
+        return q
+
+    results = []
+    append = results.append
+    for basic, other, bonus, lop_days, tax in inputs:
+        da_x = basic * k_da
+        hra_x = basic * k_hra
+        allow_x = da_x + hra_x + (other + bonus) * scale
+        gross_x = basic * scale + allow_x
+
+        i = bisect_right(pt_lows, gross_x) - 1
+        pt = pt_amounts[i] if i >= 0 and gross_x <= pt_highs[i] else 0
+
+        pf_x = basic * k_pf
+        if gross_x <= esi_limit:
+            esi_x = gross_x * esi_n
+            esi = _round(esi_x, wide)
+            total_x = pf_x * esi_d + esi_x + (pt + tax) * wide
+            gross_d, denominator = gross_x * esi_d, wide
+        else:
+            esi = 0
+            total_x = pf_x + (pt + tax) * scale
+            gross_d, denominator = gross_x, scale
+
+        if lop_days:
+            # Loss of pay is over ``days``; widen the total and gross to match.
+            lop_x = basic * min(lop_days, days)
+            lop = _round(lop_x, days)
+            total_x = total_x * days + lop_x * denominator
+            gross_d *= days
+            denominator *= days
+            total = _round(total_x, denominator)
+            net = _round(gross_d - total_x, denominator)
+        elif denominator == scale:
+            lop = 0
+            total = round_scale(total_x)
+            net = round_scale(gross_d - total_x)
+        else:
+            lop = 0
+            total = _round(total_x, denominator)
+            net = _round(gross_d - total_x, denominator)
+
+        append(PayrollResult(
+            basic,
+            round_scale(da_x),
+            round_scale(hra_x),
+            round_scale(allow_x),
+            bonus,
+            round_scale(gross_x),
+            round_scale(pf_x),
+            esi,
+            pt,
+            tax,
+            lop,
+            total,
+            net,
+        ))
+    return results
+
+
+def shard(inputs, shards):
+    """Split inputs into at most ``shards`` contiguous, evenly sized chunks."""
+    size = -(-len(inputs) // max(shards, 1))
+    return [inputs[i:i + size] for i in range(0, len(inputs), size)] if inputs else []
+
+
+@contextmanager
+def worker_pool(workers):
+    """A process pool of ``workers``, shut down on exit, or None when one worker evaluates in-process."""
+    if workers <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield executor
+
+
+def compute_sharded(inputs, rules, workers, executor=None):
+    """
+    Evaluate inputs across a process pool, one contiguous shard per worker.
+
+    Results come back in input order, so the caller can stay the single
+    writer. With one worker the batch is evaluated in-process. Callers
+    evaluating several batches pass the ``executor`` from ``worker_pool``
+    so the worker processes start once; without one, a pool is started
+    for this batch alone.
+    """
+    if workers <= 1 or len(inputs) < workers:
+        return compute_batch(inputs, rules)
+    if rules.statutory is None:
+        rules = rules._replace(statutory=rules_in_force())
+    if executor is None:
+        with worker_pool(workers) as executor:
+            return compute_sharded(inputs, rules, workers, executor)
+    results = []
+    for shard_results in executor.map(compute_batch, shard(inputs, workers), repeat(rules)):
+        results.extend(shard_results)
+    return results
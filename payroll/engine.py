@@ -0,0 +1,352 @@
+import calendar
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from employee.leave_calendar import LeaveCalendar
+from employee.models import Employee
+from employee.performance import latest_reviews
+from payroll.calculation import (RuleSet, PayrollInput, PayrollResult, compute_sharded, worker_pool, to_paise,
+                                 from_paise)
+from payroll.models import GrossSalary, TotalDeductions, TaxDeduction, Payroll, Payslip, PayrollRun, PayPeriod
+from payroll.rollup import record_lines
+from payroll.rules import common_pay_in_force
+from user.models import Notification, User
+
+
+class PayrollError(Exception):
+    """Raised when a payroll run cannot be started."""
+
+
+class BulkPayrollResult(NamedTuple):
+    processed: int
+    elapsed: float
+    run: PayrollRun = None
+
+    @property
+    def throughput(self):
+        """Employees processed per second."""
+        return self.processed / self.elapsed if self.elapsed else float(self.processed)
+
+
+def period_bounds(month, year):
+    """Return the first and last day of the given month."""
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last_day)
+
+
+def open_pay_period(month, year):
+    """
+    The PayPeriod for the month, created open if there is none yet.
+
+    Raises PayrollError if the period is locked.
+    """
+    period, _ = PayPeriod.objects.get_or_create(year=year, month=month)
+    if period.is_locked:
+        raise PayrollError(f"Payroll for {period} is locked.")
+    return period
+
+
+def set_period_lock(month, year, locked):
+    """Lock or unlock the month's PayPeriod, creating it if needed. Returns the period."""
+    period, _ = PayPeriod.objects.get_or_create(year=year, month=month)
+    if period.is_locked != locked:
+        period.status = 'locked' if locked else 'open'
+        period.save(update_fields=['status', 'locked_on'])
+    return period
+
+
+def get_active_common_pay(on):
+    common_pay = common_pay_in_force(on)
+    if not common_pay:
+        raise PayrollError("No approved Common Pay rules available.")
+    return common_pay
+
+
+class PayrollLine(NamedTuple):
+    """Unsaved records for one employee's payroll."""
+    employee: Employee
+    gross: GrossSalary
+    deductions: TotalDeductions
+    payroll: Payroll
+    payslip: Payslip
+    tax: TaxDeduction = None
+
+
+def payroll_input(employee, unpaid_days=0, performance_bonus=0, other_allowances=0, tax_amt=0):
+    return PayrollInput(
+        basic_pay=to_paise(employee.salary),
+        other_allowances=to_paise(other_allowances),
+        bonus=to_paise(performance_bonus),
+        lop_days=unpaid_days,
+        income_tax=to_paise(tax_amt),
+    )
+
+
+def build_line(employee, result, pay_period):
+    """Turn one kernel result into unsaved model instances for ``pay_period``."""
+    gross = GrossSalary(
+        employee=employee,
+        pay_period=pay_period,
+        basic_pay=from_paise(result.basic_pay),
+        da_amount=from_paise(result.da_amount),
+        hra_amount=from_paise(result.hra_amount),
+        allowances=from_paise(result.allowances),
+        gross_total=from_paise(result.gross_total),
+        start_date=pay_period.start,
+        end_date=pay_period.end,
+    )
+    td = TotalDeductions(
+        employee=employee,
+        pay_period=pay_period,
+        pf=from_paise(result.pf),
+        esi=from_paise(result.esi),
+        pt=from_paise(result.pt),
+        income_tax=from_paise(result.income_tax),
+        lop_deduction=from_paise(result.lop_deduction),
+        total_deduction=from_paise(result.total_deduction),
+        gross_salary_amount=gross.gross_total,
+    )
+    payroll = Payroll(
+        employee=employee,
+        gross=gross,
+        deductions=td,
+        net_salary=from_paise(result.net_salary),
+        bonuses=from_paise(result.bonus),
+        pay_period=pay_period,
+    )
+    payslip = Payslip(
+        employee=employee,
+        pay_period=pay_period,
+        payroll=payroll,
+        total_earnings=gross.gross_total,
+        total_deductions=td.total_deduction,
+        net_pay=payroll.net_salary,
+    )
+    tax = None
+    if result.income_tax > 0:
+        tax = TaxDeduction(employee=employee, deduction_summary=td, pay_period=pay_period, tax_amt=td.income_tax,
+                           applicable_date=pay_period.end)
+    return PayrollLine(employee, gross, td, payroll, payslip, tax)
+
+
+def save_lines(lines):
+    """Persist payroll lines with one bulk_create per table and add them to the monthly rollup."""
+    with transaction.atomic():
+        GrossSalary.objects.bulk_create([line.gross for line in lines])
+        TotalDeductions.objects.bulk_create([line.deductions for line in lines])
+        TaxDeduction.objects.bulk_create([line.tax for line in lines if line.tax])
+        Payroll.objects.bulk_create([line.payroll for line in lines])
+        Payslip.objects.bulk_create([line.payslip for line in lines])
+        record_lines(lines)
+
+
+def period_payslips(month, year):
+    """Payslips paid for the month, with everything a PDF needs joined in, in id order."""
+    return (
+        Payslip.objects.filter(pay_period__year=year, pay_period__month=month)
+        .select_related('employee__user', 'payroll__gross', 'payroll__deductions')
+        .order_by('id')
+    )
+
+
+class PayrollContext(NamedTuple):
+    """Everything a payroll run resolves once up front."""
+    rules: RuleSet
+    leave: LeaveCalendar
+    bonuses: dict
+
+
+def load_context(month, year):
+    period_start, period_end = period_bounds(month, year)
+    common_pay = get_active_common_pay(period_end)
+    return PayrollContext(
+        rules=RuleSet.from_common_pay(common_pay, period_end),
+        leave=LeaveCalendar.for_period(period_start, period_end),
+        bonuses={employee_id: review.bonus_amount
+                 for employee_id, review in latest_reviews(on=period_end).items()},
+    )
+
+
+def compute_employees(employees, context, other_allowances=Decimal(0.0), tax_amt=Decimal(0.0), workers=None,
+                      executor=None):
+    """Compute kernel results for ``employees``, in order, on ``executor`` if given (see worker_pool)."""
+    if workers is None:
+        workers = settings.PAYROLL_WORKERS
+    inputs = [
+        payroll_input(employee, context.leave.lop_days(employee.id), context.bonuses.get(employee.id, 0),
+                      other_allowances, tax_amt)
+        for employee in employees
+    ]
+    return compute_sharded(inputs, context.rules, workers, executor)
+
+
+class PreviewLine(NamedTuple):
+    employee: Employee
+    amounts: PayrollResult
+
+
+def preview_payroll(month, year, other_allowances=Decimal(0.0), tax_amt=Decimal(0.0), employee_id=None):
+    """
+    Compute a month's payroll without writing anything.
+
+    Covers every active employee, or with ``employee_id`` that one employee
+    whatever their status, as run_payroll pays them. Returns one PreviewLine
+    per employee, with amounts in rupees, plus a PayrollResult of column
+    totals.
+    """
+    context = load_context(month, year)
+    if employee_id is None:
+        employees = Employee.objects.filter(status='active')
+    else:
+        employees = Employee.objects.filter(id=employee_id)
+    employees = list(employees.select_related('user').order_by('id'))
+    results = compute_employees(employees, context, other_allowances, tax_amt)
+    totals = PayrollResult._make(from_paise(sum(column)) for column in zip(*results)) if results else None
+    lines = [
+        PreviewLine(employee, PayrollResult._make(from_paise(value) for value in result))
+        for employee, result in zip(employees, results)
+    ]
+    return lines, totals
+
+
+def pending_employees(month, year):
+    """Active employees not yet paid for the month, in id order."""
+    return (
+        Employee.objects.filter(status='active')
+        .exclude(payrolls__pay_period__in=PayPeriod.objects.filter(year=year, month=month))
+        .select_related('user')
+        .order_by('id')
+    )
+
+
+def open_payroll_run(month, year, other_allowances=None, tax_amt=None, chunk_size=None):
+    """
+    The PayrollRun for the month, created as pending if there is none yet.
+
+    ``other_allowances`` and ``tax_amt`` default to zero for a new run and to
+    the figures the run was started with for an existing one. Raises
+    PayrollError if the month's PayPeriod is locked, no Common Pay rules are
+    in force for the month, or the figures given differ from the run's.
+    """
+    open_pay_period(month, year)
+    get_active_common_pay(period_bounds(month, year)[1])
+    run, created = PayrollRun.objects.get_or_create(year=year, month=month, defaults={
+        'other_allowances': Decimal(0.0) if other_allowances is None else other_allowances,
+        'tax_amt': Decimal(0.0) if tax_amt is None else tax_amt,
+        'chunk_size': chunk_size or PayrollRun._meta.get_field('chunk_size').default,
+    })
+    if not created and (
+        (other_allowances is not None and Decimal(other_allowances) != run.other_allowances)
+        or (tax_amt is not None and Decimal(tax_amt) != run.tax_amt)
+    ):
+        raise PayrollError(
+            f"Payroll for {month}/{year} was started with other allowances {run.other_allowances} and "
+            f"tax {run.tax_amt}; every employee of a month is paid with the same figures."
+        )
+    return run
+
+
+def run_bulk_payroll(month, year, other_allowances=None, tax_amt=None, workers=None,
+                     chunk_size=None, progress=None):
+    """
+    Run payroll for every active employee for the given month.
+
+    The run is recorded as a PayrollRun and processed in employee-id chunks.
+    Each chunk is computed in memory and written with one bulk_create per
+    table, in the same transaction as the run's checkpoint. When ``workers``
+    > 1 the chunks are sharded across one process pool started for the run.
+    Calling this again for a month whose run failed resumes after the last
+    committed chunk, using the allowance and tax figures the run was started
+    with (PayrollError if different ones are given). Calling it again for a
+    completed month pays the active employees who have no payroll for it
+    yet, e.g. those hired or back from leave since; with none it is a no-op.
+    Employees already paid for the month are skipped either way.
+
+    A run another process is still running is refused with PayrollError. A
+    run whose last checkpoint is older than ``JOBS_LOCK_TIMEOUT`` is taken to
+    have died with its worker and is resumed.
+
+    ``progress`` is called with the PayrollRun after every committed chunk.
+    """
+    started = time.perf_counter()
+    run = open_payroll_run(month, year, other_allowances, tax_amt, chunk_size)
+    pay_period = PayPeriod.objects.get(year=year, month=month)
+    pending = pending_employees(month, year)
+
+    with transaction.atomic():
+        run = PayrollRun.objects.select_for_update().get(pk=run.pk)
+        if run.status == 'running' and (
+            timezone.now() - run.updated_on < timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+        ):
+            raise PayrollError(f"Payroll for {pay_period} is already running.")
+        if run.status == 'completed':
+            # Whoever is unpaid now was not active when the month completed, so may sort before the checkpoint.
+            if not pending.exists():
+                return BulkPayrollResult(processed=0, elapsed=time.perf_counter() - started, run=run)
+            run.last_employee_id = 0
+            run.finished_on = None
+        run.status = 'running'
+        run.error = ''
+        run.total_employees = run.processed_employees + pending.filter(id__gt=run.last_employee_id).count()
+        run.save()
+
+    context = load_context(month, year)
+    if workers is None:
+        workers = settings.PAYROLL_WORKERS
+
+    period_label = str(pay_period)
+    processed = 0
+    try:
+        with worker_pool(workers) as executor:
+            while True:
+                chunk = list(pending.filter(id__gt=run.last_employee_id)[:run.chunk_size])
+                if not chunk:
+                    break
+                results = compute_employees(chunk, context, run.other_allowances, run.tax_amt, workers, executor)
+                lines = [
+                    build_line(employee, result, pay_period)
+                    for employee, result in zip(chunk, results)
+                ]
+                with transaction.atomic():
+                    # The period may have been locked since the run started; take its row lock and look again.
+                    if PayPeriod.objects.select_for_update().get(pk=pay_period.pk).is_locked:
+                        raise PayrollError(f"Payroll for {pay_period} is locked.")
+                    save_lines(lines)
+                    Notification.objects.bulk_create([
+                        Notification(
+                            user=line.employee.user,
+                            message=f"Your payslip for {period_label} has been processed successfully. "
+                                    f"Net Pay: ₹{line.payroll.net_salary:.2f}"
+                        )
+                        for line in lines
+                    ])
+                    run.last_employee_id = chunk[-1].id
+                    run.processed_employees += len(chunk)
+                    run.save(update_fields=['last_employee_id', 'processed_employees', 'updated_on'])
+                processed += len(chunk)
+                if progress:
+                    progress(run)
+    except Exception as e:
+        run.status = 'failed'
+        run.error = str(e)
+        run.save(update_fields=['status', 'error', 'updated_on'])
+        raise
+
+    with transaction.atomic():
+        run.status = 'completed'
+        run.finished_on = timezone.now()
+        run.save(update_fields=['status', 'finished_on', 'updated_on'])
+        if run.processed_employees:
+            Notification.objects.bulk_create([
+                Notification(user=hr, message=f"Payslips for {period_label} have been generated "
+                                              f"for {run.processed_employees} employees.")
+                for hr in User.objects.filter(role='hr_manager', is_active=True)
+            ])
+
+    return BulkPayrollResult(processed=processed, elapsed=time.perf_counter() - started, run=run)
@@ -41,4 +41,17 @@ class PayrollManagerForm(forms.Form):
         max_digits=10, decimal_places=2,
         label="Tax Amount",
         initial=Decimal(0.0)
-    )
\ No newline at end of file
+    )
+
+
+class BulkPayrollForm(PayrollManagerForm):
+    month = forms.IntegerField(
+        min_value=1, max_value=12,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    year = forms.IntegerField(
+        min_value=2000, max_value=2100,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+
+    field_order = ['month', 'year', 'other_allowances', 'tax_amt']
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from payroll.backfill import backfill_pay_periods
+
+
+class Command(BaseCommand):
+    help = "Point payroll records written before pay periods existed at the month they pay."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = backfill_pay_periods()
+        self.stdout.write(self.style.SUCCESS(f"Set the pay period of {rows} payroll records"))
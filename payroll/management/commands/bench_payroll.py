@@ -0,0 +1,102 @@
+import random
+import time
+from datetime import date
+from itertools import count
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from employee.models import Employee
+from payroll.calculation import RuleSet, PayrollInput, compute_sharded
+from payroll.engine import run_bulk_payroll
+from payroll.models import CommonPay
+from user.models import User
+
+# The first month the full-run benchmark pays; each run pays the next month on.
+BENCH_MONTH, BENCH_YEAR = 1, 2099
+
+
+def elapsed(call, *args, **kwargs):
+    started = time.perf_counter()
+    call(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ("Benchmark payroll computation on synthetic employees across worker counts, then time full "
+            "payroll runs. The runs write employees and payroll, so they need --test-database: a throwaway "
+            "test database is created for them and destroyed afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=50000)
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--run-employees', type=int, default=5000,
+                            help="Employees paid by each full run (0 skips the full runs)")
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--test-database', action='store_true',
+                            help="Run the full runs in a fresh test database (required unless --run-employees 0)")
+
+    def handle(self, *args, **options):
+        if options['run_employees'] and not options['test_database']:
+            raise CommandError("Full payroll runs write to the database; pass --test-database to run them in a "
+                               "throwaway test database, or --run-employees 0 to skip them.")
+        rng = random.Random(0)
+        inputs = [
+            PayrollInput(
+                basic_pay=rng.randint(1000000, 20000000),
+                other_allowances=rng.randint(0, 500000),
+                bonus=rng.choice([0, rng.randint(0, 1000000)]),
+                lop_days=rng.choice([0, 0, 0, 1, 2]),
+                income_tax=rng.randint(0, 300000),
+            )
+            for _ in range(options['employees'])
+        ]
+        rules = RuleSet(da=10.0, hra=12.5, pf=12.0)
+
+        self.stdout.write("compute_sharded:")
+        self.table(options, len(inputs), lambda workers: elapsed(compute_sharded, inputs, rules, workers))
+
+        if options['run_employees']:
+            self.stdout.write(f"\nrun_bulk_payroll ({options['run_employees']} employees, in a test database):")
+            # Points the default connection at a new, empty database until it is destroyed.
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.seed(options['run_employees'], rng)
+                months = count(BENCH_YEAR * 12 + BENCH_MONTH - 1)  # months since year 0, one per run
+                self.table(options, options['run_employees'],
+                           lambda workers: self.run_payroll(next(months), workers, options))
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def table(self, options, count, bench):
+        baseline = None
+        self.stdout.write(f"{'workers':>8} {'seconds':>10} {'employees/sec':>15} {'speedup':>8}")
+        for workers in options['workers']:
+            best = None
+            for _ in range(options['repeat']):
+                seconds = bench(workers)
+                best = seconds if best is None else min(best, seconds)
+            baseline = baseline or best
+            self.stdout.write(
+                f"{workers:>8} {best:>10.3f} {count / best:>15.0f} {baseline / best:>7.2f}x"
+            )
+
+    def seed(self, count, rng):
+        """Synthetic active employees and Common Pay from the first bench month on."""
+        CommonPay.objects.create(da=10, hra=12.5, pf=12, effective_from=date(BENCH_YEAR, BENCH_MONTH, 1),
+                                 status='Approved')
+        users = User.objects.bulk_create([
+            User(username=f'bench-{i}', office_mail=f'bench-{i}@example.com', password='!')
+            for i in range(count)
+        ], batch_size=1000)
+        Employee.objects.bulk_create([
+            Employee(user=user, department=rng.choice(Employee.DEPARTMENT_CHOICES)[0],
+                     hire_date=date(BENCH_YEAR - 1, 1, 1), salary=rng.randint(10000, 200000))
+            for user in users
+        ], batch_size=1000)
+
+    def run_payroll(self, months, workers, options):
+        """Seconds for one full run of a month nothing has paid yet; it commits chunk by chunk as usual."""
+        year, month = divmod(months, 12)
+        return elapsed(run_bulk_payroll, month + 1, year, workers=workers, chunk_size=options['chunk_size'])
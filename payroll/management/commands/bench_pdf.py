@@ -0,0 +1,53 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from payroll.payslip_pdf import render_payslip, render_payslips, layout_options
+from payroll.pdf_service import PdfRenderer, render_bytes
+
+
+class Command(BaseCommand):
+    help = "Benchmark payslip PDF rendering throughput across worker counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payslips', type=int, default=500)
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        items = []
+        for i in range(options['payslips']):
+            basic = rng.randint(10000, 200000)
+            items.append({
+                **layout_options(),
+                'name': f"Employee {i}", 'username': f"employee{i}", 'department': 'it',
+                'date': '31-03-2025', 'basic_pay': f"{basic:.2f}", 'da_amount': f"{basic * 0.1:.2f}",
+                'hra_amount': f"{basic * 0.125:.2f}", 'allowances': '0.00', 'bonuses': '0.00',
+                'pf': f"{basic * 0.12:.2f}", 'esi': '0.00', 'pt': '200.00', 'income_tax': '0.00',
+                'total_deduction': f"{basic * 0.12 + 200:.2f}", 'net_pay': f"{basic * 1.105 - 200:.2f}",
+            })
+
+        baseline = None
+        self.stdout.write(f"{'workers':>8} {'seconds':>10} {'PDFs/sec':>10} {'speedup':>8}")
+        for workers in options['workers']:
+            renderer = PdfRenderer(workers=workers)
+            renderer.render(render_payslip, items[0])  # start the pool outside the timing
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                for _ in renderer.render_many(render_payslip, items):
+                    pass
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            renderer.close()
+            baseline = baseline or best
+            self.stdout.write(
+                f"{workers:>8} {best:>10.3f} {len(items) / best:>10.1f} {baseline / best:>7.2f}x"
+            )
+
+        started = time.perf_counter()
+        render_bytes(render_payslips, items)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"one {len(items)}-page PDF: {elapsed:.3f}s ({len(items) / elapsed:.1f} pages/sec)")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.engine import set_period_lock
+
+
+class Command(BaseCommand):
+    help = "Lock a pay period so its payroll can no longer change, or unlock it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=int, required=True)
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--unlock', action='store_true', help="Reopen the period instead")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['month'] <= 12:
+            raise CommandError("--month must be between 1 and 12")
+        period = set_period_lock(options['month'], options['year'], locked=not options['unlock'])
+        self.stdout.write(self.style.SUCCESS(f"{period} is {period.get_status_display().lower()}"))
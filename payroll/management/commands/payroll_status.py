@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from payroll.models import PayrollRun
+
+
+class Command(BaseCommand):
+    help = "Show progress of payroll runs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=int)
+        parser.add_argument('--year', type=int)
+
+    def handle(self, *args, **options):
+        runs = PayrollRun.objects.all()
+        if options['month']:
+            runs = runs.filter(month=options['month'])
+        if options['year']:
+            runs = runs.filter(year=options['year'])
+
+        for run in runs:
+            line = (f"{run.month:>2}/{run.year}  {run.status:<10} "
+                    f"{run.processed_employees}/{run.total_employees} ({run.progress}%)")
+            if run.error:
+                line += f"  error: {run.error}"
+            self.stdout.write(line)
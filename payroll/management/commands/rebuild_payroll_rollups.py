@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from payroll.rollup import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly payroll rollup table from the payroll rows."
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} payroll rollup rows"))
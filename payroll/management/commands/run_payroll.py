@@ -0,0 +1,48 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.engine import run_bulk_payroll, PayrollError
+
+
+class Command(BaseCommand):
+    help = "Run month-end payroll for all active employees."
+
+    def add_arguments(self, parser):
+        today = date.today()
+        parser.add_argument('--month', type=int, default=today.month)
+        parser.add_argument('--year', type=int, default=today.year)
+        parser.add_argument('--allowances', type=Decimal, default=None,
+                            help="Other allowances applied to every employee (a resumed run keeps its own)")
+        parser.add_argument('--tax', type=Decimal, default=None,
+                            help="Tax amount applied to every employee (a resumed run keeps its own)")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Process-pool workers (defaults to settings.PAYROLL_WORKERS)")
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help="Employees committed per checkpoint")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['month'] <= 12:
+            raise CommandError("--month must be between 1 and 12")
+        try:
+            result = run_bulk_payroll(
+                options['month'],
+                options['year'],
+                other_allowances=options['allowances'],
+                tax_amt=options['tax'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                progress=self.report_progress,
+            )
+        except PayrollError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {result.processed} employees in {result.elapsed:.2f}s "
+            f"({result.throughput:.1f} employees/sec); run {result.run.month}/{result.run.year} "
+            f"is {result.run.status}"
+        ))
+
+    def report_progress(self, run):
+        self.stdout.write(f"  {run.processed_employees}/{run.total_employees} employees ({run.progress}%)")
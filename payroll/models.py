@@ -1,9 +1,13 @@
+import calendar
+from datetime import date
 from decimal import Decimal
 
 from django.db import models
 from django.utils import timezone
 
 from employee.models import Employee
+from payroll.calculation import to_paise
+from payroll.statutory import rules_in_force
 
 
 # Create your models here.
@@ -26,8 +30,62 @@ class CommonPay(models.Model):
         return f"Common Pay Rules (Effective from {self.effective_from})"
 
 
+class PayPeriod(models.Model):
+    """
+    One payroll month.
+
+    Every payroll record points at the period it pays, so reports select a
+    month by key however late it was processed. Payroll can be run for an
+    open period only. Once locked, a period's records cannot change, so
+    anything derived from them can be cached for good under
+    ``cache_key``.
+    """
+    STATUS = [
+        ('open', 'Open'),
+        ('locked', 'Locked'),
+    ]
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS, default='open')
+    locked_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('year', 'month')
+        ordering = ['-year', '-month']
+
+    @property
+    def start(self):
+        return date(self.year, self.month, 1)
+
+    @property
+    def end(self):
+        return date(self.year, self.month, calendar.monthrange(self.year, self.month)[1])
+
+    @property
+    def is_locked(self):
+        return self.status == 'locked'
+
+    def save(self, *args, **kwargs):
+        # Stamp each locking afresh, so keys cached under an earlier lock are never reused.
+        if not self.is_locked:
+            self.locked_on = None
+        elif self.locked_on is None:
+            self.locked_on = timezone.now()
+        super().save(*args, **kwargs)
+
+    def cache_key(self, name):
+        """Cache key for ``name`` computed from this period, or None while it is open."""
+        if not self.is_locked:
+            return None
+        return f"{name}:{self.year}-{self.month}:{self.locked_on.timestamp()}"
+
+    def __str__(self):
+        return self.start.strftime('%B %Y')
+
+
 class GrossSalary(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="gross_salaries")
+    pay_period = models.ForeignKey(PayPeriod, on_delete=models.PROTECT, related_name="gross_salaries")
     basic_pay = models.DecimalField(max_digits=10, decimal_places=2)
 
     # store calculated amounts only
@@ -44,41 +102,39 @@ class GrossSalary(models.Model):
         return f"{self.employee.user.get_username()} ({self.start_date} - {self.end_date})"
 
 
-PT_SLABS_DICT = [
-    (12000, 17999, 320),
-    (18000, 29999, 450),
-    (30000, 44999, 600),
-    (45000, 99999, 750),
-    (100000, 124999, 1000),
-    (125000, float('inf'), 1250),
-]
-
-
 class TotalDeductions(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="deduction_summary")
+    pay_period = models.ForeignKey(PayPeriod, on_delete=models.PROTECT, related_name="deductions")
     pf = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     esi = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     pt = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     income_tax = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
+    lop_deduction = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.0'),
+                                        help_text="Loss of pay for unpaid leave days")
     total_deduction = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     date = models.DateField(auto_now_add=True)
     gross_salary_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
 
-    ESI_RATE = Decimal('0.0075')  # 0.75%
+    class Meta:
+        indexes = [
+            models.Index(fields=['pay_period', 'employee', 'id'], name='deduction_period_employee_idx'),
+            models.Index(fields=['pay_period', 'total_deduction', 'id'], name='deduction_period_total_idx'),
+        ]
+
+    def _statutory_rules(self):
+        return rules_in_force(self.date)
 
     def calculate_pt(self):
         """Calculate PT based on gross salary using slabs"""
-        for min_salary, max_salary, slab_amount in PT_SLABS_DICT:
-            if min_salary <= self.gross_salary_amount <= max_salary:
-                self.pt = slab_amount
-                return slab_amount
-        self.pt = 0.0
-        return 0.0
+        slabs = self._statutory_rules().professional_tax
+        self.pt = Decimal(slabs.lookup(to_paise(self.gross_salary_amount))).scaleb(-2)
+        return self.pt
 
     def calculate_esi(self):
-        """Apply ESI at 0.75% only if gross salary <= ₹21,000"""
-        if self.gross_salary_amount <= 21000:
-            self.esi = self.gross_salary_amount * self.ESI_RATE
+        """Apply ESI only if gross salary is within the ESI wage ceiling"""
+        rules = self._statutory_rules()
+        if self.gross_salary_amount <= rules.esi_ceiling:
+            self.esi = self.gross_salary_amount * rules.esi_rate
         else:
             self.esi = Decimal('0.0')
         return self.esi
@@ -87,7 +143,7 @@ class TotalDeductions(models.Model):
         """Calculate total deductions"""
         self.calculate_pt()
         self.calculate_esi()
-        self.total_deduction = self.pf + self.esi + self.pt + self.income_tax
+        self.total_deduction = self.pf + self.esi + self.pt + self.income_tax + self.lop_deduction
         return self.total_deduction
 
     def save(self, *args, **kwargs):
@@ -101,6 +157,7 @@ class TotalDeductions(models.Model):
 class TaxDeduction(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="tax_deductions")
     deduction_summary = models.ForeignKey(TotalDeductions, on_delete=models.CASCADE, related_name="detailed_deductions")
+    pay_period = models.ForeignKey(PayPeriod, on_delete=models.PROTECT, related_name="tax_deductions")
     tax_amt = models.DecimalField(max_digits=10, decimal_places=2)
     applicable_date = models.DateField()
 
@@ -108,6 +165,49 @@ class TaxDeduction(models.Model):
         return f"{self.tax_type} - {self.tax_amt}"
 
 
+class PayrollRun(models.Model):
+    """
+    One month-end payroll job, checkpointed after every committed chunk.
+
+    Employees are processed in id order and ``last_employee_id`` is written
+    in the same transaction as each chunk's payroll rows, so a restarted run
+    continues from the last committed chunk.
+    """
+    STATUS = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS, default='pending')
+    other_allowances = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.0'))
+    tax_amt = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.0'))
+    chunk_size = models.PositiveIntegerField(default=500)
+    total_employees = models.PositiveIntegerField(default=0)
+    processed_employees = models.PositiveIntegerField(default=0)
+    last_employee_id = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('year', 'month')
+        ordering = ['-year', '-month']
+
+    @property
+    def progress(self):
+        """Percentage of employees processed."""
+        if not self.total_employees:
+            return 100 if self.status == 'completed' else 0
+        return round(100 * self.processed_employees / self.total_employees)
+
+    def __str__(self):
+        return f"Payroll run {self.month}/{self.year} ({self.status})"
+
+
 class Payroll(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="payrolls")
     gross = models.ForeignKey(GrossSalary, on_delete=models.CASCADE)
@@ -115,6 +215,17 @@ class Payroll(models.Model):
     net_salary = models.DecimalField(max_digits=10, decimal_places=2)
     bonuses = models.DecimalField(max_digits=10, decimal_places=2, null=True, default=0.0)
     payment_date = models.DateField(auto_now_add=True)
+    pay_period = models.ForeignKey(PayPeriod, on_delete=models.PROTECT, related_name="payrolls",
+                                   help_text="The month this payroll pays")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'pay_period'], name='unique_payroll_per_employee_period'),
+        ]
+        indexes = [
+            models.Index(fields=['pay_period', 'employee', 'id'], name='payroll_period_employee_idx'),
+            models.Index(fields=['pay_period', 'net_salary', 'id'], name='payroll_period_net_idx'),
+        ]
 
     def __str__(self):
         return f"Payroll - {self.employee.user.get_username()} ({self.payment_date})"
@@ -123,10 +234,60 @@ class Payroll(models.Model):
 class Payslip(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="payslips")
     payroll = models.OneToOneField(Payroll, on_delete=models.CASCADE, related_name="payslip")
+    pay_period = models.ForeignKey(PayPeriod, on_delete=models.PROTECT, related_name="payslips")
     total_earnings = models.DecimalField(max_digits=10, decimal_places=2)
     total_deductions = models.DecimalField(max_digits=10, decimal_places=2)
     net_pay = models.DecimalField(max_digits=10, decimal_places=2)
     generated_date = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', '-generated_date', '-id'], name='payslip_history_idx'),
+            models.Index(fields=['employee', 'net_pay', 'id'], name='payslip_net_pay_idx'),
+        ]
+
     def __str__(self):
         return f"Payslip - {self.employee.user.get_username()} ({self.generated_date})"
+
+
+class PayrollPeriodRollup(models.Model):
+    """
+    Headcount and payroll totals for one pay period and department,
+    kept in step with the Payroll rows by payroll.rollup.
+    """
+    pay_period = models.ForeignKey(PayPeriod, on_delete=models.CASCADE, related_name="rollups")
+    department = models.CharField(max_length=100)
+    headcount = models.IntegerField(default=0)
+    gross_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.0'))
+    deduction_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.0'))
+    net_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.0'))
+    pf_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.0'))
+    esi_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.0'))
+    pt_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.0'))
+    income_tax_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.0'))
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pay_period', 'department'], name='unique_rollup_period_department'),
+        ]
+        ordering = ['-pay_period__year', '-pay_period__month', 'department']
+
+    def __str__(self):
+        return f"{self.pay_period} {self.department}: {self.headcount} paid"
+
+
+class RuleGeneration(models.Model):
+    """
+    Change marker for cached rule tables.
+
+    Set to a fresh random token on every write to a cached table, so each
+    worker process can tell its in-memory copy is stale with a single
+    primary-key read. A token rather than a counter means a rolled-back
+    bump can never be confused with a later one.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    generation = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.name} ({self.generation})"
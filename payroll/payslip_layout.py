@@ -0,0 +1,107 @@
+"""
+Payslip page layout.
+
+Everything that is the same on every payslip (company header and logo,
+section titles, field labels, footer) is drawn once into a ReportLab form
+XObject. Each slip then places that form and stamps only its values, each
+positioned just after its label. A document holding many slips embeds the
+form (and the logo image) once, however many pages it has.
+"""
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+DEFAULT_COMPANY_NAME = "Company Name Pvt. Ltd."
+FORM_NAME = 'payslip_static'
+
+# (section title, [(data key, label), ...]) in page order.
+SECTIONS = [
+    ("Employee Details", [
+        ('name', "Name: "),
+        ('department', "Department: "),
+        ('date', "Date: "),
+    ]),
+    ("Earnings", [
+        ('basic_pay', "Basic Pay: ₹"),
+        ('da_amount', "DA: ₹"),
+        ('hra_amount', "HRA: ₹"),
+        ('allowances', "Other Allowances: ₹"),
+        ('bonuses', "Bonuses: ₹"),
+    ]),
+    ("Deductions", [
+        ('pf', "PF: ₹"),
+        ('esi', "ESI: ₹"),
+        ('pt', "PT: ₹"),
+        ('income_tax', "Income Tax: ₹"),
+        ('total_deduction', "Total Deductions: ₹"),
+    ]),
+]
+
+
+class PayslipLayout:
+    def __init__(self, company_name=DEFAULT_COMPANY_NAME, logo=None,
+                 title="Employee Payslip",
+                 footer="This is a system-generated payslip and does not require a signature."):
+        self.company_name = company_name
+        self.logo = logo
+        self.title = title
+        self.footer = footer
+        self.width, self.height = A4
+        self.labels = []  # (font, size, x, y, text)
+        self.fields = []  # (font, size, x, y, data key)
+        self._place_fields()
+
+    def _place(self, font, size, x, y, label, key):
+        if label:
+            self.labels.append((font, size, x, y, label))
+        self.fields.append((font, size, x + stringWidth(label, font, size), y, key))
+
+    def _place_fields(self):
+        y = self.height - 150
+        for title, fields in SECTIONS:
+            self.labels.append(("Helvetica-Bold", 12, 50, y, title))
+            y -= 20
+            for key, label in fields:
+                self._place("Helvetica", 10, 70, y, label, key)
+                y -= 15
+            y += 15 - 40
+        self.labels.append(("Helvetica-Bold", 12, 50, y, "Net Pay"))
+        self._place("Helvetica", 11, 70, y - 20, "₹", 'net_pay')
+
+    def draw_static(self, c):
+        width, height = self.width, self.height
+        if self.logo:
+            c.drawImage(self.logo, 50, height - 110, width=60, height=60, preserveAspectRatio=True, mask='auto')
+        c.setFont("Helvetica-Bold", 18)
+        c.drawCentredString(width / 2, height - 80, self.company_name)
+        c.setFont("Helvetica", 12)
+        c.drawCentredString(width / 2, height - 100, self.title)
+        for font, size, x, y, text in self.labels:
+            c.setFont(font, size)
+            c.drawString(x, y, text)
+        c.setFont("Helvetica-Oblique", 9)
+        c.drawCentredString(width / 2, 60, self.footer)
+
+    def stamp(self, c, data):
+        for font, size, x, y, key in self.fields:
+            c.setFont(font, size)
+            c.drawString(x, y, data[key])
+
+    def render(self, slips, out):
+        """Write one page per item of ``slips`` to ``out``, sharing one static form."""
+        c = canvas.Canvas(out, pagesize=A4)
+        c.beginForm(FORM_NAME)
+        self.draw_static(c)
+        c.endForm()
+        for data in slips:
+            c.doForm(FORM_NAME)
+            self.stamp(c, data)
+            c.showPage()
+        c.save()
+
+
+@lru_cache(maxsize=8)
+def get_layout(company_name=DEFAULT_COMPANY_NAME, logo=None):
+    return PayslipLayout(company_name=company_name, logo=logo)
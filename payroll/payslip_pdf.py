@@ -0,0 +1,159 @@
+"""
+Payslip PDF rendering and the on-disk cache in front of it.
+
+A payslip does not change once generated, so each one is rendered once and
+kept under ``PAYSLIP_PDF_CACHE``, in a file named after a keyed hash of
+everything printed on it. The same hash is the download's ETag. A changed
+payroll therefore hashes to a new file; the old one is removed when the
+payroll rows are saved or deleted, or at the latest on the next render.
+
+Rendering goes through the PDF service (``payroll.pdf_service``); the page
+itself is drawn by ``payroll.payslip_layout``.
+``iter_payslip_zip`` streams many payslips as one ZIP archive, writing each
+entry as soon as it is rendered so memory stays flat whatever the headcount.
+"""
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+from payroll.payslip_layout import get_layout
+from payroll.pdf_service import pdf_renderer
+from quickpay.streaming import ChunkSink
+
+# Bump when payroll.payslip_layout changes, so cached files are re-rendered.
+LAYOUT_VERSION = 2
+
+
+def layout_options():
+    """The configurable parts of the layout, carried in each payslip's data."""
+    return {'company_name': settings.PAYSLIP_COMPANY_NAME, 'logo': settings.PAYSLIP_LOGO or None}
+
+
+def payslip_data(payslip):
+    """Everything printed on the payslip, as plain strings."""
+    payroll = payslip.payroll
+    employee = payslip.employee
+    gross = payroll.gross
+    deductions = payroll.deductions
+    return {
+        **layout_options(),
+        'name': employee.user.get_full_name() or employee.user.username,
+        'username': employee.user.username,
+        'department': getattr(employee, 'department', 'N/A'),
+        'date': payslip.generated_date.strftime('%d-%m-%Y'),
+        'basic_pay': str(gross.basic_pay),
+        'da_amount': str(gross.da_amount),
+        'hra_amount': str(gross.hra_amount),
+        'allowances': str(gross.allowances or 0),
+        'bonuses': str(payroll.bonuses or 0),
+        'pf': str(deductions.pf),
+        'esi': str(deductions.esi),
+        'pt': str(deductions.pt),
+        'income_tax': str(deductions.income_tax),
+        'total_deduction': str(deductions.total_deduction),
+        'net_pay': str(payslip.net_pay),
+    }
+
+
+def fingerprint(data):
+    payload = json.dumps([LAYOUT_VERSION, data], sort_keys=True)
+    return salted_hmac('payroll.payslip_pdf', payload, algorithm='sha256').hexdigest()
+
+
+def render_payslip(data, out):
+    """Draw the payslip described by ``data`` as a PDF onto the file-like ``out``."""
+    render_payslips([data], out)
+
+
+def render_payslips(slips, out):
+    """Draw several payslips as one PDF, one page each, sharing the static layout."""
+    layout = get_layout(slips[0]['company_name'], slips[0]['logo'])
+    layout.render(slips, out)
+
+
+def cache_dir(payslip_id):
+    return Path(settings.PAYSLIP_PDF_CACHE) / str(payslip_id)
+
+
+def cached_path(payslip_id, digest):
+    return cache_dir(payslip_id) / f"{digest}.pdf"
+
+
+def store(payslip_id, digest, pdf):
+    """Atomically write rendered ``pdf`` bytes into the cache, dropping older versions."""
+    path = cached_path(payslip_id, digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(pdf)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    for stale in path.parent.glob('*.pdf'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def ensure_rendered(payslip_id, data, digest):
+    """Path of the cached PDF for ``data``, rendering it first if needed."""
+    path = cached_path(payslip_id, digest)
+    if path.exists():
+        return path
+    return store(payslip_id, digest, pdf_renderer().render(render_payslip, data))
+
+
+def evict(payslip_ids):
+    """Drop every cached PDF of the given payslips."""
+    for payslip_id in payslip_ids:
+        shutil.rmtree(cache_dir(payslip_id), ignore_errors=True)
+
+
+def payslip_filename(payslip):
+    return f"Payslip_{payslip.employee.user.username}_{payslip.generated_date}_{payslip.id}.pdf"
+
+
+def iter_payslip_zip(payslips):
+    """
+    Yield a ZIP archive of ``payslips`` chunk by chunk.
+
+    ``payslips`` should have employee__user, payroll__gross and
+    payroll__deductions selected. Cached PDFs are reused; the rest are
+    rendered through the PDF service, several at a time, and cached.
+    Entries keep input order. PDFs are already compressed, so entries
+    are stored.
+    """
+    renderer = pdf_renderer()
+    pending = deque()
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        def write_oldest():
+            name, payslip_id, digest, source = pending.popleft()
+            if isinstance(source, Future):
+                source = store(payslip_id, digest, renderer.result(source))
+            archive.write(source, arcname=name)
+
+        for payslip in payslips:
+            data = payslip_data(payslip)
+            digest = fingerprint(data)
+            path = cached_path(payslip.id, digest)
+            source = path if path.exists() else renderer.submit(render_payslip, data)
+            pending.append((payslip_filename(payslip), payslip.id, digest, source))
+            if len(pending) >= renderer.max_pending:
+                write_oldest()
+                yield sink.drain()
+        while pending:
+            write_oldest()
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,136 @@
+"""
+PDF rendering service.
+
+ReportLab is pure Python and CPU-bound, so rendering in the web or job
+worker thread uses one core. A PdfRenderer runs renderers in a
+ProcessPoolExecutor instead. Renderers are top-level functions
+``renderer(data, out)`` that draw ``data`` (plain, picklable values, never
+model instances) onto the file-like ``out``; the service returns the PDF
+bytes.
+
+At most ``max_pending`` renders are queued or running at once; further
+submissions block until one finishes, so a month-end batch cannot queue
+every payslip in memory. ``timeout`` bounds how long a caller waits for
+one PDF. A running process cannot be interrupted, so the pool a timed-out
+render runs on is retired: new renders go to a fresh pool, while the other
+renders already submitted to the old one still finish there and the stuck
+worker is left to finish on its own.
+
+With one worker everything renders in the calling process, where
+timeouts are not enforced.
+"""
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, TimeoutError
+from io import BytesIO
+
+from django.conf import settings
+
+
+class RenderTimeout(Exception):
+    """A PDF took longer than the configured timeout to render."""
+
+
+def render_bytes(renderer, data):
+    out = BytesIO()
+    renderer(data, out)
+    return out.getvalue()
+
+
+class PdfRenderer:
+    def __init__(self, workers=1, max_pending=None, timeout=None):
+        self.workers = workers
+        self.max_pending = max_pending or 4 * workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        # Future -> the pool it was submitted to, so a timeout retires that pool and no other.
+        self._pools = weakref.WeakKeyDictionary()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers)
+            return self._executor
+
+    def _retire(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # Not cancel_futures: other callers' renders queued on this pool must still complete.
+        executor.shutdown(wait=False)
+
+    def submit(self, renderer, data):
+        """Queue one render and return a Future of its bytes; blocks while the queue is full."""
+        if self.workers <= 1:
+            future = Future()
+            try:
+                future.set_result(render_bytes(renderer, data))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._slots.acquire()
+        try:
+            executor = self._pool()
+            future = executor.submit(render_bytes, renderer, data)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._pools[future] = executor
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def result(self, future):
+        """Wait for a submitted render, raising RenderTimeout after ``timeout`` seconds."""
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            executor = self._pools.get(future)
+            if executor is not None:
+                self._retire(executor)
+            raise RenderTimeout(f"PDF rendering took longer than {self.timeout}s")
+
+    def render(self, renderer, data):
+        """Render one PDF and return its bytes."""
+        return self.result(self.submit(renderer, data))
+
+    def render_many(self, renderer, items):
+        """
+        Render each of ``items`` and yield the PDF bytes in input order,
+        keeping up to ``max_pending`` renders in flight while the caller
+        consumes earlier results.
+        """
+        in_flight = deque()
+        for data in items:
+            if len(in_flight) >= self.max_pending:
+                yield self.result(in_flight.popleft())
+            in_flight.append(self.submit(renderer, data))
+        while in_flight:
+            yield self.result(in_flight.popleft())
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def pdf_renderer():
+    """This process's shared PdfRenderer, configured from settings."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PdfRenderer(
+                workers=settings.PDF_RENDER_WORKERS,
+                max_pending=settings.PDF_RENDER_MAX_PENDING,
+                timeout=settings.PDF_RENDER_TIMEOUT,
+            )
+        return _renderer
@@ -0,0 +1,125 @@
+"""
+Payroll totals per pay period and department.
+
+PayrollPeriodRollup holds, for each PayPeriod and department, the
+headcount and the sums the reports and dashboards show, so reading them
+costs a handful of rows whatever the payroll history holds.
+
+``save_lines`` adds each batch's totals in the transaction that writes the
+batch. The rarer single-row changes (admin edits, deletes, an employee
+moving department) recompute just the periods they touch from the Payroll
+rows. ``rebuild_rollups`` recomputes the whole table. Every change sends
+``rollup_changed`` so cached dashboards can tell.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum, Count
+from django.dispatch import Signal
+from django.utils import timezone
+
+from payroll.models import Payroll, PayrollPeriodRollup
+
+# Sent with sender=PayrollPeriodRollup whenever the rollup changes, from inside the writing transaction.
+rollup_changed = Signal()
+
+# Rollup column -> the Payroll lookup it sums.
+SOURCES = {
+    'gross_total': 'gross__gross_total',
+    'deduction_total': 'deductions__total_deduction',
+    'net_total': 'net_salary',
+    'pf_total': 'deductions__pf',
+    'esi_total': 'deductions__esi',
+    'pt_total': 'deductions__pt',
+    'income_tax_total': 'deductions__income_tax',
+}
+TOTALS = ('headcount', *SOURCES)
+
+
+def _line_totals(line):
+    deductions = line.deductions
+    return {
+        'headcount': 1,
+        'gross_total': line.gross.gross_total,
+        'deduction_total': deductions.total_deduction,
+        'net_total': line.payroll.net_salary,
+        'pf_total': deductions.pf,
+        'esi_total': deductions.esi,
+        'pt_total': deductions.pt,
+        'income_tax_total': deductions.income_tax,
+    }
+
+
+def record_lines(lines):
+    """Add newly saved payroll lines to the rollup. Call inside the transaction that saved them."""
+    deltas = defaultdict(lambda: dict.fromkeys(TOTALS, 0))
+    for line in lines:
+        delta = deltas[(line.payroll.pay_period_id, line.employee.department)]
+        for name, amount in _line_totals(line).items():
+            delta[name] += amount or 0
+    if not deltas:
+        return
+
+    PayrollPeriodRollup.objects.bulk_create(
+        [PayrollPeriodRollup(pay_period_id=pay_period_id, department=department)
+         for pay_period_id, department in deltas],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for (pay_period_id, department), delta in deltas.items():
+        PayrollPeriodRollup.objects.filter(pay_period_id=pay_period_id, department=department).update(
+            updated_on=now, **{name: F(name) + amount for name, amount in delta.items()}
+        )
+    rollup_changed.send(sender=PayrollPeriodRollup)
+
+
+def _sums():
+    return {'headcount': Count('id'), **{name: Sum(source) for name, source in SOURCES.items()}}
+
+
+def rollup_keys(payrolls):
+    """The ``(pay_period_id, department)`` keys a Payroll queryset contributes to."""
+    return set(payrolls.values_list('pay_period_id', 'employee__department').distinct())
+
+
+def refresh_rollups(keys):
+    """Recompute the rollup rows for the given ``(pay_period_id, department)`` keys."""
+    keys = set(keys)
+    if not keys:
+        return
+    for pay_period_id, department in keys:
+        totals = Payroll.objects.filter(
+            pay_period_id=pay_period_id, employee__department=department
+        ).aggregate(**_sums())
+        if totals['headcount']:
+            PayrollPeriodRollup.objects.update_or_create(
+                pay_period_id=pay_period_id, department=department,
+                defaults={name: value or 0 for name, value in totals.items()},
+            )
+        else:
+            PayrollPeriodRollup.objects.filter(pay_period_id=pay_period_id, department=department).delete()
+    rollup_changed.send(sender=PayrollPeriodRollup)
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from the Payroll table. Returns the number of rows."""
+    with transaction.atomic():
+        groups = Payroll.objects.values(
+            'pay_period', department=F('employee__department'),
+        ).annotate(**_sums()).order_by()
+        rows = [
+            PayrollPeriodRollup(pay_period_id=group.pop('pay_period'),
+                                **{name: value if value is not None else 0 for name, value in group.items()})
+            for group in groups
+        ]
+        PayrollPeriodRollup.objects.all().delete()
+        PayrollPeriodRollup.objects.bulk_create(rows, batch_size=1000)
+        rollup_changed.send(sender=PayrollPeriodRollup)
+    return len(rows)
+
+
+def totals(**filters):
+    """Sum of the rollup rows matching ``filters`` (e.g. pay_period, department), zeros if none."""
+    summed = PayrollPeriodRollup.objects.filter(**filters).aggregate(**{name: Sum(name) for name in TOTALS})
+    return {name: value or (0 if name == 'headcount' else Decimal(0)) for name, value in summed.items()}
@@ -0,0 +1,99 @@
+"""
+In-process cache for the rule tables payroll reads on every request.
+
+CommonPay and LeaveLimit change a few times a year, so each process keeps a
+copy in memory and only reloads it when the table's RuleGeneration marker
+changes. The marker lives in the database, which makes invalidation visible
+to every worker process, not just the one that handled the write. It is
+read at most once every RULES_CACHE_TTL seconds: the process that wrote
+sees the change at once, the others within the TTL.
+"""
+from bisect import bisect_right
+from datetime import date
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+
+from employee.models import LeaveLimit
+from payroll.models import CommonPay, RuleGeneration
+
+COMMON_PAY = 'common_pay'
+LEAVE_LIMIT = 'leave_limit'
+
+
+# Table name -> this process's _CachedTable for it.
+_tables = {}
+
+
+def bump_generation(name):
+    """Mark the cached copies of ``name`` stale in every process."""
+    RuleGeneration.objects.update_or_create(name=name, defaults={'generation': uuid4().hex})
+    if name in _tables:
+        _tables[name].clear()
+
+
+class _CachedTable:
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self._state = (object(), None)
+        self._checked_on = None
+        _tables[name] = self
+
+    def get(self):
+        now = monotonic()
+        generation, value = self._state
+        if self._checked_on is not None and now - self._checked_on < settings.RULES_CACHE_TTL:
+            return value
+        current = RuleGeneration.objects.filter(name=self.name).values_list('generation', flat=True).first()
+        if generation != current:
+            value = self.loader()
+            self._state = (current, value)
+        self._checked_on = now
+        return value
+
+    def clear(self):
+        self._state = (object(), None)
+        self._checked_on = None
+
+
+class CommonPayIndex:
+    """All CommonPay rows, with approved ones sorted by effective date."""
+
+    def __init__(self, rows):
+        approved = sorted(
+            (cp for cp in rows if cp.status == 'Approved'),
+            key=lambda cp: (cp.effective_from, cp.id)
+        )
+        self.effective_dates = [cp.effective_from for cp in approved]
+        self.approved = approved
+        self.latest = max(rows, key=lambda cp: (cp.updated_on, cp.id), default=None)
+
+    def in_force(self, on):
+        i = bisect_right(self.effective_dates, on)
+        return self.approved[i - 1] if i else None
+
+
+_common_pay = _CachedTable(COMMON_PAY, lambda: CommonPayIndex(list(CommonPay.objects.all())))
+_leave_limit = _CachedTable(LEAVE_LIMIT, lambda: LeaveLimit.objects.first())
+
+
+def common_pay_in_force(on=None):
+    """The approved CommonPay in force on ``on`` (default today), or None."""
+    return _common_pay.get().in_force(on or date.today())
+
+
+def latest_common_pay():
+    """The most recently updated CommonPay, whatever its status."""
+    return _common_pay.get().latest
+
+
+def leave_limits():
+    return _leave_limit.get()
+
+
+def clear():
+    """Drop this process's cached copies."""
+    _common_pay.clear()
+    _leave_limit.clear()
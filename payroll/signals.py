@@ -0,0 +1,107 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from employee.models import Employee, LeaveLimit
+from payroll import payslip_pdf, rules
+from payroll.engine import PayrollError
+from payroll.models import CommonPay, GrossSalary, TotalDeductions, TaxDeduction, Payroll, Payslip, PayPeriod
+from payroll.rollup import rollup_keys, refresh_rollups
+
+
+@receiver([post_save, post_delete], sender=CommonPay)
+def invalidate_common_pay(sender, **kwargs):
+    rules.bump_generation(rules.COMMON_PAY)
+
+
+@receiver([post_save, post_delete], sender=LeaveLimit)
+def invalidate_leave_limit(sender, **kwargs):
+    rules.bump_generation(rules.LEAVE_LIMIT)
+
+
+# A locked period's records are final: caches keyed on PayPeriod.cache_key
+# never expire, so refuse single-row writes (admin, shell, cascades) to them.
+@receiver([pre_save, pre_delete], sender=GrossSalary)
+@receiver([pre_save, pre_delete], sender=TotalDeductions)
+@receiver([pre_save, pre_delete], sender=TaxDeduction)
+@receiver([pre_save, pre_delete], sender=Payroll)
+@receiver([pre_save, pre_delete], sender=Payslip)
+def guard_locked_period(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Judge by the period as loaded with the instance, if it was; otherwise look it up.
+    if sender.pay_period.is_cached(instance):
+        period = instance.pay_period if instance.pay_period.is_locked else None
+    else:
+        period = PayPeriod.objects.filter(pk=instance.pay_period_id, status='locked').first()
+    if period:
+        raise PayrollError(f"Payroll for {period} is locked.")
+
+
+@receiver([post_save, post_delete], sender=Payslip)
+def evict_payslip_pdf(sender, instance, **kwargs):
+    payslip_pdf.evict([instance.id])
+
+
+@receiver(post_save, sender=Payroll)
+def evict_payroll_pdf(sender, instance, **kwargs):
+    payslip_pdf.evict(Payslip.objects.filter(payroll_id=instance.id).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=GrossSalary)
+@receiver(post_save, sender=TotalDeductions)
+def evict_component_pdf(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    lookup = 'payroll__gross' if sender is GrossSalary else 'payroll__deductions'
+    payslip_pdf.evict(Payslip.objects.filter(**{lookup: instance}).values_list('id', flat=True))
+
+
+# Single-row Payroll writes (admin, shell, cascades). save_lines updates the
+# rollup itself, so these only recompute the periods a change touches.
+@receiver(pre_save, sender=Payroll)
+def payroll_saving(sender, instance, raw=False, **kwargs):
+    instance._previous_rollup_keys = set()
+    if instance.pk and not raw:
+        instance._previous_rollup_keys = rollup_keys(Payroll.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Payroll)
+def payroll_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rollup_keys', set())
+    refresh_rollups(previous | rollup_keys(Payroll.objects.filter(pk=instance.pk)))
+
+
+@receiver(post_delete, sender=Payroll)
+def payroll_deleted(sender, instance, **kwargs):
+    department = Employee.objects.filter(pk=instance.employee_id).values_list('department', flat=True).first()
+    if department is not None:
+        refresh_rollups([(instance.pay_period_id, department)])
+
+
+@receiver(post_save, sender=GrossSalary)
+@receiver(post_save, sender=TotalDeductions)
+def payroll_component_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    lookup = 'gross' if sender is GrossSalary else 'deductions'
+    refresh_rollups(rollup_keys(Payroll.objects.filter(**{lookup: instance})))
+
+
+@receiver(pre_save, sender=Employee)
+def employee_saving(sender, instance, raw=False, **kwargs):
+    instance._previous_department = None
+    if instance.pk and not raw:
+        instance._previous_department = (
+            Employee.objects.filter(pk=instance.pk).values_list('department', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_department', None)
+    if previous is None or previous == instance.department:
+        return
+    moved = rollup_keys(Payroll.objects.filter(employee=instance))
+    refresh_rollups(moved | {(pay_period_id, previous) for pay_period_id, _ in moved})
@@ -0,0 +1,119 @@
+"""
+Versioned, effective-dated statutory rules: PT slabs, the ESI rate and wage
+ceiling, and performance bonus bands.
+
+Schedules are read once from a JSON data file (``STATUTORY_RULES_FILE``,
+defaulting to ``payroll/data/statutory_rules.json``) and compiled into
+integer arrays, so every lookup is a bisect. Each schedule belongs to a
+state; states without a schedule of their own fall back to ``default``.
+"""
+import json
+import sys
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+DEFAULT_STATE = 'default'
+# Upper bound of an open-ended slab; an int, so every comparison stays integral.
+OPEN_END = sys.maxsize
+DEFAULT_RULES_FILE = Path(__file__).resolve().parent / 'data' / 'statutory_rules.json'
+
+
+class SlabTable:
+    """
+    Non-overlapping ``[low, high]`` slabs compiled into sorted integer arrays.
+
+    Bounds and amounts are held in paise; a value that falls in a gap
+    between slabs, or below the first one, maps to 0.
+    """
+
+    def __init__(self, lows, highs, amounts):
+        self.lows = lows
+        self.highs = highs
+        self.amounts = amounts
+
+    @classmethod
+    def compile(cls, slabs):
+        """Build a table from ``(low, high, amount)`` rupee rows; ``high`` may be None."""
+        rows = sorted(slabs)
+        return cls(
+            [low * 100 for low, _, _ in rows],
+            [OPEN_END if high is None else high * 100 for _, high, _ in rows],
+            [amount * 100 for _, _, amount in rows],
+        )
+
+    def scaled(self, factor):
+        """The same table with bounds multiplied by ``factor``; amounts stay in paise."""
+        return SlabTable([low * factor for low in self.lows],
+                         [high * factor for high in self.highs],
+                         self.amounts)
+
+    def lookup(self, value):
+        """Slab amount in paise for ``value`` (in paise, or paise times the scale factor)."""
+        i = bisect_right(self.lows, value) - 1
+        if i >= 0 and value <= self.highs[i]:
+            return self.amounts[i]
+        return 0
+
+
+class StatutoryRules(NamedTuple):
+    state: str
+    effective_from: date
+    esi_rate: Decimal
+    esi_ceiling: int
+    professional_tax: SlabTable
+    bonus_percentage: dict
+
+    def bonus_percent(self, rating):
+        return self.bonus_percentage.get(rating, 0)
+
+
+class Registry:
+    def __init__(self, schedules):
+        by_state = {}
+        for rules in sorted(schedules, key=lambda r: r.effective_from):
+            by_state.setdefault(rules.state, []).append(rules)
+        self._schedules = by_state
+        self._dates = {state: [r.effective_from for r in rows] for state, rows in by_state.items()}
+
+    def resolve(self, on=None, state=DEFAULT_STATE):
+        """The schedule in force on ``on`` (default today) for ``state``."""
+        on = on or date.today()
+        for candidate in (state, DEFAULT_STATE):
+            i = bisect_right(self._dates.get(candidate, []), on)
+            if i:
+                return self._schedules[candidate][i - 1]
+        raise LookupError(f"No statutory rules in force on {on} for state {state!r}")
+
+
+def parse_schedule(data):
+    return StatutoryRules(
+        state=data.get('state', DEFAULT_STATE),
+        effective_from=date.fromisoformat(data['effective_from']),
+        esi_rate=Decimal(data['esi']['rate']),
+        esi_ceiling=int(data['esi']['wage_ceiling']),
+        professional_tax=SlabTable.compile(tuple(row) for row in data['professional_tax']),
+        bonus_percentage={int(rating): percent for rating, percent in data['bonus_percentage'].items()},
+    )
+
+
+def load_registry(path):
+    with open(path, encoding='utf-8') as f:
+        return Registry([parse_schedule(s) for s in json.load(f)['schedules']])
+
+
+@lru_cache(maxsize=None)
+def registry():
+    from django.conf import settings
+
+    path = DEFAULT_RULES_FILE
+    if settings.configured:
+        path = getattr(settings, 'STATUTORY_RULES_FILE', path)
+    return load_registry(path)
+
+
+def rules_in_force(on=None, state=DEFAULT_STATE):
+    return registry().resolve(on, state)
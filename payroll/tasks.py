@@ -0,0 +1,33 @@
+import tempfile
+
+from django.core.files import File
+
+from jobs.queue import heartbeat, with_heartbeat
+from jobs.registry import task
+from payroll.engine import PayrollError, run_bulk_payroll, period_payslips
+from payroll.models import PayrollRun
+from payroll.payslip_pdf import iter_payslip_zip
+
+BULK_PAYROLL_JOB = 'payroll.run_bulk_payroll'
+PAYSLIP_EXPORT_JOB = 'payroll.export_payslips'
+
+
+@task(BULK_PAYROLL_JOB, concurrency=1, max_attempts=3, backoff=60, fatal=(PayrollError, PayrollRun.DoesNotExist))
+def bulk_payroll(job):
+    """Run (or resume) the month-end PayrollRun named in the payload."""
+    run = PayrollRun.objects.get(id=job.payload['run_id'])
+    result = run_bulk_payroll(run.month, run.year, progress=lambda run: heartbeat(job))
+    return {'run_id': run.id, 'processed': result.processed, 'elapsed': round(result.elapsed, 2)}
+
+
+@task(PAYSLIP_EXPORT_JOB, concurrency=2)
+def export_payslips(job):
+    """Write every payslip of the month into one ZIP, attached to the job."""
+    month, year = job.payload['month'], job.payload['year']
+    payslips = period_payslips(month, year)
+    with tempfile.TemporaryFile() as archive:
+        for chunk in with_heartbeat(job, iter_payslip_zip(payslips.iterator(chunk_size=500))):
+            archive.write(chunk)
+        archive.seek(0)
+        job.output.save(f"payslips_{year}_{month:02d}.zip", File(archive), save=False)
+    return {'month': month, 'year': year, 'payslips': payslips.count()}
@@ -1,3 +1,474 @@
-from django.test import TestCase
+import io
+import random
+import tempfile
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from employee.models import Employee
+from jobs.models import Job
+from jobs.queue import work
+from payroll import calculation, rollup, rules
+from payroll.calculation import RuleSet, PayrollInput, compute_batch, from_paise
+from payroll import engine
+from payroll.engine import run_bulk_payroll
+from payroll.models import CommonPay, Payroll, PayrollPeriodRollup, PayrollRun, Payslip, RuleGeneration
+from payroll.payslip_layout import PayslipLayout
+from payroll.payslip_pdf import fingerprint, payslip_data
+from payroll.pdf_service import PdfRenderer, RenderTimeout
+from payroll.statutory import SlabTable, Registry, rules_in_force
+from reports.queries import payroll_summary_rows, payroll_summary_totals
+from user.models import User
+
+# The slab table and ESI rate that used to be hard-coded in payroll.models.
+LEGACY_PT_SLABS = [
+    (12000, 17999, 320),
+    (18000, 29999, 450),
+    (30000, 44999, 600),
+    (45000, 99999, 750),
+    (100000, 124999, 1000),
+    (125000, float('inf'), 1250),
+]
+LEGACY_ESI_RATE = Decimal('0.0075')
+
+
+def decimal_payroll(inp, rule_set):
+    """The original per-row Decimal computation from run_payroll/TotalDeductions."""
+    basic_pay = from_paise(inp.basic_pay)
+    other_allowances = from_paise(inp.other_allowances)
+    bonus = from_paise(inp.bonus)
+    tax_amt = from_paise(inp.income_tax)
+    # run_payroll divided by the days first, which lands a hair off a half-paisa tie; this is exact.
+    leave_deduction = basic_pay * inp.lop_days / rule_set.days_in_period
+
+    da_amount = basic_pay * Decimal(rule_set.da / 100)
+    hra_amount = basic_pay * Decimal(rule_set.hra / 100)
+    gross_total = basic_pay + da_amount + hra_amount + other_allowances + bonus
+    pf = basic_pay * Decimal(rule_set.pf / 100)
+    pt = Decimal('0.0')
+    for min_salary, max_salary, slab_amount in LEGACY_PT_SLABS:
+        if min_salary <= gross_total <= max_salary:
+            pt = slab_amount
+            break
+    esi = gross_total * LEGACY_ESI_RATE if gross_total <= 21000 else Decimal('0.0')
+    total = pf + esi + pt + tax_amt + leave_deduction
+    return [
+        Decimal(value).quantize(Decimal('0.01'))
+        for value in (da_amount, hra_amount, da_amount + hra_amount + other_allowances + bonus,
+                      gross_total, pf, esi, pt, leave_deduction, total, gross_total - total)
+    ]
+
+
+class CalculationKernelTests(SimpleTestCase):
+    def test_matches_decimal_path(self):
+        rng = random.Random(42)
+        rule_sets = (RuleSet(da=10.0, hra=12.5, pf=12.0), RuleSet(da=7.3, hra=20.0, pf=0.0),
+                     RuleSet(da=10.0, hra=12.5, pf=12.0, days_in_period=31))
+        for rule_set in rule_sets:
+            inputs = [
+                PayrollInput(
+                    basic_pay=rng.randint(500000, 20000000),
+                    other_allowances=rng.choice([0, rng.randint(0, 500000)]),
+                    bonus=rng.choice([0, rng.randint(0, 500000)]),
+                    lop_days=rng.choice([0, 0, rng.randint(1, rule_set.days_in_period)]),
+                    income_tax=rng.randint(0, 300000),
+                )
+                for _ in range(2000)
+            ]
+            # Basic pays whose per-day rate has no exact paisa, some landing on a half paisa.
+            inputs += [PayrollInput(basic_pay=basic, lop_days=lop_days)
+                       for basic in (1000001, 1000005, 1000015, 1999999, 2000015) for lop_days in (1, 3, 7, 29)]
+            for inp, result in zip(inputs, compute_batch(inputs, rule_set)):
+                got = [from_paise(value) for value in (
+                    result.da_amount, result.hra_amount, result.allowances, result.gross_total,
+                    result.pf, result.esi, result.pt, result.lop_deduction, result.total_deduction,
+                    result.net_salary,
+                )]
+                self.assertEqual(got, decimal_payroll(inp, rule_set), inp)
+
+    def test_loss_of_pay_is_deducted(self):
+        rule_set = RuleSet(da=0.0, hra=0.0, pf=0.0)
+        result, = compute_batch([PayrollInput(basic_pay=3000000, lop_days=3)], rule_set)
+        self.assertEqual(result.lop_deduction, 300000)
+        self.assertEqual(result.net_salary, 3000000 - 300000 - 60000)
+
+
+class StatutoryRulesTests(SimpleTestCase):
+    def test_slab_lookup(self):
+        table = SlabTable.compile([(12000, 17999, 320), (18000, 29999, 450), (30000, None, 600)])
+        self.assertEqual(table.lookup(1199999), 0)
+        self.assertEqual(table.lookup(1200000), 32000)
+        self.assertEqual(table.lookup(1799950), 0)  # gap between slabs
+        self.assertEqual(table.lookup(Decimal('2999900')), 45000)
+        self.assertEqual(table.lookup(10 ** 12), 60000)
+        self.assertTrue(all(type(bound) is int for bound in table.highs + table.scaled(31).highs))
+
+    def test_state_schedules_fall_back_to_default(self):
+        default = rules_in_force(date(2025, 1, 1))
+        karnataka = default._replace(state='KA', effective_from=date(2025, 4, 1),
+                                     professional_tax=SlabTable.compile([(25000, None, 200)]))
+        registry = Registry([default, karnataka])
+        self.assertIs(registry.resolve(date(2025, 3, 31), 'KA'), default)
+        self.assertIs(registry.resolve(date(2025, 4, 1), 'KA'), karnataka)
+        self.assertIs(registry.resolve(date(2025, 4, 1), 'MH'), default)
+
+
+def render_label(data, out):
+    out.write(f"%PDF {data}".encode())
+
+
+def render_slowly(data, out):
+    time.sleep(data)
+
+
+class PdfServiceTests(SimpleTestCase):
+    def test_pool_renders_in_order(self):
+        renderer = PdfRenderer(workers=2, max_pending=2)
+        try:
+            self.assertEqual(list(renderer.render_many(render_label, range(5))),
+                             [f"%PDF {i}".encode() for i in range(5)])
+        finally:
+            renderer.close()
+        self.assertEqual(PdfRenderer().render(render_label, 'x'), b"%PDF x")
+
+    def test_timeout(self):
+        renderer = PdfRenderer(workers=2, timeout=0.2)
+        with self.assertRaises(RenderTimeout):
+            renderer.render(render_slowly, 2)
+        renderer.close()
+
+    def test_timeout_spares_other_renders(self):
+        renderer = PdfRenderer(workers=2, timeout=0.5)
+        stuck = renderer.submit(render_slowly, 2)
+        others = [renderer.submit(render_slowly, 0.8)] + [renderer.submit(render_label, i) for i in range(4)]
+        pool = renderer._executor  # kept alive, as it is while any caller still holds it
+        with self.assertRaises(RenderTimeout):
+            renderer.result(stuck)
+        self.assertEqual([renderer.result(future) for future in others],
+                         [b""] + [f"%PDF {i}".encode() for i in range(4)])
+        self.assertEqual(renderer.render(render_label, 'next'), b"%PDF next")
+        self.assertIsNot(renderer._executor, pool)
+        renderer.close()
+
+
+class PayslipLayoutTests(SimpleTestCase):
+    def slip(self, name):
+        return {'company_name': "Acme Ltd.", 'logo': None, 'name': name, 'department': 'it', 'date': '31-03-2025',
+                'basic_pay': '20000.00', 'da_amount': '2000.00', 'hra_amount': '2500.00', 'allowances': '0',
+                'bonuses': '0', 'pf': '2400.00', 'esi': '0.00', 'pt': '200.00', 'income_tax': '0',
+                'total_deduction': '2600.00', 'net_pay': '21900.00'}
+
+    def test_static_form_is_embedded_once(self):
+        out = io.BytesIO()
+        PayslipLayout("Acme Ltd.").render([self.slip(f"Employee {i}") for i in range(3)], out)
+        pdf = out.getvalue()
+        self.assertEqual(pdf.count(b'/Subtype /Form'), 1)
+        self.assertEqual(pdf.count(b'/Type /Page\n'), 3)
+
+    def test_values_follow_their_labels(self):
+        layout = PayslipLayout()
+        fields = {key: (x, y) for font, size, x, y, key in layout.fields}
+        labels = {(x, y): text for font, size, x, y, text in layout.labels}
+        self.assertGreater(fields['name'][0], 70)
+        self.assertEqual(labels[(70, fields['name'][1])], "Name: ")
+
+
+class RuleCacheTests(TestCase):
+    def setUp(self):
+        rules.clear()
+
+    def test_resolves_rule_in_force_and_invalidates_on_save(self):
+        old = CommonPay.objects.create(da=10, hra=10, pf=12, effective_from=date(2024, 4, 1), status='Approved')
+        new = CommonPay.objects.create(da=12, hra=10, pf=12, effective_from=date(2025, 4, 1))
+
+        self.assertEqual(rules.common_pay_in_force(date(2025, 6, 1)), old)
+        self.assertIsNone(rules.common_pay_in_force(date(2024, 3, 31)))
+        with self.assertNumQueries(0):
+            rules.common_pay_in_force(date(2025, 6, 1))
+        with override_settings(RULES_CACHE_TTL=0), self.assertNumQueries(1):
+            rules.common_pay_in_force(date(2025, 6, 1))
+
+        new.status = 'Approved'
+        new.save()
+        self.assertEqual(rules.common_pay_in_force(date(2025, 6, 1)), new)
+        self.assertEqual(rules.common_pay_in_force(date(2025, 3, 31)), old)
+
+        # Another process's write is seen once the cached copy's TTL is up.
+        CommonPay.objects.filter(pk=old.pk).update(da=11)
+        RuleGeneration.objects.filter(name=rules.COMMON_PAY).update(generation='elsewhere')
+        self.assertEqual(rules.common_pay_in_force(date(2025, 3, 31)).da, 10)
+        with override_settings(RULES_CACHE_TTL=0):
+            self.assertEqual(rules.common_pay_in_force(date(2025, 3, 31)).da, 11)
+
+
+class PayrollRunTests(TestCase):
+    def setUp(self):
+        rules.clear()
+        CommonPay.objects.create(da=10, hra=12.5, pf=12, effective_from=date(2024, 4, 1), status='Approved')
+        self.manager = User.objects.create_user('pm', password='pw', role='payroll_manager', office_mail='pm@x')
+        for i in range(3):
+            user = User.objects.create_user(f'e{i}', office_mail=f'e{i}@x')
+            Employee.objects.create(user=user, hire_date=date(2024, 1, 1), salary=Decimal('25000.00') * (i + 1))
+
+    def test_preview_only_reads(self):
+        self.client.force_login(self.manager)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('payroll_preview'), {'month': 3, 'year': 2025, 'tax_amt': '100'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 3)
+        writes = [q['sql'] for q in ctx.captured_queries
+                  if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+                  and 'django_session' not in q['sql']]
+        self.assertEqual(writes, [])
+
+    def test_single_employee_preview_matches_its_run(self):
+        employee = Employee.objects.order_by('id').first()
+        employee.status = 'on_leave'
+        employee.save()
+        self.client.force_login(self.manager)
+        page = self.client.get(reverse('run_payroll', args=[employee.id]))
+        self.assertContains(page, f'name="employee" value="{employee.id}"')
+
+        today = date.today()
+        response = self.client.get(reverse('payroll_preview'), {
+            'month': today.month, 'year': today.year, 'employee': employee.id,
+            'other_allowances': '500', 'tax_amt': '100',
+        })
+        line, = response.context['page']
+        self.assertEqual(line.employee, employee)
+
+        self.client.post(reverse('run_payroll', args=[employee.id]), {'other_allowances': '500', 'tax_amt': '100'})
+        self.assertEqual(Payroll.objects.get(employee=employee).net_salary, line.amounts.net_salary)
+
+    def test_bulk_run_matches_preview(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('payroll_preview'), {'month': 3, 'year': 2025, 'tax_amt': '0',
+                                                                'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        preview_net = sorted(Decimal(row.split(',')[-1]) for row in response.content.decode().splitlines()[1:])
+
+        result = run_bulk_payroll(3, 2025)
+        self.assertEqual(result.processed, 3)
+        self.assertEqual(sorted(Payroll.objects.values_list('net_salary', flat=True)), preview_net)
+
+    def test_run_starts_one_process_pool(self):
+        user = User.objects.create_user('e3', office_mail='e3@x')
+        Employee.objects.create(user=user, hire_date=date(2024, 1, 1), salary=Decimal('40000.00'))
+        with mock.patch.object(calculation, 'ProcessPoolExecutor', wraps=calculation.ProcessPoolExecutor) as pool:
+            result = run_bulk_payroll(3, 2025, workers=2, chunk_size=2)
+        self.assertEqual(result.processed, 4)
+        self.assertEqual(pool.call_count, 1)
+
+    def test_run_refuses_while_running_and_on_changed_figures(self):
+        run_bulk_payroll(3, 2025, tax_amt=Decimal('100'), chunk_size=2)
+        with self.assertRaisesMessage(engine.PayrollError, "was started with"):
+            run_bulk_payroll(3, 2025, tax_amt=Decimal('200'))
+
+        run = PayrollRun.objects.get(year=2025, month=3)
+        PayrollRun.objects.filter(pk=run.pk).update(status='running')
+        with self.assertRaisesMessage(engine.PayrollError, "already running"):
+            run_bulk_payroll(3, 2025)
+
+        PayrollRun.objects.filter(pk=run.pk).update(updated_on=timezone.now() - timedelta(hours=2))
+        with override_settings(JOBS_LOCK_TIMEOUT=3600):
+            self.assertEqual(run_bulk_payroll(3, 2025).run.status, 'completed')
+
+    def test_completed_month_pays_employees_added_since(self):
+        returning = Employee.objects.order_by('id').first()
+        returning.status = 'on_leave'
+        returning.save()
+        self.assertEqual(run_bulk_payroll(3, 2025).processed, 2)
+        self.assertEqual(run_bulk_payroll(3, 2025).processed, 0)
+
+        returning.status = 'active'
+        returning.save()
+        result = run_bulk_payroll(3, 2025)
+        self.assertEqual(result.processed, 1)
+        self.assertEqual((result.run.status, result.run.processed_employees), ('completed', 3))
+        self.assertEqual(Payroll.objects.filter(employee=returning).count(), 1)
+
+    def test_concurrent_single_run_reports_already_processed(self):
+        employee = Employee.objects.first()
+        self.client.force_login(self.manager)
+        with mock.patch('payroll.views.save_lines', side_effect=IntegrityError):
+            response = self.client.post(reverse('run_payroll', args=[employee.id]),
+                                        {'other_allowances': '0', 'tax_amt': '0'}, follow=True)
+        self.assertRedirects(response, reverse('views_payslips', args=[employee.id]))
+        self.assertIn('has already been processed', [str(m) for m in response.context['messages']][0])
+
+    def test_failed_run_resumes_without_duplicates(self):
+        save_lines = engine.save_lines
+
+        def fail_second_chunk(lines):
+            if Payroll.objects.exists():
+                raise RuntimeError("database went away")
+            save_lines(lines)
+
+        with mock.patch.object(engine, 'save_lines', fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                run_bulk_payroll(3, 2025, chunk_size=2)
+        run = PayrollRun.objects.get(year=2025, month=3)
+        self.assertEqual((run.status, run.processed_employees), ('failed', 2))
+
+        self.assertEqual(run_bulk_payroll(3, 2025).processed, 1)
+        self.assertEqual(run_bulk_payroll(3, 2025).processed, 0)
+        self.assertEqual(Payroll.objects.filter(pay_period__year=2025, pay_period__month=3).count(), 3)
+
+    def test_bulk_view_queues_run_for_worker(self):
+        self.client.force_login(self.manager)
+        data = {'month': 3, 'year': 2025, 'other_allowances': '0', 'tax_amt': '0'}
+        response = self.client.post(reverse('bulk_run_payroll'), data)
+        run = PayrollRun.objects.get(year=2025, month=3)
+        self.assertRedirects(response, reverse('payroll_run_status', args=[run.id]))
+        self.client.post(reverse('bulk_run_payroll'), data)
+        self.assertEqual(Payroll.objects.count(), 0)
+
+        self.assertEqual(work(once=True), 1)
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.processed_employees), ('completed', 3))
+
+    def test_payslip_pdf_is_cached_and_revalidated(self):
+        run_bulk_payroll(3, 2025)
+        payslip = Payslip.objects.select_related('payroll', 'employee__user').first()
+        self.client.force_login(payslip.employee.user)
+        url = reverse('generate_payslip_pdf', args=[payslip.id])
+
+        with override_settings(PAYSLIP_PDF_CACHE=tempfile.mkdtemp()):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+            etag = response['ETag']
+            response.close()
+
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            payslip.net_pay += 1
+            payslip.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            response.close()
+
+    def test_combined_payslip_pdf_and_company_name_setting(self):
+        run_bulk_payroll(3, 2025)
+        payslip = Payslip.objects.select_related('payroll__gross', 'payroll__deductions', 'employee__user').first()
+        with override_settings(PAYSLIP_COMPANY_NAME="Acme Ltd."):
+            data = payslip_data(payslip)
+        self.assertEqual(data['company_name'], "Acme Ltd.")
+        self.assertNotEqual(fingerprint(data), fingerprint(payslip_data(payslip)))
+
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('export_payslips'), {'month': 3, 'year': 2025, 'format': 'pdf'})
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response.content.count(b'/Type /Page\n'), 3)
+        self.assertEqual(response.content.count(b'/Subtype /Form'), 1)
+
+    def test_summary_pdf_streams_rows_in_one_query(self):
+        run_bulk_payroll(3, 2025)
+        with self.assertNumQueries(1):
+            rows = list(payroll_summary_rows(3, 2025))
+        self.assertEqual(len(rows), 3)
+
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.post(reverse('generate_payroll_pdf'), {'month': 3, 'year': 2025}).status_code,
+                         403)
+        hr = User.objects.create_user('hr', role='hr_manager', office_mail='hr@x')
+        self.client.force_login(hr)
+        self.assertEqual(self.client.get(reverse('generate_payroll_pdf'), {'month': 3, 'year': 2025}).status_code,
+                         405)
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            first = self.client.post(reverse('generate_payroll_pdf'), {'month': 3, 'year': 2025})
+            again = self.client.post(reverse('generate_payroll_pdf'), {'month': 3, 'year': 2025})
+            self.assertEqual(first.url, again.url)
+            self.assertEqual(work(once=True), 1)
+            with Job.objects.get().output.open('rb') as f:
+                self.assertTrue(f.read().startswith(b'%PDF'))
+
+    def rollup_rows(self):
+        return list(PayrollPeriodRollup.objects.order_by('department').values_list(
+            'department', 'headcount', 'gross_total', 'net_total', 'pf_total', 'pt_total'))
+
+    def test_rollup_follows_payroll_writes_and_matches_rebuild(self):
+        run_bulk_payroll(3, 2025)
+        totals = rollup.totals(pay_period__year=2025, pay_period__month=3)
+        self.assertEqual(totals['headcount'], 3)
+        self.assertEqual(totals['net_total'], sum(Payroll.objects.values_list('net_salary', flat=True)))
+
+        payroll = Payroll.objects.select_related('employee').order_by('id').first()
+        payroll.net_salary += 100
+        payroll.save()
+        payroll.employee.department = 'hr'
+        payroll.employee.save()
+        Payroll.objects.order_by('id').last().delete()
+        incremental = self.rollup_rows()
+        self.assertEqual([(department, headcount) for department, headcount, *_ in incremental],
+                         [('hr', 1), ('it', 1)])
+
+        rollup.rebuild_rollups()
+        self.assertEqual(self.rollup_rows(), incremental)
+
+        with mock.patch.object(PayrollPeriodRollup.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                rollup.rebuild_rollups()
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_locked_period_is_frozen_and_totals_cached(self):
+        run_bulk_payroll(3, 2025)
+        period = engine.set_period_lock(3, 2025, locked=True)
+        self.assertIsNotNone(period.locked_on)
+        with self.assertRaises(engine.PayrollError):
+            run_bulk_payroll(3, 2025)
+        payroll = Payroll.objects.select_related('payslip', 'pay_period').first()
+        with self.assertRaises(engine.PayrollError), self.assertNumQueries(0):
+            payroll.save()
+        with self.assertRaises(engine.PayrollError), transaction.atomic():
+            payroll.payslip.delete()
+
+        cache.clear()
+        totals = payroll_summary_totals(3, 2025)
+        self.assertEqual(totals.net, sum(Payroll.objects.values_list('net_salary', flat=True)))
+        with self.assertNumQueries(1):
+            self.assertEqual(payroll_summary_totals(3, 2025), totals)
+
+        period = engine.set_period_lock(3, 2025, locked=False)
+        self.assertIsNone(period.cache_key('payroll_summary_totals'))
+        payroll.pay_period = period
+        payroll.net_salary += 1
+        payroll.save()
+        self.assertEqual(payroll_summary_totals(3, 2025).net, totals.net + 1)
+
+    def test_locking_mid_run_stops_before_the_next_chunk(self):
+        def lock(run):
+            engine.set_period_lock(3, 2025, locked=True)
+
+        with self.assertRaises(engine.PayrollError):
+            run_bulk_payroll(3, 2025, chunk_size=2, progress=lock)
+        run = PayrollRun.objects.get(year=2025, month=3)
+        self.assertEqual((run.status, run.processed_employees), ('failed', 2))
+        self.assertEqual(Payroll.objects.count(), 2)
+
+    def test_payslip_zip_export_streams_every_payslip(self):
+        run_bulk_payroll(3, 2025)
+        self.client.force_login(self.manager)
+        with override_settings(PAYSLIP_PDF_CACHE=tempfile.mkdtemp(), MEDIA_ROOT=tempfile.mkdtemp()):
+            response = self.client.get(reverse('export_payslips'), {'month': 3, 'year': 2025})
+            self.assertTrue(response.streaming)
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+            self.assertEqual(len(archive.namelist()), 3)
+            self.assertIsNone(archive.testzip())
+
+            self.client.get(reverse('export_payslips'), {'month': 3, 'year': 2025, 'background': 1})
+            self.assertEqual(work(once=True), 1)
+            job = Job.objects.get()
+            self.assertEqual(job.result['payslips'], 3)
+            with job.output.open('rb') as f:
+                self.assertEqual(sorted(zipfile.ZipFile(f).namelist()), sorted(archive.namelist()))
@@ -8,9 +8,13 @@ urlpatterns = [
     path('edit_common_pay/<int:commonpay_id>/', payroll.views.edit_common_pay, name='edit_common_pay'),
     path('change_pay/<int:commonpay_id>/', payroll.views.change_pay, name='change_pay'),
     path('run_payroll/<int:employee_id>/', payroll.views.run_payroll, name='run_payroll'),
+    path('bulk_run_payroll', payroll.views.bulk_run_payroll, name='bulk_run_payroll'),
+    path('payroll_run_status/<int:run_id>/', payroll.views.payroll_run_status, name='payroll_run_status'),
+    path('payroll_preview', payroll.views.payroll_preview, name='payroll_preview'),
     path('approve_pay/<int:commonpay_id>/', payroll.views.approve_pay, name='approve_pay'),
     path('hr_view_pay', payroll.views.hr_view_pay, name='hr_view_pay'),
     path('generate_payslip_pdf/<int:payslip_id>/', payroll.views.generate_payslip_pdf, name='generate_payslip_pdf'),
+    path('export_payslips', payroll.views.export_payslips, name='export_payslips'),
     path('views_pay_salary', payroll.views.views_pay_salary, name='views_pay_salary'),
     path('view_payslips', payroll.views.view_payslips, name='view_payslips'),
     path('payment_history', payroll.views.payment_history, name='payment_history'),
@@ -1,22 +1,40 @@
+import csv
 from datetime import date
 from decimal import Decimal
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import Group
+from django.core.paginator import Paginator
+from django.db import IntegrityError
 from django.db.models import Sum
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.defaultfilters import floatformat
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-
-from employee.models import Employee, LeaveRequest, PerformanceReview
-from payroll.forms import GetPayElementsForm, EditCommonPayForm, PayrollManagerForm
-from payroll.models import Payslip, CommonPay, Payroll, GrossSalary, TotalDeductions, TaxDeduction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from employee.leave_calendar import LeaveCalendar
+from employee.models import Employee
+from employee.performance import latest_reviews
+from jobs.models import Job
+from jobs.queue import enqueue
+from payroll.calculation import RuleSet, compute_batch
+from payroll.engine import (open_payroll_run, preview_payroll, PayrollError, payroll_input, build_line, save_lines,
+                            open_pay_period, pending_employees, period_payslips)
+from payroll.forms import GetPayElementsForm, EditCommonPayForm, PayrollManagerForm, BulkPayrollForm
+from payroll.models import Payslip, CommonPay, Payroll, PayrollRun
+from payroll.payslip_pdf import (payslip_data, fingerprint, cached_path, ensure_rendered, iter_payslip_zip,
+                                 render_payslips)
+from payroll.pdf_service import pdf_renderer
+from payroll.rules import latest_common_pay, common_pay_in_force
+from payroll.tasks import BULK_PAYROLL_JOB, PAYSLIP_EXPORT_JOB
+from quickpay.pagination import KeysetPaginator
 from user.models import Notification
 from user.views import create_notification
 
+PAYSLIP_SORTS = {'generated': 'generated_date', 'net': 'net_pay'}
+
 
 # Create your views here.
 
@@ -39,7 +57,7 @@ def get_pay_salary(request):
 
 @login_required()
 def view_pay_salary(request):
-    cp = CommonPay.objects.order_by('-updated_on').first()
+    cp = latest_common_pay()
     return render(request, 'view_pay_salary.html', {'cp': cp})
 
 
@@ -63,7 +81,7 @@ def edit_common_pay(request, commonpay_id):
 
 @login_required()
 def hr_view_pay(request):
-    cp = CommonPay.objects.order_by('-updated_on').first()
+    cp = latest_common_pay()
     return render(request, 'hr_view_pay.html', {'cp': cp})
 
 
@@ -113,98 +131,60 @@ def change_pay(request, commonpay_id):
     return render(request, 'change_pay.html', {'common_pay': common_pay})
 
 
+def _already_processed(request, employee, today):
+    messages.error(
+        request,
+        f"Payroll for {employee.user.get_username()} has already been processed for {today.strftime('%B %Y')}."
+    )
+    return redirect('views_payslips', employee_id=employee.id)
+
+
 @login_required()
 def run_payroll(request, employee_id):
     employee = get_object_or_404(Employee, id=employee_id)
     today = date.today()
 
-    common_pay = CommonPay.objects.filter(status='Approved').order_by('-effective_from').first()
+    common_pay = common_pay_in_force(today)
     if not common_pay:
         messages.error(request, "No approved Common Pay rules available.")
         return redirect('view_employees')
 
-    unpaid_leaves = LeaveRequest.objects.filter(
-        em=employee,
-        status='approved',
-        type='unpaid',
-        start_date__month=today.month,
-        start_date__year=today.year
-    )
-    unpaid_days = sum((leave.end_date - leave.start_date).days + 1 for leave in unpaid_leaves)
+    try:
+        pay_period = open_pay_period(today.month, today.year)
+    except PayrollError as e:
+        messages.error(request, str(e))
+        return redirect('view_employees')
+
+    period_start, period_end = pay_period.start, pay_period.end
+    unpaid_days = LeaveCalendar.for_period(period_start, period_end, [employee.id]).lop_days(employee.id)
     total_days = 30
     per_day_salary = employee.salary / total_days if employee.salary else 0
 
-    latest_review = (
-        PerformanceReview.objects.filter(employee=employee)
-        .order_by('-review_date')
-        .first()
-    )
+    latest_review = latest_reviews([employee.id], on=period_end).get(employee.id)
 
     if latest_review:
         performance_bonus = latest_review.bonus_amount
     else:
         performance_bonus = Decimal(0.0)
 
+    if Payroll.objects.filter(employee=employee, pay_period=pay_period).exists():
+        return _already_processed(request, employee, today)
+
     if request.method == 'POST':
         form = PayrollManagerForm(request.POST)
         if form.is_valid():
-            basic_pay = employee.salary
             other_allowances = form.cleaned_data.get('other_allowances') or Decimal(0.0)
             tax_amt = form.cleaned_data.get('tax_amt') or Decimal(0.0)
 
-            da_amount = basic_pay * Decimal(common_pay.da / 100)
-            hra_amount = basic_pay * Decimal(common_pay.hra / 100)
-            gross_total = basic_pay + da_amount + hra_amount + other_allowances + performance_bonus
-
-            gross_record = GrossSalary.objects.create(
-                employee=employee,
-                basic_pay=basic_pay,
-                da_amount=da_amount,
-                hra_amount=hra_amount,
-                allowances=da_amount + hra_amount + other_allowances + performance_bonus,
-                gross_total=gross_total
-            )
-
-            pf_amount = basic_pay * Decimal(common_pay.pf / 100)
-            esi_amount = gross_total * Decimal(common_pay.esi / 100) if gross_total <= 21000 else Decimal(0.0)
-            leave_deduction = unpaid_days * per_day_salary
-
-            td = TotalDeductions.objects.create(
-                employee=employee,
-                pf=pf_amount,
-                esi=esi_amount,
-                income_tax=tax_amt or Decimal(0.0),
-                gross_salary_amount=gross_total
-            )
-
-            if tax_amt > 0:
-                TaxDeduction.objects.create(
-                    employee=employee,
-                    deduction_summary=td,
-                    tax_amt=tax_amt,
-                    applicable_date=today
-                )
-
-            td.total_deduction += leave_deduction
-            td.save()
-
-            net_salary = gross_total - td.total_deduction
-
-            payroll_record = Payroll.objects.create(
-                employee=employee,
-                gross=gross_record,
-                deductions=td,
-                net_salary=net_salary,
-                bonuses=performance_bonus
-            )
-
-            Payslip.objects.create(
-                employee=employee,
-                payroll=payroll_record,
-                total_earnings=gross_total,
-                total_deductions=td.total_deduction,
-                net_pay=net_salary
-            )
+            inputs = [payroll_input(employee, unpaid_days, performance_bonus, other_allowances, tax_amt)]
+            result, = compute_batch(inputs, RuleSet.from_common_pay(common_pay, today))
+            line = build_line(employee, result, pay_period)
+            try:
+                save_lines([line])
+            except IntegrityError:
+                # Another request paid the employee between the check above and this write.
+                return _already_processed(request, employee, today)
+            net_salary = line.payroll.net_salary
 
             create_notification(
                 user=employee.user,
@@ -236,9 +216,148 @@ def run_payroll(request, employee_id):
         'common_pay': common_pay,
         'summary': summary,
         'performance_bonus': performance_bonus,
+        'period': pay_period,
+    })
+
+
+@login_required()
+def bulk_run_payroll(request):
+    if request.user.role not in ['payroll_manager', 'admin']:
+        return HttpResponseForbidden("Access denied")
+    today = date.today()
+    if request.method == 'POST':
+        form = BulkPayrollForm(request.POST)
+        if form.is_valid():
+            try:
+                run = open_payroll_run(
+                    form.cleaned_data['month'],
+                    form.cleaned_data['year'],
+                    other_allowances=form.cleaned_data.get('other_allowances') or Decimal(0.0),
+                    tax_amt=form.cleaned_data.get('tax_amt') or Decimal(0.0),
+                )
+            except PayrollError as e:
+                messages.error(request, str(e))
+                return redirect('bulk_run_payroll')
+            if run.status == 'completed' and not pending_employees(run.month, run.year).exists():
+                messages.info(request, f"Payroll for {run.month}/{run.year} has already been generated.")
+            elif not Job.objects.filter(kind=BULK_PAYROLL_JOB, payload__run_id=run.id,
+                                        status__in=['queued', 'running']).exists():
+                enqueue(BULK_PAYROLL_JOB, {'run_id': run.id}, priority=10, user=request.user)
+                messages.success(request, f"Payroll for {run.month}/{run.year} has been queued.")
+            return redirect('payroll_run_status', run_id=run.id)
+    else:
+        form = BulkPayrollForm(initial={'month': today.month, 'year': today.year})
+    return render(request, 'bulk_payroll.html', {'form': form})
+
+
+@login_required()
+def payroll_run_status(request, run_id):
+    if request.user.role not in ['payroll_manager', 'admin']:
+        return HttpResponseForbidden("Access denied")
+    run = get_object_or_404(PayrollRun, id=run_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'id': run.id,
+            'month': run.month,
+            'year': run.year,
+            'status': run.status,
+            'total_employees': run.total_employees,
+            'processed_employees': run.processed_employees,
+            'progress': run.progress,
+            'error': run.error,
+        })
+    return render(request, 'payroll_run_status.html', {'run': run})
+
+
+PREVIEW_CSV_COLUMNS = [
+    'basic_pay', 'da_amount', 'hra_amount', 'allowances', 'bonus', 'gross_total',
+    'pf', 'esi', 'pt', 'income_tax', 'lop_deduction', 'total_deduction', 'net_salary',
+]
+
+
+@login_required()
+def payroll_preview(request):
+    if request.user.role not in ['payroll_manager', 'admin']:
+        return HttpResponseForbidden("Access denied")
+    form = BulkPayrollForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, "Please choose a valid month and year to preview.")
+        return redirect('bulk_run_payroll')
+    month = form.cleaned_data['month']
+    year = form.cleaned_data['year']
+    # The single-employee form previews just its employee; the bulk form, everyone it would pay.
+    employee_id = request.GET.get('employee', '')
+    employee_id = int(employee_id) if employee_id.isdigit() else None
+    try:
+        lines, totals = preview_payroll(
+            month, year,
+            other_allowances=form.cleaned_data.get('other_allowances') or Decimal(0.0),
+            tax_amt=form.cleaned_data.get('tax_amt') or Decimal(0.0),
+            employee_id=employee_id,
+        )
+    except PayrollError as e:
+        messages.error(request, str(e))
+        return redirect('bulk_run_payroll')
+
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="payroll_preview_{month}_{year}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['Employee ID', 'Employee', 'Department'] + PREVIEW_CSV_COLUMNS)
+        for line in lines:
+            writer.writerow(
+                [line.employee.id, line.employee.user.username, line.employee.department]
+                + [getattr(line.amounts, column) for column in PREVIEW_CSV_COLUMNS]
+            )
+        return response
+
+    page = Paginator(lines, 50).get_page(request.GET.get('page'))
+    query = request.GET.copy()
+    for key in ('page', 'csrfmiddlewaretoken'):
+        query.pop(key, None)
+    return render(request, 'payroll_preview.html', {
+        'page': page,
+        'totals': totals,
+        'month': month,
+        'year': year,
+        'employee_id': employee_id,
+        'query': query.urlencode(),
     })
 
 
+@login_required()
+def export_payslips(request):
+    if request.user.role not in ['hr_manager', 'payroll_manager', 'admin']:
+        return HttpResponseForbidden("Access denied")
+    today = date.today()
+    try:
+        month = int(request.GET.get('month', today.month))
+        year = int(request.GET.get('year', today.year))
+        date(year, month, 1)
+    except ValueError:
+        messages.error(request, "Choose a valid month and year.")
+        return redirect('payroll_summary')
+
+    if request.GET.get('background'):
+        job = enqueue(PAYSLIP_EXPORT_JOB, {'month': month, 'year': year}, user=request.user)
+        return redirect('job_status', job_id=job.id)
+
+    if request.GET.get('format') == 'pdf':
+        slips = [payslip_data(payslip) for payslip in period_payslips(month, year)]
+        if not slips:
+            messages.error(request, "No payslips found for the selected month.")
+            return redirect('payroll_summary')
+        pdf = pdf_renderer().render(render_payslips, slips)
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="payslips_{year}_{month:02d}.pdf"'
+        return response
+
+    payslips = period_payslips(month, year).iterator(chunk_size=500)
+    response = StreamingHttpResponse(iter_payslip_zip(payslips), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="payslips_{year}_{month:02d}.zip"'
+    return response
+
+
 @login_required()
 def view_payslips(request):
     if not hasattr(request.user, 'employee_profile'):
@@ -273,74 +392,37 @@ def view_payslips(request):
 
 @login_required()
 def generate_payslip_pdf(request, payslip_id):
-    payslip = get_object_or_404(Payslip, id=payslip_id)
-    payroll = payslip.payroll
+    payslip = get_object_or_404(
+        Payslip.objects.select_related('employee__user', 'payroll__gross', 'payroll__deductions'),
+        id=payslip_id,
+    )
     employee = payslip.employee
-    gross = payroll.gross
-    deductions = payroll.deductions
     if not (
             request.user == employee.user or
             request.user.role in ['hr_manager', 'payroll_manager']
     ):
         return HttpResponseForbidden("Access denied")
-    response = HttpResponse(content_type='application/pdf')
-    response[
-        'Content-Disposition'] = f'attachment; filename="Payslip_{employee.user.username}_{payslip.generated_date}.pdf"'
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-    p.setFont("Helvetica-Bold", 18)
-    p.drawCentredString(width / 2, height - 80, "Company Name Pvt. Ltd.")
-    p.setFont("Helvetica", 12)
-    p.drawCentredString(width / 2, height - 100, "Employee Payslip")
-    y = height - 150
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Employee Details")
-    p.setFont("Helvetica", 10)
-    y -= 20
-    p.drawString(70, y, f"Name: {employee.user.get_full_name() or employee.user.username}")
-    y -= 15
-    p.drawString(70, y, f"Department: {getattr(employee, 'department', 'N/A')}")
-    y -= 15
-    p.drawString(70, y, f"Date: {payslip.generated_date.strftime('%d-%m-%Y')}")
-    y -= 40
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Earnings")
-    p.setFont("Helvetica", 10)
-    y -= 20
-    p.drawString(70, y, f"Basic Pay: ₹{gross.basic_pay}")
-    y -= 15
-    p.drawString(70, y, f"DA: ₹{gross.da_amount}")
-    y -= 15
-    p.drawString(70, y, f"HRA: ₹{gross.hra_amount}")
-    y -= 15
-    p.drawString(70, y, f"Other Allowances: ₹{gross.allowances or 0}")
-    y -= 15
-    p.drawString(70, y, f"Bonuses: ₹{payroll.bonuses or 0}")
-    y -= 40
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Deductions")
-    p.setFont("Helvetica", 10)
-    y -= 20
-    p.drawString(70, y, f"PF: ₹{deductions.pf}")
-    y -= 15
-    p.drawString(70, y, f"ESI: ₹{deductions.esi}")
-    y -= 15
-    p.drawString(70, y, f"PT: ₹{deductions.pt}")
-    y -= 15
-    p.drawString(70, y, f"Income Tax: ₹{deductions.income_tax}")
-    y -= 15
-    p.drawString(70, y, f"Total Deductions: ₹{deductions.total_deduction}")
-    y -= 40
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Net Pay")
-    p.setFont("Helvetica", 11)
-    y -= 20
-    p.drawString(70, y, f"₹{payslip.net_pay}")
-    p.setFont("Helvetica-Oblique", 9)
-    p.drawCentredString(width / 2, 60, "This is a system-generated payslip and does not require a signature.")
-
-    p.showPage()
-    p.save()
+
+    data = payslip_data(payslip)
+    digest = fingerprint(data)
+    etag = f'"{digest}"'
+    path = cached_path(payslip.id, digest)
+    last_modified = int(path.stat().st_mtime) if path.exists() else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    path = ensure_rendered(payslip.id, data, digest)
+    response = FileResponse(
+        path.open('rb'),
+        as_attachment=True,
+        filename=f"Payslip_{employee.user.username}_{payslip.generated_date}.pdf",
+        content_type='application/pdf',
+    )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(path.stat().st_mtime)
+    response['Cache-Control'] = 'private, no-cache'
     messages.success(
         request,
         f"Payslip downloaded successfully."
@@ -350,7 +432,7 @@ def generate_payslip_pdf(request, payslip_id):
 
 @login_required()
 def views_pay_salary(request):
-    cp = CommonPay.objects.order_by('-updated_on').first()
+    cp = latest_common_pay()
     return render(request, 'views_pay_salary.html', {'cp': cp})
 
 
@@ -360,8 +442,9 @@ def payment_history(request):
         messages.error(request, "You must be logged in as an employee to view this page.")
         return redirect('home')
     employee = request.user.employee_profile
-    payslips = Payslip.objects.filter(employee=employee).order_by('-generated_date')
-    return render(request, 'payment_history.html', {'payslips': payslips})
+    payslips = Payslip.objects.filter(employee=employee)
+    page = KeysetPaginator(payslips, PAYSLIP_SORTS, '-generated').page(request)
+    return render(request, 'payment_history.html', {'payslips': page.object_list, 'page': page})
 
 
 @login_required()
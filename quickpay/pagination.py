@@ -0,0 +1,157 @@
+"""
+Keyset (cursor) pagination for list views.
+
+A page is fetched as "the next ``per_page`` rows after this one" in the
+current sort order: the last row's sort values become an opaque cursor,
+and the next query seeks past it with a WHERE on those columns instead of
+an OFFSET. Every page therefore costs the same as the first, and rows
+inserted meanwhile never shift a page. There is no page count; the
+paginator only knows whether a next and a previous page exist, by
+fetching one extra row.
+
+Each sortable column maps to one field lookup, and ``id`` is always added
+as a tiebreaker, so sort columns must be non-null. For the seek to stop
+after one page rather than sort the table, each sort column should be a
+column of the paginated table itself, with a ``(column, id)`` index
+(after any columns the view always filters on). Rows may be model
+instances or dicts from ``values()``.
+
+A cursor that does not decode, or whose values do not fit the sort
+columns, is ignored and the first page is shown.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+DEFAULT_PER_PAGE = 50
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+
+def decode_cursor(cursor, length):
+    """The values in ``cursor``, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    return values if isinstance(values, list) and len(values) == length else None
+
+
+def _value(row, lookup):
+    if isinstance(row, dict):
+        return row[lookup]
+    for part in lookup.split('__'):
+        row = getattr(row, part)
+    return row
+
+
+def _seek(ordering, values, forward):
+    """Rows strictly after (``forward``) or before the cursor ``values`` in ``ordering``."""
+    condition = Q()
+    for i, (lookup, descending) in enumerate(ordering):
+        op = 'lt' if descending == forward else 'gt'
+        equal = {prefix: value for (prefix, _), value in zip(ordering[:i], values[:i])}
+        condition |= Q(**equal, **{f'{lookup}__{op}': values[i]})
+    return condition
+
+
+def _seeking(queryset, ordering, values, forward):
+    """``queryset`` filtered past the cursor ``values``, or None if they do not fit the columns."""
+    try:
+        return queryset.filter(_seek(ordering, values, forward))
+    except (ValidationError, TypeError, ValueError):
+        return None
+
+
+def _order_by(ordering, reverse=False):
+    return [('-' if descending != reverse else '') + lookup for lookup, descending in ordering]
+
+
+class KeysetPage:
+    def __init__(self, object_list, sort, columns, has_next, has_previous, next_url, previous_url):
+        self.object_list = object_list
+        self.sort = sort
+        # Column name -> {'url': link that sorts by it, 'direction': 'asc'/'desc' if current}.
+        self.columns = columns
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_url = next_url
+        self.previous_url = previous_url
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, columns, default_sort, per_page=DEFAULT_PER_PAGE):
+        """
+        ``columns`` maps sort names used in the URL to field lookups;
+        ``default_sort`` is one of them, prefixed with ``-`` for descending.
+        """
+        self.queryset = queryset
+        self.columns = columns
+        self.default_sort = default_sort
+        self.per_page = per_page
+
+    def ordering(self, sort):
+        descending = sort.startswith('-')
+        return [(self.columns[sort.lstrip('-')], descending), ('id', descending)]
+
+    def _url(self, query, **params):
+        query = query.copy()
+        for key, value in params.items():
+            query[key] = value
+        return f"?{query.urlencode()}"
+
+    def page(self, request):
+        query = request.GET.copy()
+        sort = query.pop('sort', [self.default_sort])[-1]
+        if sort.lstrip('-') not in self.columns:
+            sort = self.default_sort
+        after = decode_cursor(query.pop('after', [''])[-1], 2)
+        before = decode_cursor(query.pop('before', [''])[-1], 2)
+        ordering = self.ordering(sort)
+        preceding = None if before is None else _seeking(self.queryset, ordering, before, forward=False)
+        following = None if after is None else _seeking(self.queryset, ordering, after, forward=True)
+
+        if preceding is not None:
+            rows = list(preceding.order_by(*_order_by(ordering, reverse=True))[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset if following is None else following
+            rows = list(queryset.order_by(*_order_by(ordering))[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = following is not None
+
+        def cursor(row):
+            return encode_cursor([_value(row, lookup) for lookup, _ in ordering])
+
+        query['sort'] = sort
+        columns = {}
+        for name in self.columns:
+            direction = None
+            if sort.lstrip('-') == name:
+                direction = 'desc' if sort.startswith('-') else 'asc'
+            flipped = f'-{name}' if direction == 'asc' else name
+            columns[name] = {'url': self._url(query, sort=flipped), 'direction': direction}
+
+        return KeysetPage(
+            rows, sort, columns,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_url=self._url(query, after=cursor(rows[-1])) if rows else None,
+            previous_url=self._url(query, before=cursor(rows[0])) if rows else None,
+        )
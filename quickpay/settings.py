@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'employee',
     'reports',
     'user',
+    'jobs',
 ]
 AUTH_USER_MODEL = 'user.User'
 
@@ -128,6 +129,11 @@ USE_TZ = True
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Rendered payslip PDFs, one directory per payslip
+PAYSLIP_PDF_CACHE = os.path.join(MEDIA_ROOT, 'payslips')
+# Printed in the payslip header; the logo is an optional image file path
+PAYSLIP_COMPANY_NAME = config("PAYSLIP_COMPANY_NAME", default="Company Name Pvt. Ltd.")
+PAYSLIP_LOGO = config("PAYSLIP_LOGO", default="")
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 STATICFILES_DIRS = [STATIC_DIR,]
 
@@ -139,6 +145,34 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 
 
+# Payroll
+# Process-pool workers used to compute month-end payroll (1 = in-process)
+PAYROLL_WORKERS = config("PAYROLL_WORKERS", default=1, cast=int)
+# Seconds a process trusts its cached Common Pay and leave limits before checking for changes
+RULES_CACHE_TTL = config("RULES_CACHE_TTL", default=5, cast=int)
+
+
+# PDF rendering service
+# Worker processes; 1 renders in the calling process, where PDF_RENDER_TIMEOUT
+# is not enforced, so set 2 or more to have stuck renders timed out
+PDF_RENDER_WORKERS = config("PDF_RENDER_WORKERS", default=1, cast=int)
+# Renders queued or running at once (0 = four per worker)
+PDF_RENDER_MAX_PENDING = config("PDF_RENDER_MAX_PENDING", default=0, cast=int)
+# Seconds a caller waits for one PDF (pool workers only)
+PDF_RENDER_TIMEOUT = config("PDF_RENDER_TIMEOUT", default=30, cast=int)
+
+
+# Background jobs (run with `manage.py run_jobs`)
+# Seconds a job may stay claimed before a dead worker's job is retried
+JOBS_LOCK_TIMEOUT = config("JOBS_LOCK_TIMEOUT", default=3600, cast=int)
+
+
+# Reports
+# Seconds the admin analytics snapshot is cached (writes invalidate it sooner, in every process if
+# CACHES is shared between them)
+ANALYTICS_CACHE_TTL = config("ANALYTICS_CACHE_TTL", default=300, cast=int)
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,27 @@
+"""
+Helpers for responses streamed chunk by chunk.
+
+Writers such as ``zipfile`` expect a file object. Handing them a ChunkSink
+lets a generator write an archive or document piece by piece and yield
+whatever has been written so far, so a streamed download never holds the
+whole file in memory.
+"""
+
+
+class ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
@@ -26,4 +26,5 @@ urlpatterns = [
                   path('reports', include('reports.urls')),
                   path('employee', include('employee.urls')),
                   path('reports', include('reports.urls')),
+                  path('jobs', include('jobs.urls')),
               ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,66 @@
+"""
+Admin analytics snapshot shared by the dashboard and its PDF.
+
+The figures come from one conditional aggregation over users joined to
+their feedback (totals, a count per role and the feedback counts) and one
+over the payroll rollup. The snapshot is kept in Django's cache for
+ANALYTICS_CACHE_TTL seconds under a fixed key, so a cache hit reads no
+database at all. User and feedback writes, and every rollup change, delete
+the key once their transaction commits. With a cache shared between
+processes (CACHES) that retires every process's copy; with the default
+per-process cache other processes' copies age out within the TTL.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from payroll import rollup
+
+SNAPSHOT_KEY = 'admin_analytics'
+# users_by_role entry for users whose role is not one of User.USER_TYPES.
+OTHER_ROLE = 'other'
+
+
+def _compute():
+    User = get_user_model()
+    roles = [role for role, _ in User.USER_TYPES]
+    staff = Q(is_superuser=False)
+    # Feedback is joined in, so each user appears once per feedback row; count users distinct.
+    counts = User.objects.aggregate(
+        total=Count('id', filter=staff, distinct=True),
+        active=Count('id', filter=staff & Q(is_active=True), distinct=True),
+        reviewed=Count('feedback', filter=Q(feedback__status='Reviewed')),
+        feedback=Count('feedback'),
+        **{f'role_{role}': Count('id', filter=staff & Q(role=role), distinct=True) for role in roles},
+    )
+    by_role = {role: counts[f'role_{role}'] for role in roles}
+    by_role[OTHER_ROLE] = counts['total'] - sum(by_role.values())
+    payroll_totals = rollup.totals()
+    return {
+        'total_users': counts['total'],
+        'active_users': counts['active'],
+        'inactive_users': counts['total'] - counts['active'],
+        'users_by_role': [{'role': role, 'count': count} for role, count in sorted(by_role.items()) if count],
+        'total_payrolls': payroll_totals['headcount'],
+        'total_net_salary': payroll_totals['net_total'],
+        'reviewed_feedbacks': counts['reviewed'],
+        'pending_feedbacks': counts['feedback'] - counts['reviewed'],
+        'generated_on': timezone.now(),
+    }
+
+
+def admin_snapshot():
+    """The current analytics figures, from the cache when nothing relevant has changed."""
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = _compute()
+        cache.set(SNAPSHOT_KEY, snapshot, settings.ANALYTICS_CACHE_TTL)
+    return snapshot
+
+
+def invalidate_snapshot():
+    """Drop the cached snapshot once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(SNAPSHOT_KEY))
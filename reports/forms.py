@@ -0,0 +1,36 @@
+from django import forms
+
+from employee.models import Employee
+
+MONTH_FORMAT = '%Y-%m'
+
+
+class ReportExportForm(forms.Form):
+    FORMATS = [('csv', 'CSV'), ('xlsx', 'Excel (XLSX)')]
+
+    start = forms.DateField(
+        input_formats=[MONTH_FORMAT], label="From",
+        widget=forms.DateInput(format=MONTH_FORMAT, attrs={'type': 'month', 'class': 'form-control form-control-sm'}),
+    )
+    end = forms.DateField(
+        input_formats=[MONTH_FORMAT], label="To",
+        widget=forms.DateInput(format=MONTH_FORMAT, attrs={'type': 'month', 'class': 'form-control form-control-sm'}),
+    )
+    department = forms.ChoiceField(
+        choices=[('', 'All departments')] + Employee.DEPARTMENT_CHOICES, required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    format = forms.ChoiceField(choices=FORMATS, initial='csv')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and end < start:
+            raise forms.ValidationError("The end month must not be before the start month.")
+        return cleaned_data
+
+    def date_range(self):
+        """Half-open ``(first day of start month, first day after end month)``."""
+        start, end = self.cleaned_data['start'], self.cleaned_data['end']
+        after_end = end.replace(year=end.year + 1, month=1) if end.month == 12 else end.replace(month=end.month + 1)
+        return start, after_end
@@ -0,0 +1,37 @@
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from reports.pdf import render_payroll_summary
+
+
+def synthetic_rows(count):
+    for i in range(count):
+        gross = Decimal(30000 + i % 170000)
+        deductions = (gross * Decimal('0.12') + 200).quantize(Decimal('0.01'))
+        yield f"employee{i}", gross, deductions, gross - deductions
+
+
+class Command(BaseCommand):
+    help = "Benchmark the streaming payroll summary PDF: time and peak Python memory per row count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>8} {'seconds':>9} {'rows/sec':>9} {'peak KiB':>9} {'PDF KiB':>8}")
+        for count in options['rows']:
+            with tempfile.TemporaryFile() as out:
+                tracemalloc.start()
+                started = time.perf_counter()
+                render_payroll_summary({'month': 3, 'year': 2025, 'rows': synthetic_rows(count)}, out)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                size = out.tell()
+            self.stdout.write(
+                f"{count:>8} {elapsed:>9.2f} {count / elapsed:>9.0f} {peak // 1024:>9} {size // 1024:>8}"
+            )
@@ -0,0 +1,154 @@
+"""
+Report PDFs, split into a query step that returns plain data and a
+renderer that only draws it, so rendering can run in the PDF service's
+worker processes.
+
+The payroll summary is the exception: its rows are streamed from the
+database while the pages are drawn and written, so it renders in the
+calling process.
+"""
+from decimal import Decimal
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from reports.pdf_stream import Page, PdfStreamWriter
+from reports.queries import payroll_summary_rows, tax_deduction_rows, totals_row, TaxDeductionRow
+
+
+def payroll_summary_data(month, year, chunk_size=2000):
+    return {'month': month, 'year': year, 'rows': payroll_summary_rows(month, year, chunk_size=chunk_size)}
+
+
+SUMMARY_HEADER = ["Employee", "Gross Salary (Rs.)", "Total Deductions (Rs.)", "Net Salary (Rs.)"]
+SUMMARY_COL_WIDTHS = [2.5 * inch, 1.5 * inch, 1.5 * inch, 1.5 * inch]
+SUMMARY_MARGIN = inch
+SUMMARY_TITLE_SIZE = 18
+SUMMARY_HEADER_HEIGHT = 26
+SUMMARY_ROW_HEIGHT = 18
+SUMMARY_PADDING = 6
+SUMMARY_HEADER_FILL = (0, 0.2, 0.4)  # #003366
+SUMMARY_ROW_FILL = (0.961, 0.961, 0.961)  # whitesmoke
+SUMMARY_GRID = (0.5, 0.5, 0.5)
+WHITE = (1, 1, 1)
+
+
+def _draw_summary_table(page, rows, x, top):
+    """Draw ``rows`` under the header row as a grid whose top left corner is at (``x``, ``top``)."""
+    edges = [x]
+    for column_width in SUMMARY_COL_WIDTHS:
+        edges.append(edges[-1] + column_width)
+    width = edges[-1] - x
+    header_bottom = top - SUMMARY_HEADER_HEIGHT
+    bottom = header_bottom - SUMMARY_ROW_HEIGHT * len(rows)
+
+    page.fill_rect(x, header_bottom, width, SUMMARY_HEADER_HEIGHT, SUMMARY_HEADER_FILL)
+    page.fill_rect(x, bottom, width, header_bottom - bottom, SUMMARY_ROW_FILL)
+    for left, label in zip(edges, SUMMARY_HEADER):
+        page.text(left + SUMMARY_PADDING, header_bottom + 10, label, 'Helvetica-Bold', rgb=WHITE)
+    y = header_bottom
+    for name, *amounts in rows:
+        y -= SUMMARY_ROW_HEIGHT
+        page.text(edges[0] + SUMMARY_PADDING, y + 5, name)
+        for right, amount in zip(edges[2:], amounts):
+            page.text(right - SUMMARY_PADDING, y + 5, amount, align='right')
+
+    for line_y in [top, header_bottom, *(header_bottom - SUMMARY_ROW_HEIGHT * (i + 1) for i in range(len(rows)))]:
+        page.line(x, line_y, edges[-1], line_y, SUMMARY_GRID)
+    for edge in edges:
+        page.line(edge, bottom, edge, top, SUMMARY_GRID)
+
+
+def render_payroll_summary(data, out):
+    """
+    Draw the summary with each page's rows as its own table under a
+    repeated header. ``data['rows']`` may be any iterable, such as the
+    stream from ``reports.queries.payroll_summary_rows``; it is consumed
+    one page at a time, the totals are summed along the way and each page
+    is written to ``out`` as soon as it is full (reports.pdf_stream), so
+    memory stays flat however many rows there are.
+    """
+    writer = PdfStreamWriter(out, A4)
+    width, height = A4
+    table_x = (width - sum(SUMMARY_COL_WIDTHS)) / 2
+    page_rows = int((height - 2 * SUMMARY_MARGIN - SUMMARY_HEADER_HEIGHT) // SUMMARY_ROW_HEIGHT)
+
+    page = Page()
+    page.text(width / 2, height - SUMMARY_MARGIN - SUMMARY_TITLE_SIZE,
+              f"Payroll Summary Report - {data['month']}/{data['year']}", 'Helvetica-Bold', SUMMARY_TITLE_SIZE,
+              align='centre')
+    top = height - SUMMARY_MARGIN - SUMMARY_TITLE_SIZE - 16
+    capacity = int((top - SUMMARY_MARGIN - SUMMARY_HEADER_HEIGHT) // SUMMARY_ROW_HEIGHT)
+
+    totals = [Decimal(0)] * 3
+    rows = []
+    for username, *amounts in data['rows']:
+        totals = [total + (amount or 0) for total, amount in zip(totals, amounts)]
+        rows.append([username, *(f"{amount or 0:.2f}" for amount in amounts)])
+        if len(rows) == capacity:
+            _draw_summary_table(page, rows, table_x, top)
+            writer.add_page(page)
+            page, rows = Page(), []
+            top = height - SUMMARY_MARGIN
+            capacity = page_rows
+    rows.append(["TOTAL", *(f"{total:.2f}" for total in totals)])
+    _draw_summary_table(page, rows, table_x, top)
+    writer.add_page(page)
+    writer.close()
+
+
+def tax_deduction_data(month, year):
+    rows = list(tax_deduction_rows(month, year))
+    return {
+        'month': month,
+        'year': year,
+        'rows': [[row.username, *(f"{amount:.2f}" for amount in row[1:])] for row in rows],
+        'totals': [f"{amount:.2f}" for amount in totals_row(rows, TaxDeductionRow)[1:]],
+    }
+
+
+# Right edge of each amount column: PF, ESI, PT, income tax, total.
+TAX_AMOUNT_X = [220, 290, 360, 460, 560]
+
+
+def render_tax_deduction_report(data, out):
+    p = canvas.Canvas(out, pagesize=A4)
+    width, height = A4
+    y = height - 80
+
+    # Header
+    p.setFont("Helvetica-Bold", 16)
+    p.drawCentredString(width / 2, y, f"Tax Deduction Report - {data['month']}/{data['year']}")
+    y -= 40
+
+    # Table Header
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, y, "Employee")
+    p.drawString(180, y, "PF (Rs)")
+    p.drawString(250, y, "ESI (Rs)")
+    p.drawString(320, y, "PT (Rs)")
+    p.drawString(390, y, "Income Tax (Rs)")
+    p.drawString(490, y, "Total Deduction (Rs)")
+    y -= 20
+    p.setFont("Helvetica", 10)
+
+    # Table Rows
+    for username, *amounts in data['rows']:
+        if y < 80:
+            p.showPage()
+            y = height - 80
+        p.drawString(50, y, username)
+        for x, amount in zip(TAX_AMOUNT_X, amounts):
+            p.drawRightString(x, y, amount)
+        y -= 20
+
+    # Totals
+    y -= 20
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(50, y, "TOTAL")
+    for x, amount in zip(TAX_AMOUNT_X, data['totals']):
+        p.drawRightString(x, y, amount)
+
+    p.showPage()
+    p.save()
@@ -0,0 +1,114 @@
+"""
+A PDF writer that writes each page out as soon as it is drawn.
+
+ReportLab's canvas keeps every page until ``save()`` and then assembles the
+whole file in memory, so its memory grows with the length of the report.
+PdfStreamWriter writes a page's objects to the output when the page is
+added and keeps only their byte offsets for the cross-reference table, so
+a report of any length is drawn in the memory of one page plus two offsets
+per page.
+
+It does just what the tabular reports need: filled rectangles, lines and
+text in the standard Helvetica fonts, which every PDF viewer has built in,
+so nothing is embedded. Text widths come from ReportLab's font metrics.
+"""
+import zlib
+from array import array
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# Font name -> its resource name on every page.
+FONTS = {'Helvetica': 'F1', 'Helvetica-Bold': 'F2'}
+CATALOG, PAGES = 1, 2
+FIRST_FONT = 3
+FIRST_PAGE = FIRST_FONT + len(FONTS)
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _colour(rgb):
+    return ' '.join(f"{channel:.3f}" for channel in rgb)
+
+
+class Page:
+    """The drawing operators of one page. Coordinates are points from the bottom left corner."""
+
+    def __init__(self):
+        self.operators = []
+
+    def fill_rect(self, x, y, width, height, rgb):
+        self.operators.append(f"{_colour(rgb)} rg {x:.2f} {y:.2f} {width:.2f} {height:.2f} re f")
+
+    def line(self, x1, y1, x2, y2, rgb, width=0.5):
+        self.operators.append(f"{_colour(rgb)} RG {width} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    def text(self, x, y, text, font='Helvetica', size=10, rgb=(0, 0, 0), align='left'):
+        """Draw ``text`` with its baseline at ``y``, starting, ending (right) or centred (centre) at ``x``."""
+        if align != 'left':
+            text_width = stringWidth(text, font, size)
+            x -= text_width if align == 'right' else text_width / 2
+        self.operators.append(
+            f"{_colour(rgb)} rg BT /{FONTS[font]} {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET"
+        )
+
+    def content(self):
+        return zlib.compress('\n'.join(self.operators).encode('cp1252', 'replace'))
+
+
+class PdfStreamWriter:
+    """Write the pages given to ``add_page`` to the binary file ``out``; ``close`` finishes the file."""
+
+    def __init__(self, out, pagesize):
+        self.out = out
+        self.width, self.height = pagesize
+        self.position = 0
+        self.pages = 0
+        self.page_offsets = array('Q')
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body):
+        offset = self.position
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        return offset
+
+    def add_page(self, page):
+        content = page.content()
+        number = FIRST_PAGE + 2 * self.pages
+        fonts = ' '.join(f"/{name} {FIRST_FONT + i} 0 R" for i, name in enumerate(FONTS.values()))
+        self.page_offsets.append(self._object(
+            number, b"<<\n/Filter /FlateDecode\n/Length %d\n>>\nstream\n%s\nendstream" % (len(content), content)
+        ))
+        self.page_offsets.append(self._object(number + 1, (
+            f"<<\n/Type /Page\n/Parent {PAGES} 0 R\n/MediaBox [0 0 {self.width:.4f} {self.height:.4f}]\n"
+            f"/Resources << /Font << {fonts} >> >>\n/Contents {number} 0 R\n>>"
+        ).encode()))
+        self.pages += 1
+
+    def close(self):
+        offsets = {}
+        for i, font in enumerate(FONTS):
+            offsets[FIRST_FONT + i] = self._object(FIRST_FONT + i, (
+                f"<<\n/Type /Font\n/Subtype /Type1\n/BaseFont /{font}\n/Encoding /WinAnsiEncoding\n>>"
+            ).encode())
+
+        offsets[PAGES] = self.position
+        self._write(b"%d 0 obj\n<<\n/Type /Pages\n/Count %d\n/Kids [" % (PAGES, self.pages))
+        for i in range(self.pages):
+            self._write(b" %d 0 R" % (FIRST_PAGE + 2 * i + 1))
+        self._write(b" ]\n>>\nendobj\n")
+        offsets[CATALOG] = self._object(CATALOG, b"<<\n/Type /Catalog\n/Pages %d 0 R\n>>" % PAGES)
+
+        xref = self.position
+        size = FIRST_PAGE + len(self.page_offsets)
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for number in range(1, FIRST_PAGE):
+            self._write(b"%010d 00000 n \n" % offsets[number])
+        for offset in self.page_offsets:
+            self._write(b"%010d 00000 n \n" % offset)
+        self._write(b"trailer\n<<\n/Size %d\n/Root %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n" % (size, CATALOG, xref))
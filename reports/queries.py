@@ -0,0 +1,184 @@
+"""
+Report queries.
+
+Every report reads its rows as plain tuples with ``values_list``, joining
+the employee's username in the same query, so a report costs the same
+number of queries however many rows it has and never builds model
+instances. The HTML pages, the PDFs and the exports all read through here.
+
+A month is selected through its PayPeriod, by key, never by the dates
+the rows happened to be written on.
+
+The HTML pages show one keyset page at a time (quickpay.pagination), so
+they read dicts from the ``*_values`` querysets and take their totals from
+the month's payroll.rollup rows, cached without expiry once the period is
+locked. The PDFs sum the rows they stream with ``totals_row``.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from payroll import rollup
+from payroll.models import Payroll, TotalDeductions, PayPeriod
+
+
+class PayrollSummaryRow(NamedTuple):
+    username: str
+    gross: Decimal
+    deductions: Decimal
+    net: Decimal
+
+
+class TaxDeductionRow(NamedTuple):
+    username: str
+    pf: Decimal
+    esi: Decimal
+    pt: Decimal
+    income_tax: Decimal
+    total_deduction: Decimal
+
+
+def _rows(queryset, row_class, chunk_size):
+    rows = queryset.iterator(chunk_size=chunk_size) if chunk_size else queryset
+    return map(row_class._make, rows)
+
+
+def _rollup_totals(month, year, row_class, columns):
+    """A ``row_class`` labelled TOTAL holding the month's rollup ``columns``, summed over departments."""
+    summed = rollup.totals(pay_period__year=year, pay_period__month=month)
+    return row_class("TOTAL", *(summed[column] for column in columns))
+
+
+def _locked_cache(month, year, name, compute):
+    """``compute()``, kept in the cache without expiry if the month's PayPeriod is locked."""
+    period = PayPeriod.objects.filter(year=year, month=month).first()
+    key = period.cache_key(name) if period else None
+    if key is None:
+        return compute()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, None)
+    return value
+
+
+def _payrolls(month, year):
+    return Payroll.objects.filter(pay_period__year=year, pay_period__month=month)
+
+
+def _deductions(month, year):
+    return TotalDeductions.objects.filter(pay_period__year=year, pay_period__month=month)
+
+
+def _periods(start, end):
+    """PayPeriods for the months from ``start`` up to, not including, ``end`` (both first days)."""
+    return PayPeriod.objects.filter(
+        Q(year__gt=start.year) | Q(year=start.year, month__gte=start.month),
+        Q(year__lt=end.year) | Q(year=end.year, month__lt=end.month),
+    )
+
+
+def payroll_summary_rows(month, year, chunk_size=None):
+    """
+    The month's payrolls as PayrollSummaryRow, ordered by username. With
+    ``chunk_size`` they are streamed from the database that many at a time.
+    """
+    queryset = _payrolls(month, year).order_by('employee__user__username', 'id').values_list(
+        'employee__user__username', 'gross__gross_total', 'deductions__total_deduction', 'net_salary'
+    )
+    return _rows(queryset, PayrollSummaryRow, chunk_size)
+
+
+def payroll_summary_values(month, year):
+    """
+    The month's payrolls as unordered dicts: id, employee_id, username,
+    gross_total, total_deduction and net_salary.
+    """
+    return _payrolls(month, year).values(
+        'id', 'employee_id', 'net_salary', username=F('employee__user__username'),
+        gross_total=F('gross__gross_total'), total_deduction=F('deductions__total_deduction'),
+    )
+
+
+def payroll_summary_totals(month, year):
+    """The month's payroll totals as a PayrollSummaryRow labelled TOTAL."""
+    return _locked_cache(month, year, 'payroll_summary_totals', lambda: _rollup_totals(
+        month, year, PayrollSummaryRow, ['gross_total', 'deduction_total', 'net_total']
+    ))
+
+
+def tax_deduction_rows(month, year, chunk_size=None):
+    """The month's deductions as TaxDeductionRow, ordered by username."""
+    queryset = _deductions(month, year).order_by('employee__user__username', 'id').values_list(
+        'employee__user__username', 'pf', 'esi', 'pt', 'income_tax', 'total_deduction'
+    )
+    return _rows(queryset, TaxDeductionRow, chunk_size)
+
+
+def tax_deduction_values(month, year):
+    """The month's deductions as unordered dicts keyed like TaxDeductionRow, plus id and employee_id."""
+    return _deductions(month, year).values(
+        'id', 'employee_id', 'pf', 'esi', 'pt', 'income_tax', 'total_deduction', username=F('employee__user__username'),
+    )
+
+
+def tax_deduction_totals(month, year):
+    """The month's deduction totals as a TaxDeductionRow labelled TOTAL."""
+    return _locked_cache(month, year, 'tax_deduction_totals', lambda: _rollup_totals(
+        month, year, TaxDeductionRow, ['pf_total', 'esi_total', 'pt_total', 'income_tax_total', 'deduction_total']
+    ))
+
+
+class PayrollExportRow(NamedTuple):
+    payment_date: date
+    username: str
+    department: str
+    gross: Decimal
+    deductions: Decimal
+    net: Decimal
+
+
+class TaxExportRow(NamedTuple):
+    date: date
+    username: str
+    department: str
+    pf: Decimal
+    esi: Decimal
+    pt: Decimal
+    income_tax: Decimal
+    total_deduction: Decimal
+
+
+def payroll_export_rows(start, end, department=None, chunk_size=2000):
+    """Payrolls for the pay periods in ``[start, end)``, optionally for one department, streamed."""
+    queryset = Payroll.objects.filter(pay_period__in=_periods(start, end))
+    if department:
+        queryset = queryset.filter(employee__department=department)
+    queryset = queryset.order_by('pay_period__year', 'pay_period__month', 'id').values_list(
+        'payment_date', 'employee__user__username', 'employee__department',
+        'gross__gross_total', 'deductions__total_deduction', 'net_salary',
+    )
+    return _rows(queryset, PayrollExportRow, chunk_size)
+
+
+def tax_export_rows(start, end, department=None, chunk_size=2000):
+    """Deductions for the pay periods in ``[start, end)``, optionally for one department, streamed."""
+    queryset = TotalDeductions.objects.filter(pay_period__in=_periods(start, end))
+    if department:
+        queryset = queryset.filter(employee__department=department)
+    queryset = queryset.order_by('pay_period__year', 'pay_period__month', 'id').values_list(
+        'date', 'employee__user__username', 'employee__department',
+        'pf', 'esi', 'pt', 'income_tax', 'total_deduction',
+    )
+    return _rows(queryset, TaxExportRow, chunk_size)
+
+
+def totals_row(rows, row_class):
+    """A ``row_class`` labelled TOTAL holding the sum of each amount column of ``rows``."""
+    totals = [Decimal(0)] * (len(row_class._fields) - 1)
+    for row in rows:
+        totals = [total + (amount or 0) for total, amount in zip(totals, row[1:])]
+    return row_class("TOTAL", *totals)
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from payroll.rollup import rollup_changed
+from reports.analytics import invalidate_snapshot
+from user.models import Feedback
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_analytics(sender, update_fields=None, **kwargs):
+    # Every login saves last_login alone; that changes no figure.
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    invalidate_snapshot()
+
+
+@receiver([post_save, post_delete], sender=Feedback)
+def invalidate_feedback_analytics(sender, **kwargs):
+    invalidate_snapshot()
+
+
+@receiver(rollup_changed)
+def invalidate_payroll_analytics(sender, **kwargs):
+    invalidate_snapshot()
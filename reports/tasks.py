@@ -0,0 +1,21 @@
+import tempfile
+
+from django.core.files import File
+
+from jobs.queue import with_heartbeat
+from jobs.registry import task
+from reports.pdf import payroll_summary_data, render_payroll_summary
+
+PAYROLL_SUMMARY_PDF_JOB = 'reports.payroll_summary_pdf'
+
+
+@task(PAYROLL_SUMMARY_PDF_JOB, concurrency=2)
+def payroll_summary(job):
+    month, year = job.payload['month'], job.payload['year']
+    data = payroll_summary_data(month, year)
+    data['rows'] = with_heartbeat(job, data['rows'])
+    with tempfile.TemporaryFile() as pdf:
+        render_payroll_summary(data, pdf)
+        pdf.seek(0)
+        job.output.save(f"payroll_summary_{month}_{year}.pdf", File(pdf), save=False)
+    return {'month': month, 'year': year}
@@ -1,3 +1,189 @@
-from django.test import TestCase
+import csv
+import io
+import re
+import zipfile
+import zlib
+from xml.etree import ElementTree
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from employee.models import Employee
+from payroll import rollup
+from payroll.models import GrossSalary, TotalDeductions, Payroll, PayPeriod, PayrollPeriodRollup
+from reports.analytics import SNAPSHOT_KEY, admin_snapshot
+from reports.pdf import render_payroll_summary
+from reports.queries import (tax_deduction_rows, totals_row, TaxDeductionRow, payroll_summary_values,
+                             tax_deduction_values)
+from user.models import Feedback, User
+
+
+class PayrollSummaryPdfTests(SimpleTestCase):
+    def render(self, count):
+        consumed = []
+
+        def rows():
+            for i in range(count):
+                consumed.append(i)
+                yield f"employee{i}", Decimal('50000.00'), Decimal('6200.00'), Decimal('43800.00')
+
+        out = io.BytesIO()
+        render_payroll_summary({'month': 3, 'year': 2025, 'rows': rows()}, out)
+        self.assertEqual(len(consumed), count)
+        return out.getvalue().count(b'/Type /Page\n')
+
+    def test_rows_are_split_into_pages(self):
+        self.assertEqual(self.render(0), 1)
+        self.assertEqual(self.render(10), 1)
+        self.assertEqual(self.render(200), 6)
+
+    def test_pdf_is_well_formed(self):
+        out = io.BytesIO()
+        rows = [("a(b)", Decimal('50000.00'), None, Decimal('43800.00'))] * 40
+        render_payroll_summary({'month': 3, 'year': 2025, 'rows': rows}, out)
+        pdf = out.getvalue()
+        self.assertTrue(pdf.startswith(b'%PDF-1.4\n'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+
+        xref = int(pdf.rsplit(b'startxref\n', 1)[1].split()[0])
+        entries = pdf[xref:].split(b'trailer')[0].splitlines()[3:]
+        for number, entry in enumerate(entries, start=1):
+            offset = int(entry.split()[0])
+            self.assertTrue(pdf[offset:].startswith(b'%d 0 obj\n' % number), number)
+
+        length = int(re.search(rb'/Length (\d+)\n>>\nstream\n', pdf).group(1))
+        start = pdf.index(b'stream\n') + len(b'stream\n')
+        content = zlib.decompress(pdf[start:start + length])
+        self.assertIn(b'(a\\(b\\)) Tj', content)
+        self.assertIn(b'(0.00) Tj', content)
+
+
+class ReportQueryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('boss', password='pw', role='admin', office_mail='boss@x')
+        self.count = 0
+        today = date.today()
+        self.period = PayPeriod.objects.create(year=today.year, month=today.month)
+
+    def add_payrolls(self, count):
+        for _ in range(count):
+            self.count += 1
+            user = User.objects.create_user(f'e{self.count}', office_mail=f'e{self.count}@x')
+            employee = Employee.objects.create(user=user, hire_date=date(2024, 1, 1), salary=30000)
+            gross = GrossSalary.objects.bulk_create([GrossSalary(
+                employee=employee, pay_period=self.period,
+                basic_pay=30000, da_amount=3000, hra_amount=3750, gross_total=36750)])[0]
+            deductions = TotalDeductions.objects.bulk_create([TotalDeductions(
+                employee=employee, pay_period=self.period,
+                pf=3600, pt=600, income_tax=1000, total_deduction=5200)])[0]
+            Payroll.objects.bulk_create([Payroll(
+                employee=employee, pay_period=self.period, gross=gross, deductions=deductions, net_salary=31550)])
+        rollup.rebuild_rollups()
+
+    def queries(self, name):
+        today = date.today()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(name), {'month': today.month, 'year': today.year})
+        self.assertEqual(response.status_code, 200)
+        # Totals come from the rollup, never from summing the payroll tables.
+        for query in ctx.captured_queries:
+            if 'SUM(' in query['sql']:
+                self.assertNotIn('FROM "payroll_payroll"', query['sql'])
+                self.assertNotIn('FROM "payroll_totaldeductions"', query['sql'])
+        return len(ctx)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.client.force_login(self.admin)
+        views = ['payroll_summary', 'tax_deduction_report', 'tax_deduction_report_pdf']
+        self.add_payrolls(2)
+        before = [self.queries(name) for name in views]
+        self.add_payrolls(8)
+        self.assertEqual([self.queries(name) for name in views], before)
+
+        today = date.today()
+        response = self.client.get(reverse('payroll_summary'), {'month': today.month, 'year': today.year})
+        self.assertContains(response, '<td>e10</td>')
+        self.assertContains(response, '315500.00')
+        rows = list(tax_deduction_rows(today.month, today.year))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(totals_row(rows, TaxDeductionRow).total_deduction, Decimal(52000))
+
+    def test_reports_select_by_pay_period(self):
+        self.add_payrolls(2)
+        december = PayPeriod.objects.create(year=2024, month=12)
+        # e1's December payroll was processed late, in January.
+        Payroll.objects.filter(employee__user__username='e1').update(pay_period=december,
+                                                                     payment_date=date(2025, 1, 3))
+        TotalDeductions.objects.filter(employee__user__username='e1').update(pay_period=december)
+        self.assertEqual([row['username'] for row in payroll_summary_values(12, 2024)], ['e1'])
+        self.assertEqual([row['username'] for row in tax_deduction_values(12, 2024)], ['e1'])
+
+        for queryset in (payroll_summary_values(12, 2024), tax_deduction_values(12, 2024)):
+            plan = queryset.explain()
+            self.assertIn('(year=? AND month=?)', plan)
+            self.assertIn('(pay_period_id=?)', plan)
+            self.assertNotIn('SCAN', plan)
+
+    def test_exports_stream_filtered_rows(self):
+        self.client.force_login(self.admin)
+        self.add_payrolls(3)
+        Employee.objects.filter(user__username='e1').update(department='hr')
+        month = date.today().strftime('%Y-%m')
+        params = {'start': month, 'end': month, 'department': 'it'}
+
+        response = self.client.get(reverse('export_payroll_summary'), {**params, 'format': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(lines[0][:3], ["Payment Date", "Employee", "Department"])
+        self.assertEqual([line[1] for line in lines[1:]], ['e2', 'e3'])
+
+        response = self.client.get(reverse('export_tax_deductions'), {**params, 'format': 'xlsx'})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        namespace = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+        self.assertEqual(len(next(sheet.iter(f'{namespace}row'))), 8)
+        self.assertEqual(len(list(sheet.iter(f'{namespace}row'))), 3)
+
+        response = self.client.get(reverse('export_tax_deductions'), {'start': month, 'end': '2000-01'})
+        self.assertRedirects(response, reverse('tax_deduction_report'))
+
+
+class AdminAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('boss', password='pw', role='admin', office_mail='boss@x')
+        User.objects.create_user('hr', role='hr_manager', office_mail='hr@x')
+        User.objects.create_user('gone', role='employee', office_mail='gone@x', is_active=False)
+
+    def test_snapshot_is_cached_until_a_relevant_write(self):
+        User.objects.create_user('legacy', role='auditor', office_mail='legacy@x')
+        Feedback.objects.create(user=self.admin, message="Payslips are late", status='Reviewed')
+        Feedback.objects.create(user=self.admin, message="And wrong")
+        with self.assertNumQueries(2):
+            snapshot = admin_snapshot()
+        self.assertEqual((snapshot['total_users'], snapshot['active_users'], snapshot['inactive_users']), (4, 3, 1))
+        self.assertEqual(snapshot['users_by_role'], [{'role': 'admin', 'count': 1}, {'role': 'employee', 'count': 1},
+                                                     {'role': 'hr_manager', 'count': 1}, {'role': 'other', 'count': 1}])
+        self.assertEqual((snapshot['reviewed_feedbacks'], snapshot['pending_feedbacks']), (1, 1))
+
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(0):
+            self.assertEqual(admin_snapshot(), snapshot)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(user=self.admin, message="Still late")
+        self.assertEqual(admin_snapshot()['pending_feedbacks'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            rollup.rollup_changed.send(sender=PayrollPeriodRollup)
+        self.assertIsNone(cache.get(SNAPSHOT_KEY))
+
+        response = self.client.get(reverse('admin_analytics'))
+        self.assertEqual(response.context['pending_feedbacks'], 2)
+        response = self.client.get(reverse('generate_admin_report_pdf'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
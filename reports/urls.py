@@ -6,6 +6,8 @@ urlpatterns = [
     path('generate_payroll_pdf', reports.views.generate_payroll_pdf, name='generate_payroll_pdf'),
     path('tax_deduction_report', reports.views.tax_deduction_report, name='tax_deduction_report'),
     path('tax_deduction_report_pdf', reports.views.tax_deduction_report_pdf, name='tax_deduction_report_pdf'),
+    path('export_payroll_summary', reports.views.export_payroll_summary, name='export_payroll_summary'),
+    path('export_tax_deductions', reports.views.export_tax_deductions, name='export_tax_deductions'),
     path('admin_analytics', reports.views.admin_analytics, name='admin_analytics'),
     path('generate_admin_report_pdf', reports.views.generate_admin_report_pdf, name='generate_admin_report_pdf'),
 ]
\ No newline at end of file
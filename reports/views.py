@@ -1,98 +1,66 @@
-from django.contrib.auth import get_user_model
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
-from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.shortcuts import render, redirect
 
 # Create your views here.
 from django.shortcuts import render
-from django.db.models import Sum, Count
 from django.utils.timezone import now
+from django.views.decorators.http import require_POST
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
 from reportlab.platypus import TableStyle, Table, Spacer, Paragraph, SimpleDocTemplate
 
-from payroll.models import Payroll, TotalDeductions
-from datetime import datetime
+from jobs.models import Job
+from jobs.queue import enqueue
+from payroll.pdf_service import pdf_renderer
+from reports.analytics import admin_snapshot
+from reports.export import iter_csv, iter_xlsx
+from reports.forms import ReportExportForm
+from reports.pdf import tax_deduction_data, render_tax_deduction_report
+from quickpay.pagination import KeysetPaginator
+from reports.queries import (payroll_summary_values, payroll_summary_totals, tax_deduction_values,
+                             tax_deduction_totals, payroll_export_rows, tax_export_rows)
+from reports.tasks import PAYROLL_SUMMARY_PDF_JOB
+from datetime import date, datetime
+
+PAYROLL_SUMMARY_SORTS = {'employee': 'employee_id', 'net': 'net_salary'}
+TAX_DEDUCTION_SORTS = {'employee': 'employee_id', 'total': 'total_deduction'}
 
 
 @login_required()
 def payroll_summary(request):
     month = int(request.GET.get('month', datetime.now().month))
     year = int(request.GET.get('year', datetime.now().year))
-    payrolls = Payroll.objects.filter(
-        payment_date__month=month,
-        payment_date__year=year
-    )
-    totals = payrolls.aggregate(
-        total_gross=Sum('gross__gross_total'),
-        total_deductions=Sum('deductions__total_deduction'),
-        total_net=Sum('net_salary')
-    )
+    page = KeysetPaginator(payroll_summary_values(month, year), PAYROLL_SUMMARY_SORTS, 'employee').page(request)
     context = {
-        'payrolls': payrolls,
-        'totals': totals,
+        'payrolls': page.object_list,
+        'page': page,
+        'totals': payroll_summary_totals(month, year),
         'month': month,
         'year': year,
+        'export_form': _export_form(month, year),
     }
     return render(request, 'payroll_summary.html', context)
 
 
 @login_required()
+@require_POST
 def generate_payroll_pdf(request):
-    month = int(request.GET.get('month', datetime.now().month))
-    year = int(request.GET.get('year', datetime.now().year))
-
-    payrolls = Payroll.objects.filter(payment_date__month=month, payment_date__year=year)
-    totals = payrolls.aggregate(
-        total_gross=Sum('gross__gross_total'),
-        total_deductions=Sum('deductions__total_deduction'),
-        total_net=Sum('net_salary')
-    )
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="payroll_summary_{month}_{year}.pdf"'
-
-    doc = SimpleDocTemplate(response, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    title = Paragraph(f"<b>Payroll Summary Report - {month}/{year}</b>", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-
-    data = [["Employee", "Gross Salary (Rs.)", "Total Deductions (Rs.)", "Net Salary (Rs.)"]]
-    for p in payrolls:
-        data.append([
-            p.employee.user.username,
-            f"{p.gross.gross_total:.2f}",
-            f"{p.deductions.total_deduction:.2f}",
-            f"{p.net_salary:.2f}",
-        ])
-
-    data.append([
-        "TOTAL",
-        f"{totals['total_gross'] or 0:.2f}",
-        f"{totals['total_deductions'] or 0:.2f}",
-        f"{totals['total_net'] or 0:.2f}"
-    ])
-
-    table = Table(data, colWidths=[2.5 * inch, 1.5 * inch, 1.5 * inch, 1.5 * inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#003366")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-    ]))
-
-    elements.append(table)
-    doc.build(elements)
-    return response
+    if request.user.role not in ['hr_manager', 'admin']:
+        return HttpResponseForbidden("Access denied")
+    month = int(request.POST.get('month', datetime.now().month))
+    year = int(request.POST.get('year', datetime.now().year))
+    # Reuse a render of the month that is still queued or running, one the user can follow.
+    pending = Job.objects.filter(kind=PAYROLL_SUMMARY_PDF_JOB, payload__month=month, payload__year=year,
+                                 status__in=['queued', 'running'])
+    if request.user.role != 'admin':
+        pending = pending.filter(created_by=request.user)
+    job = pending.order_by('id').first() or enqueue(PAYROLL_SUMMARY_PDF_JOB, {'month': month, 'year': year},
+                                                    user=request.user)
+    return redirect('job_status', job_id=job.id)
 
 
 @login_required()
@@ -100,27 +68,15 @@ def tax_deduction_report(request):
     month = int(request.GET.get('month', datetime.now().month))
     year = int(request.GET.get('year', datetime.now().year))
 
-    # Filter deductions for selected month & year
-    deductions = TotalDeductions.objects.filter(date__month=month, date__year=year)
-
-    # Aggregate totals
-    totals = deductions.aggregate(
-        total_pf=Sum('pf'),
-        total_esi=Sum('esi'),
-        total_pt=Sum('pt'),
-        total_income_tax=Sum('income_tax'),
-        total_deduction=Sum('total_deduction'),
-    )
-
-    # Handle None safely
-    for key in totals:
-        totals[key] = totals[key] or 0
+    page = KeysetPaginator(tax_deduction_values(month, year), TAX_DEDUCTION_SORTS, 'employee').page(request)
 
     context = {
-        'deductions': deductions,
-        'totals': totals,
+        'deductions': page.object_list,
+        'page': page,
+        'totals': tax_deduction_totals(month, year),
         'month': month,
         'year': year,
+        'export_form': _export_form(month, year),
     }
 
     return render(request, 'tax_deduction_report.html', context)
@@ -131,115 +87,76 @@ def tax_deduction_report_pdf(request):
     month = int(request.GET.get('month', datetime.now().month))
     year = int(request.GET.get('year', datetime.now().year))
 
-    deductions = TotalDeductions.objects.filter(
-        date__month=month,
-        date__year=year
-    ).select_related('employee')
-
-    totals = deductions.aggregate(
-        total_pf=Sum('pf'),
-        total_esi=Sum('esi'),
-        total_pt=Sum('pt'),
-        total_income_tax=Sum('income_tax'),
-        total_deduction=Sum('total_deduction')
-    )
-
-    # Create the response
-    response = HttpResponse(content_type='application/pdf')
+    pdf = pdf_renderer().render(render_tax_deduction_report, tax_deduction_data(month, year))
+    response = HttpResponse(pdf, content_type='application/pdf')
     filename = f"tax_deduction_report_{month}_{year}.pdf"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    # Setup PDF
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-    y = height - 80
-
-    # Header
-    p.setFont("Helvetica-Bold", 16)
-    p.drawCentredString(width / 2, y, f"Tax Deduction Report - {month}/{year}")
-    y -= 40
-
-    # Table Header
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(50, y, "Employee")
-    p.drawString(180, y, "PF (Rs)")
-    p.drawString(250, y, "ESI (Rs)")
-    p.drawString(320, y, "PT (Rs)")
-    p.drawString(390, y, "Income Tax (Rs)")
-    p.drawString(490, y, "Total Deduction (Rs)")
-    y -= 20
-    p.setFont("Helvetica", 10)
-
-    # Table Rows
-    for d in deductions:
-        if y < 80:
-            p.showPage()
-            y = height - 80
-        p.drawString(50, y, str(d.employee.user.username))
-        p.drawRightString(220, y, f"{d.pf:.2f}")
-        p.drawRightString(290, y, f"{d.esi:.2f}")
-        p.drawRightString(360, y, f"{d.pt:.2f}")
-        p.drawRightString(460, y, f"{d.income_tax:.2f}")
-        p.drawRightString(560, y, f"{d.total_deduction:.2f}")
-        y -= 20
-
-    # Totals
-    y -= 20
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(50, y, "TOTAL")
-    p.drawRightString(220, y, f"{totals['total_pf'] or 0:.2f}")
-    p.drawRightString(290, y, f"{totals['total_esi'] or 0:.2f}")
-    p.drawRightString(360, y, f"{totals['total_pt'] or 0:.2f}")
-    p.drawRightString(460, y, f"{totals['total_income_tax'] or 0:.2f}")
-    p.drawRightString(560, y, f"{totals['total_deduction'] or 0:.2f}")
-
-    p.showPage()
-    p.save()
     return response
 
 
-User = get_user_model()
+def _export_form(month, year):
+    try:
+        selected = date(year, month, 1)
+    except ValueError:
+        selected = date.today().replace(day=1)
+    return ReportExportForm(initial={'start': selected, 'end': selected})
+
+
+# Report name -> (header, streamed row query, page to return to on bad input).
+EXPORTS = {
+    'payroll_summary': (
+        ["Payment Date", "Employee", "Department", "Gross Salary", "Total Deductions", "Net Salary"],
+        payroll_export_rows, 'payroll_summary',
+    ),
+    'tax_deductions': (
+        ["Date", "Employee", "Department", "PF", "ESI", "PT", "Income Tax", "Total Deduction"],
+        tax_export_rows, 'tax_deduction_report',
+    ),
+}
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _export(request, report):
+    if request.user.role not in ['hr_manager', 'payroll_manager', 'admin']:
+        return HttpResponseForbidden("Access denied")
+    header, query, report_page = EXPORTS[report]
+    form = ReportExportForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, "Choose a valid month range to export.")
+        return redirect(report_page)
+
+    start, end = form.date_range()
+    department = form.cleaned_data['department']
+    rows = query(start, end, department or None)
+    export_format = form.cleaned_data['format']
+    if export_format == 'xlsx':
+        content = iter_xlsx(header, rows, sheet_name=report.replace('_', ' ').title())
+    else:
+        content = iter_csv(header, rows)
+
+    response = StreamingHttpResponse(content, content_type=EXPORT_CONTENT_TYPES[export_format])
+    filename = f"{report}_{start:%Y_%m}_{form.cleaned_data['end']:%Y_%m}{'_' + department if department else ''}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
 
 
 @login_required()
-def admin_analytics(request):
-    """Dashboard analytics for admin overview."""
-
-    # Exclude admin/superuser
-    users = User.objects.filter(is_superuser=False)
-
-    total_users = users.count()
-    active_users = users.filter(is_active=True).count()
-    inactive_users = total_users - active_users
+def export_payroll_summary(request):
+    return _export(request, 'payroll_summary')
 
-    # Users by role (excluding admin)
-    users_by_role = (
-        users.values('role')
-        .annotate(count=Count('id'))
-        .order_by('role')
-    )
 
-    from payroll.models import Payroll
-    from user.models import Feedback
-
-    total_payrolls = Payroll.objects.count()
-    total_net_salary = Payroll.objects.aggregate(Sum('net_salary'))['net_salary__sum'] or 0
+@login_required()
+def export_tax_deductions(request):
+    return _export(request, 'tax_deductions')
 
-    # Feedback statistics
-    reviewed_feedbacks = Feedback.objects.filter(status='Reviewed').count()
-    pending_feedbacks = Feedback.objects.exclude(status='Reviewed').count()
 
-    context = {
-        'total_users': total_users,
-        'active_users': active_users,
-        'inactive_users': inactive_users,
-        'users_by_role': users_by_role,
-        'total_payrolls': total_payrolls,
-        'total_net_salary': total_net_salary,
-        'reviewed_feedbacks': reviewed_feedbacks,
-        'pending_feedbacks': pending_feedbacks,
-    }
-    return render(request, 'admin_analytics.html', context)
+@login_required()
+def admin_analytics(request):
+    """Dashboard analytics for admin overview."""
+    return render(request, 'admin_analytics.html', admin_snapshot())
 
 
 @login_required()
@@ -255,24 +172,18 @@ def generate_admin_report_pdf(request):
     elements.append(title)
     elements.append(Spacer(1, 0.2 * inch))
 
+    snapshot = admin_snapshot()
     now_date = Paragraph(f"Generated on: {now().strftime('%d %B %Y, %I:%M %p')}", styles["Normal"])
     elements.append(now_date)
     elements.append(Spacer(1, 0.3 * inch))
 
-    # System stats table
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    inactive_users = total_users - active_users
-    total_payrolls = Payroll.objects.count()
-    total_net_salary = Payroll.objects.aggregate(Sum('net_salary'))['net_salary__sum'] or 0
-
     data = [
         ["Metric", "Value"],
-        ["Total Users", total_users],
-        ["Active Users", active_users],
-        ["Inactive Users", inactive_users],
-        ["Total Payrolls Processed", total_payrolls],
-        ["Total Net Salary Paid (Rs)", f"{total_net_salary:,.2f}"],
+        ["Total Users", snapshot['total_users']],
+        ["Active Users", snapshot['active_users']],
+        ["Inactive Users", snapshot['inactive_users']],
+        ["Total Payrolls Processed", snapshot['total_payrolls']],
+        ["Total Net Salary Paid (Rs)", f"{snapshot['total_net_salary']:,.2f}"],
     ]
 
     table = Table(data, colWidths=[3 * inch, 3 * inch])
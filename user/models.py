@@ -19,6 +19,13 @@ class User(AbstractUser):
     phone = models.CharField(max_length=10, null=True, blank=True)
     office_mail = models.EmailField(unique=True, null=True, blank=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['first_name', 'id'], name='user_first_name_idx'),
+            models.Index(fields=['role', 'id'], name='user_role_idx'),
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.is_superuser:
             self.role = 'admin'
@@ -42,6 +49,11 @@ class Notification(models.Model):
     class Meta:
         db_table = "notifications"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_recent_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], condition=models.Q(is_read=False),
+                         name='notification_unread_idx'),
+        ]
 
     def __str__(self):
         return f"Notification #{self.id} → {self.user.username}"
@@ -63,6 +75,12 @@ class Feedback(models.Model):
     subject = models.CharField(max_length=250, null=True, blank=True)
     message = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_on', 'id'], name='feedback_created_idx'),
+            models.Index(fields=['status', 'id'], name='feedback_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.subject}"
 
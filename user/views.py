@@ -13,9 +13,14 @@ from django.utils import timezone
 from django.views.decorators.http import require_POST
 
 from employee.models import Employee
+from quickpay.pagination import KeysetPaginator
 from user.forms import UserLoginForm, AddUserForm, UserProfileForm, FeedbackForm
 from user.models import User, Notification, Feedback
 
+USER_SORTS = {'name': 'first_name', 'role': 'role', 'joined': 'date_joined'}
+FEEDBACK_SORTS = {'date': 'created_on', 'status': 'status'}
+NOTIFICATION_SORTS = {'date': 'created_at'}
+
 
 # Create your views here.
 
@@ -125,8 +130,10 @@ def manage_users(request):
     elif status_filter == 'approved':
         u = u.filter(is_approved=True)
 
+    page = KeysetPaginator(u, USER_SORTS, 'name').page(request)
     return render(request, 'manage_users.html', {
-        'u': u,
+        'u': page.object_list,
+        'page': page,
         'role_filter': role_filter,
         'status_filter': status_filter
     })
@@ -285,10 +292,19 @@ def submit_feedback(request):
 @login_required()
 def feedback_list(request):
     if request.user.is_superuser or request.user.groups.filter(name__in=['Admin', 'HR Manager']).exists():
-        feedbacks = Feedback.objects.all().order_by('-created_on')
+        feedbacks = Feedback.objects.select_related('user')
     else:
-        feedbacks = Feedback.objects.filter(user=request.user)
-    return render(request, 'feedback_list.html', {'feedbacks': feedbacks})
+        feedbacks = Feedback.objects.filter(user=request.user).select_related('user')
+    status_filter = request.GET.get('status', '')
+    if status_filter:
+        feedbacks = feedbacks.filter(status=status_filter)
+    page = KeysetPaginator(feedbacks, FEEDBACK_SORTS, '-date').page(request)
+    return render(request, 'feedback_list.html', {
+        'feedbacks': page.object_list,
+        'page': page,
+        'status_filter': status_filter,
+        'statuses': Feedback.STATUS_TYPES,
+    })
 
 
 @login_required()
@@ -341,8 +357,16 @@ def create_notification(user=None, role=None, roles=None, message=""):
 @login_required()
 def view_notifications(request):
     """Show only the notifications that belong to the logged-in user."""
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'notifications.html', {'notifications': notifications})
+    notifications = Notification.objects.filter(user=request.user)
+    unread_only = request.GET.get('unread') == '1'
+    if unread_only:
+        notifications = notifications.filter(is_read=False)
+    page = KeysetPaginator(notifications, NOTIFICATION_SORTS, '-date').page(request)
+    return render(request, 'notifications.html', {
+        'notifications': page.object_list,
+        'page': page,
+        'unread_only': unread_only,
+    })
 
 
 def faq(request):